@@ -17,6 +17,11 @@ class PostgresSettings(BaseModel):
     user: SecretStr
     password: SecretStr
     is_echo: bool
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_pre_ping: bool
+    statement_timeout_ms: int
 
     def get_dsn(self) -> URL:
         dsn = URL.create(
@@ -36,6 +41,71 @@ class RedisSettings(BaseModel):
     port: int
     password: SecretStr
     username: str
+    storage_serializer: str
+    storage_compress_threshold: int
+
+
+class WebhookSettings(BaseModel):
+    enabled: bool
+    base_url: str
+    path: str
+    secret_token: SecretStr | None
+    host: str
+    port: int
+    drain_timeout: float
+
+    def get_url(self) -> str | None:
+        if not self.base_url:
+            return None
+        return f"{self.base_url.rstrip('/')}{self.path}"
+
+
+class UpdateSchedulingSettings(BaseModel):
+    max_concurrent_updates: int
+    per_user_ordering: bool
+
+
+class ThrottlingSettings(BaseModel):
+    enabled: bool
+    rate: float
+    burst: int
+    global_rate: float
+    global_burst: int
+    rules: dict[str, str]
+
+
+class MetricsSettings(BaseModel):
+    enabled: bool
+    host: str
+    port: int
+    path: str
+
+
+class QueryBudgetSettings(BaseModel):
+    enabled: bool
+    max_queries: int
+    max_seconds: float
+    repeat_threshold: int
+
+
+class DialogStateSettings(BaseModel):
+    mode: str
+    task_cache_ttl: int
+
+
+class DialogsSettings(BaseModel):
+    validation: str
+
+
+class AchievementsSettings(BaseModel):
+    state_cache_ttl: int
+
+
+class StatsSettings(BaseModel):
+    write_mode: str
+    rollup_interval: float
+    rollup_batch_size: int
+    redis_ttl: int
 
 
 class LogSettings(BaseModel):
@@ -47,6 +117,15 @@ class Config(BaseModel):
     bot_settings: BotSettings
     pg_settings: PostgresSettings
     redis_settings: RedisSettings
+    webhook_settings: WebhookSettings
+    update_scheduling_settings: UpdateSchedulingSettings
+    throttling_settings: ThrottlingSettings
+    metrics_settings: MetricsSettings
+    query_budget_settings: QueryBudgetSettings
+    dialog_state_settings: DialogStateSettings
+    dialogs_settings: DialogsSettings
+    stats_settings: StatsSettings
+    achievements_settings: AchievementsSettings
     log_settings: LogSettings
 
 
@@ -67,6 +146,11 @@ def load_config(path: str | None = None) -> Config:
             user=env("POSTGRES_USER"),
             password=env("POSTGRES_PASSWORD"),
             is_echo=env.bool("POSTGRES_IS_ECHO"),
+            pool_size=env.int("POSTGRES_POOL_SIZE", 5),
+            max_overflow=env.int("POSTGRES_MAX_OVERFLOW", 10),
+            pool_timeout=env.float("POSTGRES_POOL_TIMEOUT", 30.0),
+            pool_pre_ping=env.bool("POSTGRES_POOL_PRE_PING", True),
+            statement_timeout_ms=env.int("POSTGRES_STATEMENT_TIMEOUT_MS", 0),
         ),
         redis_settings=RedisSettings(
             db=env.int("REDIS_DATABASE"),
@@ -74,6 +158,59 @@ def load_config(path: str | None = None) -> Config:
             port=env.int("REDIS_PORT"),
             password=env("REDIS_PASSWORD"),
             username=env("REDIS_USERNAME"),
+            storage_serializer=env("REDIS_STORAGE_SERIALIZER", "binary"),
+            storage_compress_threshold=env.int(
+                "REDIS_STORAGE_COMPRESS_THRESHOLD", 1024
+            ),
+        ),
+        webhook_settings=WebhookSettings(
+            enabled=env.bool("WEBHOOK_ENABLED", False),
+            base_url=env("WEBHOOK_BASE_URL", ""),
+            path=env("WEBHOOK_PATH", "/webhook"),
+            secret_token=env("WEBHOOK_SECRET_TOKEN", None),
+            host=env("WEBHOOK_HOST", "0.0.0.0"),
+            port=env.int("WEBHOOK_PORT", 8080),
+            drain_timeout=env.float("WEBHOOK_DRAIN_TIMEOUT", 30.0),
+        ),
+        update_scheduling_settings=UpdateSchedulingSettings(
+            max_concurrent_updates=env.int("UPDATES_MAX_CONCURRENT", 100),
+            per_user_ordering=env.bool("UPDATES_PER_USER_ORDERING", True),
+        ),
+        throttling_settings=ThrottlingSettings(
+            enabled=env.bool("THROTTLE_ENABLED", False),
+            rate=env.float("THROTTLE_RATE", 2.0),
+            burst=env.int("THROTTLE_BURST", 5),
+            global_rate=env.float("THROTTLE_GLOBAL_RATE", 0),
+            global_burst=env.int("THROTTLE_GLOBAL_BURST", 200),
+            rules=env.dict("THROTTLE_RULES", {}),
+        ),
+        metrics_settings=MetricsSettings(
+            enabled=env.bool("METRICS_ENABLED", False),
+            host=env("METRICS_HOST", "0.0.0.0"),
+            port=env.int("METRICS_PORT", 9100),
+            path=env("METRICS_PATH", "/metrics"),
+        ),
+        query_budget_settings=QueryBudgetSettings(
+            enabled=env.bool("QUERY_BUDGET_ENABLED", True),
+            max_queries=env.int("QUERY_BUDGET_MAX_QUERIES", 20),
+            max_seconds=env.float("QUERY_BUDGET_MAX_SECONDS", 0.5),
+            repeat_threshold=env.int("QUERY_BUDGET_REPEAT_THRESHOLD", 5),
+        ),
+        dialog_state_settings=DialogStateSettings(
+            mode=env("DIALOG_STATE_MODE", "copy"),
+            task_cache_ttl=env.int("DIALOG_STATE_TASK_CACHE_TTL", 300),
+        ),
+        dialogs_settings=DialogsSettings(
+            validation=env("DIALOGS_VALIDATION", "always"),
+        ),
+        stats_settings=StatsSettings(
+            write_mode=env("STATS_WRITE_MODE", "upsert"),
+            rollup_interval=env.float("STATS_ROLLUP_INTERVAL", 5.0),
+            rollup_batch_size=env.int("STATS_ROLLUP_BATCH_SIZE", 5000),
+            redis_ttl=env.int("STATS_REDIS_TTL", 86400),
+        ),
+        achievements_settings=AchievementsSettings(
+            state_cache_ttl=env.int("ACHIEVEMENT_STATE_CACHE_TTL", 3600),
         ),
         log_settings=LogSettings(
             level=env("LOG_LEVEL"),
@@ -0,0 +1,83 @@
+"""Add indexes for access-control and list-membership queries
+
+Revision ID: 5b7e2c41d9a3
+Revises: 992347daaf5c
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c41d9a3'
+down_revision: Union[str, Sequence[str], None] = '992347daaf5c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_TOP_LEVEL_TASKS = (
+    "parent_task_id IS NULL "
+    "AND completed_at IS NULL "
+    "AND canceled_at IS NULL"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы строятся без блокировки записи в таблицы
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_task_accesses_user_id_task_id',
+            'task_accesses',
+            ['user_id', 'task_id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_list_accesses_user_id_role',
+            'list_accesses',
+            ['user_id', 'role', 'list_id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_tasks_in_lists_task_id',
+            'tasks_in_lists',
+            ['task_id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_tasks_parent_task_id',
+            'tasks',
+            ['parent_task_id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_tasks_active_top_level_updated_at',
+            'tasks',
+            ['updated_at', 'task_id'],
+            postgresql_where=sa.text(ACTIVE_TOP_LEVEL_TASKS),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for index_name, table_name in (
+                ('ix_tasks_active_top_level_updated_at', 'tasks'),
+                ('ix_tasks_parent_task_id', 'tasks'),
+                ('ix_tasks_in_lists_task_id', 'tasks_in_lists'),
+                ('ix_list_accesses_user_id_role', 'list_accesses'),
+                ('ix_task_accesses_user_id_task_id', 'task_accesses'),
+        ):
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
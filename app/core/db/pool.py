@@ -0,0 +1,67 @@
+import time
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+
+class PoolMetrics:
+    """
+    Счётчики пула соединений: выдачи, ожидание свободного соединения
+    и таймауты ожидания
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, wait_time: float):
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений AsyncEngine, который собирает PoolMetrics
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+        self.metrics.checkouts += 1
+        return record
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        self.metrics.checkins += 1
+
+    def recreate(self) -> "MeteredAsyncQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts_total": self.metrics.checkouts,
+            "checkins_total": self.metrics.checkins,
+            "timeouts_total": self.metrics.timeouts,
+            "wait_seconds_total": self.metrics.wait_time_total,
+            "wait_seconds_max": self.metrics.wait_time_max,
+        }
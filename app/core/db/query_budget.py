@@ -0,0 +1,90 @@
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """
+    Форма SQL-запроса: литералы и параметры заменены на «?»,
+    списки IN (...) свёрнуты, пробелы нормализованы
+    :param statement: текст запроса
+    :return: форма запроса
+    """
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _SPACES_RE.sub(" ", shape).strip()
+
+
+@dataclass(slots=True)
+class QueryBudgetStats:
+    checked: int = 0
+    over_budget: int = 0
+    repeated: int = 0
+
+
+class QueryBudget:
+    """
+    Бюджет запросов к БД на один апдейт: предупреждает, если апдейт
+    выполнил слишком много запросов, потратил на них слишком много
+    времени или повторил запрос одной формы (признак N+1)
+    """
+
+    def __init__(
+            self,
+            max_queries: int = 20,
+            max_seconds: float = 0.5,
+            repeat_threshold: int = 5,
+    ):
+        self.max_queries = max_queries
+        self.max_seconds = max_seconds
+        self.repeat_threshold = repeat_threshold
+        self.stats = QueryBudgetStats()
+
+    def check(
+            self,
+            handler: str,
+            queries: int,
+            seconds: float,
+            statements: Counter,
+    ) -> list[str]:
+        """
+        Проверка запросов одного апдейта
+        :param handler: хендлер, обработавший апдейт
+        :param queries: количество запросов
+        :param seconds: суммарное время запросов
+        :param statements: количество запросов каждой формы
+        :return: формы запросов, повторённые не меньше repeat_threshold раз
+        """
+        self.stats.checked += 1
+        if queries > self.max_queries or seconds > self.max_seconds:
+            self.stats.over_budget += 1
+            logger.warning(
+                "Превышен бюджет запросов к БД в %s: "
+                "%d запросов за %.3f с (лимит %d запросов, %.3f с)",
+                handler, queries, seconds,
+                self.max_queries, self.max_seconds,
+            )
+        repeated = [
+            shape for shape, count in statements.items()
+            if count >= self.repeat_threshold
+        ]
+        for shape in repeated:
+            self.stats.repeated += 1
+            logger.warning(
+                "Возможен N+1 в %s: запрос повторён %d раз: %s",
+                handler, statements[shape], shape,
+            )
+        return repeated
@@ -1,8 +1,22 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
-from app.core.config.settings import config
+from app.core.config.settings import PostgresSettings
+from app.core.db.pool import MeteredAsyncQueuePool
 
-dsn = config.pg_settings.get_dsn()
-engine = create_async_engine(url=dsn, echo=True)
 
-session_maker = async_sessionmaker(engine, expire_on_commit=False)
+def create_engine(pg_settings: PostgresSettings) -> AsyncEngine:
+    connect_args = {}
+    if pg_settings.statement_timeout_ms:
+        connect_args["options"] = (
+            f"-c statement_timeout={pg_settings.statement_timeout_ms}"
+        )
+    return create_async_engine(
+        url=pg_settings.get_dsn(),
+        echo=pg_settings.is_echo,
+        poolclass=MeteredAsyncQueuePool,
+        pool_size=pg_settings.pool_size,
+        max_overflow=pg_settings.max_overflow,
+        pool_timeout=pg_settings.pool_timeout,
+        pool_pre_ping=pg_settings.pool_pre_ping,
+        connect_args=connect_args,
+    )
@@ -0,0 +1,107 @@
+import logging
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+Hook = Callable[[], Awaitable[Any]]
+
+_PENDING_KEY = "transaction_hooks"
+_DUE_KEY = "transaction_hooks_due"
+
+
+def after_commit(session: AsyncSession, hook: Hook):
+    """
+    Действие вне БД (запись в Redis), которое выполняется только
+    после фиксации текущей транзакции сессии и отбрасывается при откате
+    :param session: сессия СУБД
+    :param hook: асинхронная функция без аргументов
+    """
+    session.info.setdefault(_PENDING_KEY, []).append((hook, None))
+
+
+def after_rollback(session: AsyncSession, hook: Hook):
+    """
+    Компенсирующее действие вне БД, которое выполняется, если текущая
+    транзакция сессии откатилась или сессия закрылась без фиксации
+    :param session: сессия СУБД
+    :param hook: асинхронная функция без аргументов
+    """
+    session.info.setdefault(_PENDING_KEY, []).append((None, hook))
+
+
+async def run_transaction_hooks(session: AsyncSession):
+    """
+    Выполнение действий завершившихся транзакций сессии. Ошибка
+    одного действия не мешает остальным
+    :param session: сессия СУБД
+    """
+    due = session.info.pop(_DUE_KEY, None)
+    for hook in due or ():
+        try:
+            await hook()
+        except Exception as e:
+            logger.exception(
+                "Ошибка действия после завершения транзакции %r: %s",
+                hook, e,
+            )
+
+
+class HookedSession(Session):
+    """
+    Синхронная сессия, которая по итогу корневой транзакции переносит
+    зарегистрированные действия в очередь на выполнение
+    """
+
+
+def _settle(session: Session, committed: bool):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    index = 0 if committed else 1
+    hooks = [pair[index] for pair in pending if pair[index] is not None]
+    if hooks:
+        session.info.setdefault(_DUE_KEY, []).extend(hooks)
+
+
+@event.listens_for(HookedSession, "after_commit")
+def _on_commit(session: Session):
+    _settle(session, committed=True)
+
+
+@event.listens_for(HookedSession, "after_transaction_end")
+def _on_transaction_end(session: Session, transaction):
+    # После фиксации здесь уже пусто; иначе транзакция откатилась
+    # или сессия закрылась без commit
+    if transaction.parent is None:
+        _settle(session, committed=False)
+
+
+class HookedAsyncSession(AsyncSession):
+    """
+    AsyncSession, которая после commit, rollback и close выполняет
+    действия, зарегистрированные через after_commit и after_rollback
+    """
+
+    sync_session_class = HookedSession
+
+    async def commit(self):
+        try:
+            await super().commit()
+        finally:
+            await run_transaction_hooks(self)
+
+    async def rollback(self):
+        try:
+            await super().rollback()
+        finally:
+            await run_transaction_hooks(self)
+
+    async def close(self):
+        try:
+            await super().close()
+        finally:
+            await run_transaction_hooks(self)
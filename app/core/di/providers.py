@@ -5,29 +5,30 @@ from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
-    create_async_engine,
 )
 
 from app.core.config.settings import Config, load_config
+from app.core.db.session import create_engine
+from app.core.db.transaction_hooks import HookedAsyncSession
 
 
 class DbProvider(Provider):
 
     @provide(scope=Scope.APP)
-    def engine(self) -> AsyncEngine:
+    async def engine(self) -> AsyncIterable[AsyncEngine]:
         config: Config = load_config()
-        dsn = config.pg_settings.get_dsn()
-        return create_async_engine(
-            dsn,
-            echo=True,
-        )
+        engine = create_engine(config.pg_settings)
+        yield engine
+        await engine.dispose()
 
     @provide(scope=Scope.APP)
     def session_maker(
             self,
             engine: AsyncEngine,
     ) -> async_sessionmaker[AsyncSession]:
-        return async_sessionmaker(engine, expire_on_commit=False)
+        return async_sessionmaker(
+            engine, class_=HookedAsyncSession, expire_on_commit=False
+        )
 
     @provide(scope=Scope.REQUEST)
     async def session(
@@ -0,0 +1,49 @@
+from dataclasses import fields
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics.registry import MetricsRegistry
+
+
+def register_pool_metrics(registry: MetricsRegistry, engine: AsyncEngine):
+    """
+    Метрики пула соединений (для MeteredAsyncQueuePool)
+    :param registry: реестр метрик
+    :param engine: движок SQLAlchemy
+    """
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "snapshot"):
+        return
+    registry.callback_gauge(
+        "db_pool",
+        "Состояние пула соединений с БД",
+        lambda: {(key,): value for key, value in pool.snapshot().items()},
+        labels=("field",),
+    )
+
+
+def register_stats_metrics(
+        registry: MetricsRegistry,
+        components: dict[str, Any],
+):
+    """
+    Счётчики компонентов (dataclass со статистикой в атрибуте stats)
+    :param registry: реестр метрик
+    :param components: {название компонента: объект с атрибутом stats}
+    """
+
+    def collect() -> dict[tuple[str, str], float]:
+        values = {}
+        for component, owner in components.items():
+            stats = owner.stats
+            for field in fields(stats):
+                values[(component, field.name)] = getattr(stats, field.name)
+        return values
+
+    registry.callback_gauge(
+        "bot_component_stats",
+        "Счётчики кэшей и фоновых воркеров",
+        collect,
+        labels=("component", "field"),
+    )
@@ -0,0 +1,44 @@
+import logging
+
+from aiohttp import web
+
+from app.core.metrics.registry import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def make_metrics_app(
+        registry: MetricsRegistry,
+        path: str = "/metrics",
+) -> web.Application:
+    """
+    aiohttp-приложение, отдающее метрики в текстовом формате Prometheus
+    :param registry: реестр метрик
+    :param path: путь эндпоинта
+    :return: приложение aiohttp
+    """
+
+    async def metrics_handler(_request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get(path, metrics_handler)
+    return app
+
+
+async def start_metrics_server(
+        registry: MetricsRegistry,
+        host: str,
+        port: int,
+        path: str = "/metrics",
+) -> web.AppRunner:
+    runner = web.AppRunner(make_metrics_app(registry, path))
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Метрики доступны на %s:%d%s", host, port, path)
+    return runner
@@ -1,17 +1,62 @@
 import logging
+from dataclasses import dataclass
 from typing import Callable, Awaitable, Dict, Any
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 logger = logging.getLogger(__name__)
 
 
+class LazySession:
+    """
+    Заместитель AsyncSession: сессия создаётся при первом обращении
+    к любому её атрибуту, а соединение из пула SQLAlchemy берёт
+    только при первом запросе
+    """
+
+    __slots__ = ("_session_pool", "_session")
+
+    def __init__(self, session_pool: async_sessionmaker[AsyncSession]):
+        self._session_pool = session_pool
+        self._session: AsyncSession | None = None
+
+    @property
+    def is_used(self) -> bool:
+        return self._session is not None
+
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            logger.debug("Открытие сессии базы данных для апдейта")
+            self._session = self._session_pool()
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_session(), name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+@dataclass(slots=True)
+class SessionUsageStats:
+    updates: int = 0
+    updates_with_session: int = 0
+
+    @property
+    def usage_ratio(self) -> float:
+        if not self.updates:
+            return 0.0
+        return self.updates_with_session / self.updates
+
+
 class DbSessionMiddleware(BaseMiddleware):
     def __init__(self, session_pool: async_sessionmaker):
         super().__init__()
         self.session_pool = session_pool
+        self.stats = SessionUsageStats()
 
     async def __call__(
             self,
@@ -19,8 +64,13 @@ class DbSessionMiddleware(BaseMiddleware):
             event: TelegramObject,
             data: Dict[str, Any],
     ) -> Any:
-        logger.debug("Добавление к апдейту соединения с базой данных")
-        async with self.session_pool() as session:
-            data["session"] = session
-            logger.debug("Соединение с базой данных добавлено")
+        logger.debug("Добавление к апдейту ленивой сессии базы данных")
+        session = LazySession(self.session_pool)
+        data["session"] = session
+        self.stats.updates += 1
+        try:
             return await handler(event, data)
+        finally:
+            if session.is_used:
+                self.stats.updates_with_session += 1
+            await session.close()
@@ -1,52 +1,175 @@
 import asyncio
 import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
 
 from aiogram import BaseMiddleware
-from sqlalchemy import update, func
-
-from app.modules.todo.models import User
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 logger = logging.getLogger(__name__)
 
+FLUSH_LAST_ACTIVE_SQL = text(
+    """
+    UPDATE users
+    SET last_active = v.seen_at
+    FROM unnest(
+        CAST(:user_ids AS bigint[]),
+        CAST(:seen_at AS timestamptz[])
+    ) AS v(user_id, seen_at)
+    WHERE users.telegram_id = v.user_id
+      AND users.last_active < v.seen_at
+    """
+)
 
-class LastActiveMiddleware(BaseMiddleware):
-    def __init__(self, session_pool, redis_client,
-                 interval_sec: int = 3600):
+
+@dataclass(slots=True)
+class TrackerStats:
+    local_hits: int = 0
+    redis_calls: int = 0
+    redis_errors: int = 0
+    flushes: int = 0
+    flushed_users: int = 0
+    failed_flushes: int = 0
+
+
+class LastActiveTracker:
+    """
+    Учёт последней активности пользователей.
+
+    Первый уровень - множество в памяти процесса с TTL interval_sec:
+    пока пользователь в нём, апдейты не обращаются к Redis. Второй
+    уровень - ключ в Redis, который ставится атомарным SET NX и
+    не даёт нескольким процессам бота отмечать пользователя чаще
+    раза в interval_sec. Отмеченные пользователи копятся в буфере,
+    а фоновая задача раз в flush_interval секунд пишет их в БД
+    одним UPDATE ... FROM unnest(...).
+    """
+
+    def __init__(
+            self,
+            session_pool: async_sessionmaker[AsyncSession],
+            redis_client: Redis,
+            interval_sec: int = 3600,
+            flush_interval: float = 30,
+            max_local_size: int = 100_000,
+    ):
         self.session_pool = session_pool
         self.redis = redis_client
         self.interval = interval_sec
+        self.flush_interval = flush_interval
+        self.max_local_size = max_local_size
+        self.stats = TrackerStats()
+        self._seen_until: dict[int, float] = {}
+        self._dirty: dict[int, datetime] = {}
+        self._flusher: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
 
-    async def __call__(self, handler, event, data):
-        user = data.get("event_from_user")
-        if not user:
-            return await handler(event, data)
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
 
-        user_id = user.id
-        redis_key = f"user:{user_id}:last_active"
-        last_update = await self.redis.get(redis_key)
+    async def touch(self, user_id: int):
+        now = time.monotonic()
+        if self._seen_until.get(user_id, 0) > now:
+            self.stats.local_hits += 1
+            return
 
-        if not last_update:
-            asyncio.create_task(self._update_last_active(user_id))
-            await self.redis.set(
-                redis_key, "1", ex=self.interval)
+        if len(self._seen_until) >= self.max_local_size:
+            self._prune(now)
+        self._seen_until[user_id] = now + self.interval
+
+        self.stats.redis_calls += 1
+        try:
+            is_new = await self.redis.set(
+                f"user:{user_id}:last_active", "1", ex=self.interval, nx=True
+            )
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.warning(
+                "Ошибка Redis при учёте активности пользователя id=%d: %s",
+                user_id, e,
+            )
+            is_new = True
+
+        if is_new:
+            self._dirty[user_id] = datetime.now(timezone.utc)
             logger.debug(
-                "last_active обновлён для пользователя id=%d", user_id
+                "last_active пользователя id=%d поставлен в очередь", user_id
             )
 
-        return await handler(event, data)
+    def _prune(self, now: float):
+        self._seen_until = {
+            user_id: until
+            for user_id, until in self._seen_until.items()
+            if until > now
+        }
+        if len(self._seen_until) >= self.max_local_size:
+            self._seen_until.clear()
 
-    async def _update_last_active(self, user_id: int):
-        async with self.session_pool() as session:
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
             try:
-                await session.execute(
-                    update(User)
-                    .where(User.telegram_id == user_id)
-                    .values(last_active=func.now())
-                )
-                await session.commit()
+                async with self.session_pool() as session:
+                    await session.execute(
+                        FLUSH_LAST_ACTIVE_SQL,
+                        {
+                            "user_ids": list(dirty.keys()),
+                            "seen_at": list(dirty.values()),
+                        },
+                    )
+                    await session.commit()
             except Exception as e:
+                self.stats.failed_flushes += 1
                 logger.exception(
-                    "Ошибка обновления last_active "
-                    "для пользователя id=%d: %s",
-                    user_id, e,
+                    "Ошибка записи last_active для %d пользователей: %s",
+                    len(dirty), e,
+                )
+                for user_id, seen_at in dirty.items():
+                    self._dirty.setdefault(user_id, seen_at)
+                return
+            self.stats.flushes += 1
+            self.stats.flushed_users += len(dirty)
+            logger.debug("last_active обновлён для %d пользователей", len(dirty))
+
+    def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._stopping.clear()
+            self._flusher = asyncio.create_task(
+                self._run(), name="last-active-flusher"
+            )
+
+    async def stop(self):
+        if self._flusher is not None:
+            # Без отмены: забранный из буфера пакет дописывается в БД
+            self._stopping.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.flush_interval
                 )
+            except TimeoutError:
+                await self.flush()
+
+
+class LastActiveMiddleware(BaseMiddleware):
+    def __init__(self, tracker: LastActiveTracker):
+        self.tracker = tracker
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user:
+            await self.tracker.touch(user.id)
+        return await handler(event, data)
@@ -0,0 +1,259 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+from aiogram_dialog.api.internal import CONTEXT_KEY
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.db.query_budget import QueryBudget, statement_shape
+from app.core.metrics.registry import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+UPDATE_LABELS = ("update_type", "router", "state", "handler")
+
+
+@dataclass(slots=True)
+class UpdateTimings:
+    update_type: str = "unknown"
+    router: str = "none"
+    state: str = "none"
+    handler: str = "unhandled"
+    db_seconds: float = 0.0
+    db_queries: int = 0
+    api_seconds: float = 0.0
+    api_calls: int = 0
+    statements: Counter = field(default_factory=Counter)
+
+    def labels(self) -> dict[str, str]:
+        return {
+            "update_type": self.update_type,
+            "router": self.router,
+            "state": self.state,
+            "handler": self.handler,
+        }
+
+
+current_update: ContextVar[UpdateTimings | None] = ContextVar(
+    "current_update", default=None
+)
+
+
+class BotMetrics:
+    """
+    Метрики обработки апдейтов
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.updates = registry.counter(
+            "bot_updates_total", "Обработанные апдейты", UPDATE_LABELS
+        )
+        self.errors = registry.counter(
+            "bot_update_errors_total",
+            "Апдейты, обработка которых завершилась исключением",
+            UPDATE_LABELS,
+        )
+        self.in_flight = registry.gauge(
+            "bot_updates_in_flight", "Апдейты в обработке"
+        )
+        self.latency = registry.histogram(
+            "bot_update_duration_seconds",
+            "Время обработки апдейта",
+            UPDATE_LABELS,
+        )
+        self.db_time = registry.histogram(
+            "bot_update_db_seconds",
+            "Время запросов к БД за апдейт",
+            ("update_type",),
+        )
+        self.db_queries = registry.histogram(
+            "bot_update_db_queries",
+            "Количество запросов к БД за апдейт",
+            ("update_type",),
+            buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+        )
+        self.api_time = registry.histogram(
+            "bot_update_telegram_api_seconds",
+            "Время запросов к Telegram Bot API за апдейт",
+            ("update_type",),
+        )
+        self.api_requests = registry.histogram(
+            "bot_telegram_api_request_seconds",
+            "Время одного запроса к Telegram Bot API",
+            ("method",),
+        )
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware апдейтов: время обработки, ошибки
+    и апдейты в обработке
+    """
+
+    def __init__(
+            self,
+            metrics: BotMetrics,
+            query_budget: QueryBudget | None = None,
+    ):
+        self.metrics = metrics
+        self.query_budget = query_budget
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        timings = UpdateTimings(
+            update_type=getattr(event, "event_type", type(event).__name__),
+        )
+        token = current_update.set(timings)
+        self.metrics.in_flight.inc()
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight.dec()
+            current_update.reset(token)
+            labels = timings.labels()
+            self.metrics.updates.inc(**labels)
+            if failed:
+                self.metrics.errors.inc(**labels)
+            self.metrics.latency.observe(elapsed, **labels)
+            self.metrics.db_time.observe(
+                timings.db_seconds, update_type=timings.update_type
+            )
+            self.metrics.db_queries.observe(
+                timings.db_queries, update_type=timings.update_type
+            )
+            self.metrics.api_time.observe(
+                timings.api_seconds, update_type=timings.update_type
+            )
+            if self.query_budget is not None:
+                self.query_budget.check(
+                    f"{timings.router}:{timings.handler}",
+                    timings.db_queries,
+                    timings.db_seconds,
+                    timings.statements,
+                )
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware событий: запоминает роутер, состояние
+    и хендлер, который обрабатывает апдейт
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        timings = current_update.get()
+        if timings is not None:
+            router = data.get("event_router")
+            if router is not None:
+                timings.router = router.name
+            handler_object = data.get("handler")
+            if handler_object is not None:
+                callback = handler_object.callback
+                timings.handler = getattr(
+                    callback, "__qualname__", type(callback).__name__
+                )
+            context = data.get(CONTEXT_KEY)
+            if context is not None:
+                timings.state = context.state.state
+            elif data.get("raw_state"):
+                timings.state = data["raw_state"]
+        return await handler(event, data)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod,
+    ):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.api_requests.observe(
+                elapsed, method=type(method).__name__
+            )
+            timings = current_update.get()
+            if timings is not None:
+                timings.api_seconds += elapsed
+                timings.api_calls += 1
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Учёт времени запросов к БД в метриках текущего апдейта
+    :param engine: движок SQLAlchemy
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(_conn, _cursor, _statement, _parameters,
+                              context, _executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(_conn, _cursor, statement, _parameters,
+                             context, _executemany):
+        timings = current_update.get()
+        started = getattr(context, "_metrics_started", None)
+        if timings is None or started is None:
+            return
+        timings.db_seconds += time.perf_counter() - started
+        timings.db_queries += 1
+        timings.statements[statement_shape(statement)] += 1
+
+
+def setup_metrics(
+        dp: Dispatcher,
+        bot: Bot,
+        metrics: BotMetrics,
+        engine: AsyncEngine | None = None,
+        query_budget: QueryBudget | None = None,
+):
+    """
+    Подключение сбора метрик к диспетчеру, боту и движку БД
+    :param dp: диспетчер
+    :param bot: бот
+    :param metrics: метрики
+    :param engine: движок SQLAlchemy
+    :param query_budget: бюджет запросов к БД на апдейт
+    """
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics, query_budget))
+    label_middleware = HandlerLabelMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(label_middleware)
+    bot.session.middleware(TelegramApiMetricsMiddleware(metrics))
+    if engine is not None:
+        instrument_engine(engine)
+    logger.info("Сбор метрик апдейтов подключён")
@@ -0,0 +1,275 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Sequence
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Токен-бакеты KEYS[i] с параметрами ARGV[2i], ARGV[2i + 1]
+# (скорость в токенах в секунду и ёмкость); ARGV[1] - стоимость.
+# Токены списываются, только если их хватает во всех бакетах.
+# Время берётся у Redis, чтобы экземпляры бота не зависели от своих часов.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local levels = {}
+local retry_ms = 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    if tokens < cost then
+        retry_ms = math.max(retry_ms, math.ceil((cost - tokens) * 1000 / rate))
+    end
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    local tokens = levels[i]
+    if retry_ms == 0 then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(burst * 1000 / rate) + 1000)
+end
+return retry_ms
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ThrottleRule:
+    rate: float
+    burst: int
+
+    def __post_init__(self):
+        if self.rate <= 0 or self.burst < 1:
+            raise ValueError(
+                f"Некорректное правило ограничения: rate={self.rate}, "
+                f"burst={self.burst}"
+            )
+
+
+def parse_rules(raw_rules: dict[str, str]) -> dict[str, ThrottleRule]:
+    """
+    Разбор правил вида {"TaskActionsDialogSG": "0.5:3"}
+    :param raw_rules: {имя роутера или диалога: "скорость:ёмкость"}
+    :return: {имя роутера или диалога: правило}
+    """
+    rules = {}
+    for scope, value in raw_rules.items():
+        rate, _, burst = value.partition(":")
+        try:
+            rules[scope] = ThrottleRule(float(rate), int(burst))
+        except ValueError as e:
+            raise ValueError(
+                f"Некорректное правило ограничения {scope}={value!r}: {e}"
+            ) from e
+    return rules
+
+
+@dataclass(slots=True)
+class ThrottleStats:
+    allowed: int = 0
+    rejected: int = 0
+    redis_errors: int = 0
+    local_checks: int = 0
+
+
+class TokenBucketLimiter:
+    """
+    Токен-бакеты в Redis, которые проверяются и списываются атомарно
+    одним Lua-скриптом. Если Redis недоступен (или не настроен), бакеты
+    ведутся в памяти процесса: ограничение продолжает действовать,
+    но для каждого экземпляра бота отдельно.
+    """
+
+    def __init__(
+            self,
+            redis: Redis | None,
+            prefix: str = "throttle",
+            max_local_buckets: int = 100_000,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.max_local_buckets = max_local_buckets
+        self.stats = ThrottleStats()
+        self._script = (
+            redis.register_script(TOKEN_BUCKET_LUA) if redis is not None
+            else None
+        )
+        self._local: dict[str, tuple[float, float]] = {}
+
+    async def acquire(
+            self,
+            buckets: Sequence[tuple[str, ThrottleRule]],
+            cost: int = 1,
+    ) -> float:
+        """
+        Списание токенов со всех бакетов
+        :param buckets: пары (ключ бакета, правило)
+        :param cost: стоимость события в токенах
+        :return: 0, если токены списаны, иначе через сколько секунд
+        их станет достаточно
+        """
+        if self._script is not None:
+            keys = [f"{self.prefix}:{key}" for key, _rule in buckets]
+            args = [cost]
+            for _key, rule in buckets:
+                args.extend((rule.rate, rule.burst))
+            try:
+                retry_ms = await self._script(keys=keys, args=args)
+                return int(retry_ms) / 1000
+            except RedisError as e:
+                self.stats.redis_errors += 1
+                logger.warning(
+                    "Ошибка ограничения частоты в Redis, "
+                    "используются локальные бакеты: %s", e,
+                )
+        return self._acquire_local(buckets, cost)
+
+    def _acquire_local(
+            self,
+            buckets: Sequence[tuple[str, ThrottleRule]],
+            cost: int,
+    ) -> float:
+        self.stats.local_checks += 1
+        if len(self._local) > self.max_local_buckets:
+            self._local.clear()
+        now = time.monotonic()
+        levels = []
+        retry_after = 0.0
+        for key, rule in buckets:
+            tokens, updated_at = self._local.get(key, (rule.burst, now))
+            tokens = min(rule.burst, tokens + (now - updated_at) * rule.rate)
+            levels.append(tokens)
+            if tokens < cost:
+                retry_after = max(retry_after, (cost - tokens) / rule.rate)
+        for (key, _rule), tokens in zip(buckets, levels):
+            if not retry_after:
+                tokens -= cost
+            self._local[key] = (tokens, now)
+        return retry_after
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware сообщений и колбэков: ограничение частоты
+    событий пользователя (правило роутера или диалога, иначе правило
+    по умолчанию) и всех пользователей вместе. Отклонённый колбэк
+    получает ответ с просьбой подождать, хендлер и БД не вызываются.
+    На отклонённое сообщение (например, ввод в TextInput диалога) бот
+    отвечает, что оно не принято, - не чаще раза за время ожидания,
+    чтобы не отвечать на каждое сообщение потока.
+    """
+
+    def __init__(
+            self,
+            limiter: TokenBucketLimiter,
+            default_rule: ThrottleRule | None = None,
+            global_rule: ThrottleRule | None = None,
+            rules: dict[str, ThrottleRule] | None = None,
+    ):
+        self.limiter = limiter
+        self.default_rule = default_rule
+        self.global_rule = global_rule
+        self.rules = rules or {}
+        self._message_notices: dict[int, float] = {}
+
+    @property
+    def stats(self) -> ThrottleStats:
+        return self.limiter.stats
+
+    def get_buckets(
+            self,
+            user_id: int,
+            data: Dict[str, Any],
+    ) -> list[tuple[str, ThrottleRule]]:
+        buckets = []
+        router = data.get("event_router")
+        scope = router.name if router is not None else None
+        rule = self.rules.get(scope)
+        if rule is None:
+            scope, rule = "default", self.default_rule
+        if rule is not None:
+            buckets.append((f"user:{scope}:{user_id}", rule))
+        if self.global_rule is not None:
+            buckets.append(("global", self.global_rule))
+        return buckets
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        buckets = self.get_buckets(user.id, data)
+        if not buckets:
+            return await handler(event, data)
+
+        retry_after = await self.limiter.acquire(buckets)
+        if not retry_after:
+            self.stats.allowed += 1
+            return await handler(event, data)
+
+        self.stats.rejected += 1
+        logger.debug(
+            "Событие пользователя id=%d отклонено, повтор через %.1f с",
+            user.id, retry_after,
+        )
+        if isinstance(event, CallbackQuery):
+            await event.answer(
+                f"Слишком часто. Повторите через {math.ceil(retry_after)} с"
+            )
+        elif isinstance(event, Message):
+            await self.notify_rejected_message(event, user.id, retry_after)
+        return None
+
+    async def notify_rejected_message(
+            self,
+            message: Message,
+            user_id: int,
+            retry_after: float,
+    ):
+        """
+        Ответ на отклонённое сообщение, один на время ожидания пользователя
+        :param message: отклонённое сообщение
+        :param user_id: ID пользователя
+        :param retry_after: через сколько секунд можно повторить
+        """
+        now = time.monotonic()
+        if self._message_notices.get(user_id, 0) > now:
+            return
+        self._message_notices = {
+            key: until for key, until in self._message_notices.items()
+            if until > now
+        }
+        self._message_notices[user_id] = now + retry_after
+        await message.answer(
+            "Слишком часто, сообщение не принято. "
+            f"Отправьте его снова через {math.ceil(retry_after)} с"
+        )
+
+
+def setup_throttling(dp: Dispatcher, middleware: ThrottlingMiddleware):
+    """
+    Подключение ограничения частоты к сообщениям и колбэкам
+    :param dp: диспетчер
+    :param middleware: middleware ограничения частоты
+    """
+    for name in ("message", "callback_query"):
+        dp.observers[name].middleware(middleware)
+    logger.info("Ограничение частоты событий подключено")
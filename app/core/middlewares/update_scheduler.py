@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.core.metrics.registry import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SchedulerStats:
+    updates: int = 0
+    unkeyed: int = 0
+    waited_for_user: int = 0
+    waited_for_slot: int = 0
+    max_user_queue: int = 0
+
+
+class _UserQueue:
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.size = 0
+
+
+class UpdateSchedulerMetrics:
+    """
+    Метрики планировщика апдейтов
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.queued = registry.gauge(
+            "bot_update_queue_depth",
+            "Апдейты, ожидающие своей очереди",
+            ("stage",),
+        )
+        self.active_users = registry.gauge(
+            "bot_update_active_users",
+            "Пользователи, апдейты которых обрабатываются или ждут",
+        )
+        self.wait = registry.histogram(
+            "bot_update_wait_seconds",
+            "Ожидание апдейтом очереди пользователя и общего слота",
+            ("stage",),
+        )
+
+
+class UpdateSchedulerMiddleware(BaseMiddleware):
+    """
+    Внешний middleware апдейтов: апдейты разных пользователей
+    обрабатываются параллельно, но не больше max_concurrent_updates
+    одновременно, а апдейты одного пользователя - строго по очереди
+    в порядке поступления.
+
+    Очередь пользователя - asyncio.Lock (ожидающие получают его
+    в порядке FIFO) со счётчиком апдейтов; очередь удаляется, когда
+    счётчик обнуляется. Общий слот занимается только после очереди
+    пользователя, поэтому апдейты, ждущие пользователя, не занимают
+    слоты. Апдейты без пользователя и чата не упорядочиваются.
+    """
+
+    def __init__(
+            self,
+            max_concurrent_updates: int = 100,
+            per_user_ordering: bool = True,
+            metrics: UpdateSchedulerMetrics | None = None,
+    ):
+        self.max_concurrent_updates = max_concurrent_updates
+        self.per_user_ordering = per_user_ordering
+        self.metrics = metrics
+        self.stats = SchedulerStats()
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._queues: dict[Hashable, _UserQueue] = {}
+
+    @property
+    def active_users(self) -> int:
+        return len(self._queues)
+
+    @staticmethod
+    def get_key(data: Dict[str, Any]) -> Hashable | None:
+        user = data.get("event_from_user")
+        if user is not None:
+            return user.id
+        chat = data.get("event_chat")
+        if chat is not None:
+            return "chat", chat.id
+        return None
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        self.stats.updates += 1
+        key = self.get_key(data) if self.per_user_ordering else None
+        if key is None:
+            self.stats.unkeyed += 1
+            return await self._run_in_slot(handler, event, data)
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _UserQueue()
+            if self.metrics is not None:
+                self.metrics.active_users.set(len(self._queues))
+        queue.size += 1
+        if queue.size > self.stats.max_user_queue:
+            self.stats.max_user_queue = queue.size
+        try:
+            if queue.lock.locked():
+                self.stats.waited_for_user += 1
+                logger.debug(
+                    "Апдейт пользователя %s ждёт очереди (%d в очереди)",
+                    key, queue.size,
+                )
+            async with self._acquire("user", queue.lock):
+                return await self._run_in_slot(handler, event, data)
+        finally:
+            queue.size -= 1
+            if not queue.size:
+                del self._queues[key]
+                if self.metrics is not None:
+                    self.metrics.active_users.set(len(self._queues))
+
+    async def _run_in_slot(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        if self._slots.locked():
+            self.stats.waited_for_slot += 1
+        async with self._acquire("slot", self._slots):
+            return await handler(event, data)
+
+    @asynccontextmanager
+    async def _acquire(
+            self,
+            stage: str,
+            primitive: asyncio.Lock | asyncio.Semaphore,
+    ):
+        if self.metrics is None:
+            await primitive.acquire()
+        else:
+            self.metrics.queued.inc(stage=stage)
+            started = time.perf_counter()
+            try:
+                await primitive.acquire()
+            finally:
+                self.metrics.queued.dec(stage=stage)
+                self.metrics.wait.observe(
+                    time.perf_counter() - started, stage=stage
+                )
+        try:
+            yield
+        finally:
+            primitive.release()
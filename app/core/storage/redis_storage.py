@@ -0,0 +1,57 @@
+from typing import Any, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.storage.base import KeyBuilder, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
+from redis.typing import ExpiryT
+
+from app.core.storage.serializer import JsonStateSerializer, StateSerializer
+
+
+class SerializingRedisStorage(RedisStorage):
+    """
+    RedisStorage с подключаемым сериализатором данных: в отличие
+    от json_dumps/json_loads aiogram, сериализатор может возвращать bytes
+    """
+
+    def __init__(
+            self,
+            redis: Redis,
+            key_builder: KeyBuilder | None = None,
+            state_ttl: ExpiryT | None = None,
+            data_ttl: ExpiryT | None = None,
+            serializer: StateSerializer | None = None,
+    ):
+        super().__init__(
+            redis=redis,
+            key_builder=key_builder,
+            state_ttl=state_ttl,
+            data_ttl=data_ttl,
+        )
+        self.serializer = serializer or JsonStateSerializer()
+
+    async def set_data(
+            self,
+            key: StorageKey,
+            data: Mapping[str, Any],
+    ):
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, "
+                f"got {type(data).__name__}"
+            )
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(redis_key)
+            return
+        await self.redis.set(
+            redis_key, self.serializer.dumps(data), ex=self.data_ttl
+        )
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        value = await self.redis.get(redis_key)
+        if value is None:
+            return {}
+        return self.serializer.loads(value)
@@ -0,0 +1,346 @@
+import json
+import struct
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Protocol
+
+from app.modules.todo.models.enums import db_enums
+
+MAGIC = b"\x00\xb5"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x80
+
+_NONE = 0x01
+_FALSE = 0x02
+_TRUE = 0x03
+_INT = 0x04
+_FLOAT = 0x05
+_STR = 0x06
+_STR_REF = 0x07
+_LIST = 0x08
+_DICT = 0x09
+_TUPLE = 0x0A
+_ENUM = 0x0B
+_DATETIME = 0x0C
+_DATE = 0x0D
+# Обёртки to_dialog_safe хранятся одним байтом вместо служебных ключей
+_WRAPPED_ENUM = 0x10
+_WRAPPED_DATETIME = 0x11
+_WRAPPED_TUPLE = 0x12
+_WRAPPED_INT_KEY = 0x13
+
+# Однобайтовые теги для частых коротких значений
+_SMALL_INT = 0x40
+_SHORT_STR = 0x80
+_SHORT_STR_REF = 0xC0
+_SHORT_LIMIT = 0x40
+
+_INT_KEY_PREFIX = "__int__"
+_FLOAT_STRUCT = struct.Struct(">d")
+# Строки короче не попадают в таблицу ссылок: ссылка не короче их самих
+_MIN_REF_LENGTH = 3
+
+
+class StateSerializer(Protocol):
+    def dumps(self, data: dict[str, Any]) -> bytes | str: ...
+
+    def loads(self, value: bytes | str) -> dict[str, Any]: ...
+
+
+class JsonStateSerializer:
+    """
+    Сериализатор по умолчанию в aiogram: JSON.
+
+    Значения, записанные BinaryStateSerializer, читаются его декодером
+    и переписываются в JSON при следующем сохранении, поэтому к JSON
+    можно вернуться без очистки хранилища.
+    """
+
+    def __init__(self, enums: Iterable[type[Enum]] = db_enums):
+        self.enums = {cls.__name__: cls for cls in enums}
+
+    def dumps(self, data: dict[str, Any]) -> str:
+        return json.dumps(data)
+
+    def loads(self, value: bytes | str) -> dict[str, Any]:
+        if isinstance(value, bytes) and value.startswith(MAGIC):
+            return _loads_binary(value, self.enums)
+        return json.loads(value)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _is_int_key(key: str) -> bool:
+    if not key.startswith(_INT_KEY_PREFIX):
+        return False
+    digits = key[len(_INT_KEY_PREFIX):]
+    return digits.lstrip("-").isdigit() and str(int(digits)) == digits
+
+
+def _encode(data: Any, enums: dict[str, type[Enum]]) -> bytes:
+    out = bytearray()
+    append = out.append
+    strings: dict[str, int] = {}
+
+    def write_str(value: str):
+        index = strings.get(value)
+        if index is not None:
+            if index < _SHORT_LIMIT:
+                append(_SHORT_STR_REF | index)
+            else:
+                append(_STR_REF)
+                _write_varint(out, index)
+            return
+        encoded = value.encode()
+        length = len(encoded)
+        if length < _SHORT_LIMIT:
+            append(_SHORT_STR | length)
+        else:
+            append(_STR)
+            _write_varint(out, length)
+        out.extend(encoded)
+        if length >= _MIN_REF_LENGTH:
+            strings[value] = len(strings)
+
+    def write_int(value: int):
+        if 0 <= value < _SHORT_LIMIT:
+            append(_SMALL_INT | value)
+        else:
+            append(_INT)
+            _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+    def write_dict(value: dict):
+        if len(value) == 1:
+            (key, item), = value.items()
+            if key == "__enum__" and type(item) is str:
+                append(_WRAPPED_ENUM)
+                write_str(item)
+                return
+            if key == "__datetime__" and type(item) is str:
+                append(_WRAPPED_DATETIME)
+                write_str(item)
+                return
+            if key == "__tuple__" and type(item) is list:
+                append(_WRAPPED_TUPLE)
+                _write_varint(out, len(item))
+                for element in item:
+                    write(element)
+                return
+        append(_DICT)
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            if type(key) is str:
+                if key.startswith(_INT_KEY_PREFIX) and _is_int_key(key):
+                    append(_WRAPPED_INT_KEY)
+                    write_int(int(key[len(_INT_KEY_PREFIX):]))
+                else:
+                    write_str(key)
+            else:
+                write(key)
+            item_type = type(item)
+            if item_type is str:
+                write_str(item)
+            elif item_type is int:
+                write_int(item)
+            else:
+                write(item)
+
+    def write(value: Any):
+        value_type = type(value)
+        if value_type is str:
+            write_str(value)
+        elif value_type is int:
+            write_int(value)
+        elif value_type is dict:
+            write_dict(value)
+        elif value is None:
+            append(_NONE)
+        elif value_type is bool:
+            append(_TRUE if value else _FALSE)
+        elif value_type is list or value_type is tuple:
+            append(_LIST if value_type is list else _TUPLE)
+            _write_varint(out, len(value))
+            for item in value:
+                write(item)
+        elif value_type is float:
+            append(_FLOAT)
+            out.extend(_FLOAT_STRUCT.pack(value))
+        elif isinstance(value, Enum):
+            if enums.get(value_type.__name__) is value_type:
+                append(_ENUM)
+                write_str(f"{value_type.__name__}.{value.name}")
+            # Незарегистрированные перечисления пишутся значением, как в JSON
+            elif isinstance(value, str):
+                write_str(value.value)
+            elif isinstance(value, int):
+                write_int(value.value)
+            else:
+                raise TypeError(
+                    f"Enum {value_type.__name__} is not registered "
+                    f"and has no primitive value"
+                )
+        elif value_type is datetime:
+            append(_DATETIME)
+            write_str(value.isoformat())
+        elif value_type is date:
+            append(_DATE)
+            write_str(value.isoformat())
+        else:
+            raise TypeError(
+                f"Object of type {value_type.__name__} "
+                f"is not serializable to state"
+            )
+
+    write(data)
+    return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read(
+        data: bytes,
+        pos: int,
+        strings: list[str],
+        enums: dict[str, type[Enum]],
+) -> tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag >= _SHORT_STR:
+        if tag >= _SHORT_STR_REF:
+            return strings[tag - _SHORT_STR_REF], pos
+        end = pos + tag - _SHORT_STR
+        value = data[pos:end].decode()
+        if end - pos >= _MIN_REF_LENGTH:
+            strings.append(value)
+        return value, end
+    if tag >= _SMALL_INT:
+        return tag - _SMALL_INT, pos
+    if tag == _DICT:
+        length, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(length):
+            if data[pos] == _WRAPPED_INT_KEY:
+                number, pos = _read(data, pos + 1, strings, enums)
+                key = f"{_INT_KEY_PREFIX}{number}"
+            else:
+                key, pos = _read(data, pos, strings, enums)
+            result[key], pos = _read(data, pos, strings, enums)
+        return result, pos
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        value, pos = _read_varint(data, pos)
+        return (value >> 1 if not value & 1 else -((value + 1) >> 1)), pos
+    if tag == _STR:
+        length, pos = _read_varint(data, pos)
+        value = data[pos:pos + length].decode()
+        if length >= _MIN_REF_LENGTH:
+            strings.append(value)
+        return value, pos + length
+    if tag == _STR_REF:
+        index, pos = _read_varint(data, pos)
+        return strings[index], pos
+    if tag == _LIST or tag == _TUPLE or tag == _WRAPPED_TUPLE:
+        length, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _read(data, pos, strings, enums)
+            items.append(item)
+        if tag == _TUPLE:
+            return tuple(items), pos
+        if tag == _WRAPPED_TUPLE:
+            return {"__tuple__": items}, pos
+        return items, pos
+    if tag == _FLOAT:
+        return _FLOAT_STRUCT.unpack_from(data, pos)[0], pos + 8
+    if tag in _STR_BASED_TAGS:
+        text, pos = _read(data, pos, strings, enums)
+        if type(text) is not str:
+            raise ValueError(f"Ожидалась строка после тега {tag:#x}")
+        if tag == _WRAPPED_ENUM:
+            return {"__enum__": text}, pos
+        if tag == _WRAPPED_DATETIME:
+            return {"__datetime__": text}, pos
+        if tag == _ENUM:
+            name, member = text.split(".")
+            return enums[name][member], pos
+        if tag == _DATETIME:
+            return datetime.fromisoformat(text), pos
+        return date.fromisoformat(text), pos
+    raise ValueError(f"Неизвестный тег {tag:#x} в позиции {pos - 1}")
+
+
+_STR_BASED_TAGS = frozenset((
+    _ENUM, _DATETIME, _DATE, _WRAPPED_ENUM, _WRAPPED_DATETIME,
+))
+
+
+def _loads_binary(value: bytes, enums: dict[str, type[Enum]]) -> dict[str, Any]:
+    flags = value[len(MAGIC)]
+    if flags & ~FLAG_ZLIB != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата: {flags:#x}")
+    payload = value[len(MAGIC) + 1:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    return _read(payload, 0, [], enums)[0]
+
+
+class BinaryStateSerializer:
+    """
+    Компактный бинарный формат данных FSM и стека диалогов.
+
+    Перечисления из enums, даты, кортежи и словари с int-ключами кодируются
+    тегами, как и их обёртки to_dialog_safe («__enum__», «__datetime__»,
+    «__tuple__», «__int__N»), которые восстанавливаются без изменений.
+    Повторяющиеся строки (ключи задач, названия перечислений) хранятся
+    ссылкой на первое вхождение. Прочие перечисления (например, режимы
+    из start_data диалогов) пишутся своим значением, как в JSON.
+    Данные больше compress_threshold байт
+    сжимаются zlib. Значения, записанные в JSON, читаются как раньше
+    и переписываются в новом формате при следующем сохранении.
+    """
+
+    def __init__(
+            self,
+            compress_threshold: int = 1024,
+            compress_level: int = 1,
+            enums: Iterable[type[Enum]] = db_enums,
+    ):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.enums = {cls.__name__: cls for cls in enums}
+
+    def dumps(self, data: dict[str, Any]) -> bytes:
+        payload = _encode(data, self.enums)
+        flags = FORMAT_VERSION
+        if 0 <= self.compress_threshold < len(payload):
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_ZLIB
+        return MAGIC + bytes((flags,)) + payload
+
+    def loads(self, value: bytes | str) -> dict[str, Any]:
+        if isinstance(value, str) or not value.startswith(MAGIC):
+            return json.loads(value)
+        return _loads_binary(value, self.enums)
@@ -1,56 +1,141 @@
 from datetime import datetime, date
 from enum import Enum
+from typing import Any, Callable, Iterable
 
 from app.modules.todo.models.enums import db_enums
 
 _ENUM_MAP: dict[str, type[Enum]] = {cls.__name__: cls for cls in db_enums}
+# «GenderEnum.MALE» -> GenderEnum.MALE: одна выборка из словаря вместо
+# разбора строки и двух поисков при каждом декодировании
+_ENUM_BY_REF: dict[str, Enum] = {
+    f"{cls.__name__}.{member.name}": member
+    for cls in db_enums
+    for member in cls
+}
+_ENUM_REFS: dict[Enum, str] = {
+    member: ref for ref, member in _ENUM_BY_REF.items()
+}
 
+_PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+_INT_KEY_PREFIX = "__int__"
 
-def to_dialog_safe(value):
-    if isinstance(value, Enum):
-        return {"__enum__": f"{value.__class__.__name__}.{value.name}"}
 
-    if isinstance(value, (datetime, date)):
-        return {"__datetime__": value.isoformat()}
+def _enum_to_safe(value: Enum) -> dict:
+    ref = _ENUM_REFS.get(value)
+    if ref is None:
+        ref = f"{value.__class__.__name__}.{value.name}"
+    return {"__enum__": ref}
 
-    if isinstance(value, dict):
-        safe_dict = {}
-        for k, v in value.items():
-            safe_key = f"__int__{k}" if isinstance(k, int) else k
-            safe_dict[safe_key] = to_dialog_safe(v)
-        return safe_dict
 
-    if isinstance(value, tuple):
-        return {"__tuple__": [to_dialog_safe(v) for v in value]}
+def _datetime_to_safe(value: datetime | date) -> dict:
+    return {"__datetime__": value.isoformat()}
 
-    if isinstance(value, list):
-        return [to_dialog_safe(v) for v in value]
 
-    return value
+def _dict_to_safe(value: dict) -> dict:
+    safe_dict = {}
+    for k, v in value.items():
+        if isinstance(k, int):
+            k = f"{_INT_KEY_PREFIX}{k}"
+        safe_dict[k] = v if type(v) in _PRIMITIVE_TYPES else to_dialog_safe(v)
+    return safe_dict
 
 
-def from_dialog_safe(value):
-    if isinstance(value, dict):
-        if "__enum__" in value:
-            name, member = value["__enum__"].split(".")
-            return _ENUM_MAP[name][member]
+def _list_to_safe(value: list) -> list:
+    return [
+        v if type(v) in _PRIMITIVE_TYPES else to_dialog_safe(v)
+        for v in value
+    ]
 
-        if "__datetime__" in value:
-            return datetime.fromisoformat(value["__datetime__"])
 
-        if "__tuple__" in value:
-            return tuple(from_dialog_safe(v) for v in value["__tuple__"])
+def _tuple_to_safe(value: tuple) -> dict:
+    return {"__tuple__": _list_to_safe(value)}
 
-        safe_dict = {}
-        for k, v in value.items():
-            if k.startswith("__int__"):
-                key = int(k[len("__int__"):])
-            else:
-                key = k
-            safe_dict[key] = from_dialog_safe(v)
-        return safe_dict
 
-    if isinstance(value, list):
-        return [from_dialog_safe(v) for v in value]
+_ENCODERS: dict[type, Callable[[Any], Any]] = {
+    dict: _dict_to_safe,
+    list: _list_to_safe,
+    tuple: _tuple_to_safe,
+    datetime: _datetime_to_safe,
+    date: _datetime_to_safe,
+}
+
+
+def _find_encoder(value_type: type) -> Callable[[Any], Any] | None:
+    if issubclass(value_type, Enum):
+        return _enum_to_safe
+    for base in (datetime, date, dict, tuple, list):
+        if issubclass(value_type, base):
+            return _ENCODERS[base]
+    return None
 
+
+def to_dialog_safe(value):
+    value_type = type(value)
+    if value_type in _PRIMITIVE_TYPES:
+        return value
+    encoder = _ENCODERS.get(value_type)
+    if encoder is None:
+        encoder = _find_encoder(value_type)
+        if encoder is None:
+            return value
+        # Классы перечислений и прочие подклассы запоминаются,
+        # чтобы следующий вызов обошёлся одним поиском в словаре
+        _ENCODERS[value_type] = encoder
+    return encoder(value)
+
+
+def _dict_from_safe(value: dict):
+    if "__enum__" in value:
+        return _ENUM_BY_REF[value["__enum__"]]
+
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+
+    if "__tuple__" in value:
+        return tuple(_list_from_safe(value["__tuple__"]))
+
+    safe_dict = {}
+    for k, v in value.items():
+        if type(k) is str and k.startswith(_INT_KEY_PREFIX):
+            k = int(k[len(_INT_KEY_PREFIX):])
+        safe_dict[k] = (
+            v if type(v) in _PRIMITIVE_TYPES else from_dialog_safe(v)
+        )
+    return safe_dict
+
+
+def _list_from_safe(value: list) -> list:
+    return [
+        v if type(v) in _PRIMITIVE_TYPES else from_dialog_safe(v)
+        for v in value
+    ]
+
+
+def from_dialog_safe(value):
+    value_type = type(value)
+    if value_type is dict:
+        return _dict_from_safe(value)
+    if value_type is list:
+        return _list_from_safe(value)
+    if value_type in _PRIMITIVE_TYPES:
+        return value
+    if isinstance(value, dict):
+        return _dict_from_safe(value)
+    if isinstance(value, list):
+        return _list_from_safe(value)
     return value
+
+
+def from_dialog_safe_keys(value: dict, keys: Iterable[str]) -> dict:
+    """
+    Декодирование только нужных хендлеру ключей dialog_data:
+    остальные (например, карта списков) не обходятся
+    :param value: словарь в формате to_dialog_safe
+    :param keys: ключи, которые нужно декодировать
+    :return: словарь из найденных ключей
+    """
+    return {
+        key: from_dialog_safe(value[key])
+        for key in keys
+        if key in value
+    }
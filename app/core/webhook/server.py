@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import (
+    SimpleRequestHandler,
+    setup_application,
+)
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука, который сразу отвечает Telegram
+    и при остановке дожидается обработки уже принятых апдейтов.
+
+    Параллельность ограничивает UpdateSchedulerMiddleware уже после
+    очереди пользователя; max_concurrent_updates задаёт собственный
+    предел только для диспетчера без планировщика: апдейт, ждущий
+    очереди пользователя, держал бы такой слот
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            drain_timeout: float,
+            max_concurrent_updates: int | None = None,
+            secret_token: str | None = None,
+            **data: Any,
+    ):
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.drain_timeout = drain_timeout
+        self._semaphore = (
+            asyncio.Semaphore(max_concurrent_updates)
+            if max_concurrent_updates else None
+        )
+        # Задачи принятых апдейтов, которые ждёт drain
+        self._feed_tasks: set[asyncio.Task] = set()
+
+    @property
+    def pending_updates(self) -> int:
+        return len(self._feed_tasks)
+
+    async def _background_feed_update(
+            self,
+            bot: Bot,
+            update: dict[str, Any],
+    ) -> None:
+        task = asyncio.current_task()
+        self._feed_tasks.add(task)
+        try:
+            if self._semaphore is None:
+                await self._feed_update(bot, update)
+                return
+            async with self._semaphore:
+                await self._feed_update(bot, update)
+        finally:
+            self._feed_tasks.discard(task)
+
+    async def _feed_update(self, bot: Bot, update: dict[str, Any]):
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.exception(
+                "Ошибка обработки апдейта id=%s: %s",
+                update.get("update_id"), e,
+            )
+
+    async def drain(self):
+        # Задача только что принятого апдейта попадает в множество
+        # на первом шаге выполнения
+        await asyncio.sleep(0)
+        tasks = set(self._feed_tasks)
+        if not tasks:
+            return
+        logger.info(
+            "Ожидание обработки %d принятых апдейтов (не дольше %s с)",
+            len(tasks), self.drain_timeout,
+        )
+        _done, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                "Прервана обработка %d апдейтов по таймауту", len(pending)
+            )
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.drain()
+        await super().close()
+
+
+def make_webhook_app(
+        dp: Dispatcher,
+        bot: Bot,
+        *,
+        path: str,
+        drain_timeout: float,
+        max_concurrent_updates: int | None = None,
+        secret_token: str | None = None,
+        webhook_url: str | None = None,
+        **data: Any,
+) -> web.Application:
+    """
+    Создание aiohttp-приложения для приёма апдейтов через вебхук
+    :param dp: диспетчер
+    :param bot: бот
+    :param path: путь, на который Telegram отправляет апдейты
+    :param drain_timeout: время ожидания обработки апдейтов при остановке
+    :param max_concurrent_updates: предел одновременно обрабатываемых
+    апдейтов для диспетчера без UpdateSchedulerMiddleware
+    :param secret_token: секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+    :param webhook_url: адрес вебхука для регистрации в Telegram;
+    если не задан, апдейты принимаются только локально
+    :param data: дополнительные данные для хендлеров
+    :return: приложение aiohttp
+    """
+    app = web.Application()
+    LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        drain_timeout=drain_timeout,
+        max_concurrent_updates=max_concurrent_updates,
+        secret_token=secret_token,
+        **data,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot, **data)
+
+    if webhook_url:
+        async def on_startup(_app: web.Application):
+            logger.info("Установка вебхука %s", webhook_url)
+            await bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+
+        app.on_startup.append(on_startup)
+    else:
+        logger.info(
+            "Адрес вебхука не задан: вебхук в Telegram не регистрируется, "
+            "апдейты принимаются только локально"
+        )
+    return app
+
+
+async def run_webhook(app: web.Application, host: str, port: int):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    logger.info("Приём апдейтов через вебхук на %s:%d", host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
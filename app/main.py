@@ -7,21 +7,61 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.base import DefaultKeyBuilder
-from aiogram.fsm.storage.redis import RedisStorage
 from aiogram_dialog import setup_dialogs
 from dishka import make_async_container
 from dishka.integrations.aiogram import setup_dishka
 from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from app.core.config.settings import config
-from app.core.db.session import session_maker
+from app.core.db.query_budget import QueryBudget
 from app.core.di.providers import DbProvider
+from app.core.metrics.collectors import (
+    register_pool_metrics,
+    register_stats_metrics,
+)
+from app.core.metrics.registry import MetricsRegistry
+from app.core.metrics.server import start_metrics_server
 from app.core.middlewares.db_session import DbSessionMiddleware
-from app.core.middlewares.last_active import LastActiveMiddleware
+from app.core.middlewares.last_active import (
+    LastActiveMiddleware,
+    LastActiveTracker,
+)
+from app.core.middlewares.metrics import BotMetrics, setup_metrics
+from app.core.middlewares.throttling import (
+    ThrottleRule,
+    ThrottlingMiddleware,
+    TokenBucketLimiter,
+    parse_rules,
+    setup_throttling,
+)
+from app.core.middlewares.update_scheduler import (
+    UpdateSchedulerMetrics,
+    UpdateSchedulerMiddleware,
+)
+from app.core.storage.redis_storage import SerializingRedisStorage
+from app.core.storage.serializer import (
+    BinaryStateSerializer,
+    JsonStateSerializer,
+)
+from app.core.webhook.server import make_webhook_app, run_webhook
 from app.modules.base.ui.handlers import routers
 from app.modules.base.ui.handlers.others import others_router
+from app.modules.todo.services.achievement_catalog import achievement_catalog
+from app.modules.todo.services.achievement_state_cache import (
+    achievement_state_cache,
+)
+from app.modules.todo.services.activity_log_sink import activity_log_sink
+from app.modules.todo.services.list_hierarchy_cache import list_hierarchy_cache
+from app.modules.todo.services.stats_counters import stats_counters
+from app.modules.todo.services.stats_rollup import stats_rollup
+from app.modules.todo.services.task_view_cache import task_view_cache
 from app.modules.todo.ui.dialogs import dialogs
-from app.modules.todo.ui.dialogs.id_uniqueness_validator import validate_dialogs
+from app.modules.todo.ui.dialogs.common.dialog_state import dialog_state
+from app.modules.todo.ui.dialogs.id_uniqueness_validator import (
+    validate_dialogs,
+    validate_dialogs_cached,
+)
 
 logging.basicConfig(
     level=logging.getLevelName(level=config.log_settings.level),
@@ -50,37 +90,178 @@ async def main():
         username=config.redis_settings.username,
     )
     key_builder = DefaultKeyBuilder(with_destiny=True)
-    storage = RedisStorage(redis=redis_client, key_builder=key_builder)
+    if config.redis_settings.storage_serializer == "json":
+        serializer = JsonStateSerializer()
+    else:
+        serializer = BinaryStateSerializer(
+            compress_threshold=config.redis_settings.storage_compress_threshold
+        )
+    storage = SerializingRedisStorage(
+        redis=redis_client, key_builder=key_builder, serializer=serializer
+    )
+    list_hierarchy_cache.setup(redis_client)
+    dialog_state_settings = config.dialog_state_settings
+    dialog_state.setup(dialog_state_settings.mode)
+    task_view_cache.setup(redis_client, dialog_state_settings.task_cache_ttl)
+    achievement_state_cache.setup(
+        redis_client, config.achievements_settings.state_cache_ttl
+    )
 
     dp = Dispatcher(storage=storage)
 
     logger.info("Including routers...")
     dp.include_routers(*routers)
-    validate_dialogs(dialogs)
+    dialogs_validation = config.dialogs_settings.validation
+    if dialogs_validation == "cached":
+        validate_dialogs_cached(dialogs)
+    elif dialogs_validation != "off":
+        validate_dialogs(dialogs)
     dp.include_routers(*dialogs)
     setup_dialogs(dp)
     dp.include_router(others_router)
 
-    logger.info("Including middlewares...")
-    dp.update.middleware(DbSessionMiddleware(session_maker))
-    dp.update.middleware(LastActiveMiddleware(session_maker, redis_client))
-
     container = make_async_container(
         DbProvider(),
     )
+    session_maker = await container.get(async_sessionmaker[AsyncSession])
+
+    logger.info("Including middlewares...")
+    db_session_middleware = DbSessionMiddleware(session_maker)
+    dp.update.middleware(db_session_middleware)
+    last_active_tracker = LastActiveTracker(session_maker, redis_client)
+    dp.update.middleware(LastActiveMiddleware(last_active_tracker))
+
+    engine = await container.get(AsyncEngine)
+    metrics_registry = MetricsRegistry()
+    query_budget_settings = config.query_budget_settings
+    query_budget = None
+    if query_budget_settings.enabled:
+        query_budget = QueryBudget(
+            max_queries=query_budget_settings.max_queries,
+            max_seconds=query_budget_settings.max_seconds,
+            repeat_threshold=query_budget_settings.repeat_threshold,
+        )
+    # Регистрируется раньше метрик: время ожидания очереди
+    # не попадает во время обработки апдейта
+    update_scheduling_settings = config.update_scheduling_settings
+    update_scheduler = UpdateSchedulerMiddleware(
+        max_concurrent_updates=(
+            update_scheduling_settings.max_concurrent_updates
+        ),
+        per_user_ordering=update_scheduling_settings.per_user_ordering,
+        metrics=UpdateSchedulerMetrics(metrics_registry),
+    )
+    dp.update.outer_middleware(update_scheduler)
+    throttling_settings = config.throttling_settings
+    throttling = None
+    if throttling_settings.enabled:
+        throttling = ThrottlingMiddleware(
+            TokenBucketLimiter(redis_client),
+            default_rule=ThrottleRule(
+                throttling_settings.rate, throttling_settings.burst
+            ),
+            global_rule=(
+                ThrottleRule(
+                    throttling_settings.global_rate,
+                    throttling_settings.global_burst,
+                )
+                if throttling_settings.global_rate > 0 else None
+            ),
+            rules=parse_rules(throttling_settings.rules),
+        )
+        setup_throttling(dp, throttling)
+    setup_metrics(
+        dp, bot, BotMetrics(metrics_registry), engine, query_budget
+    )
+    register_pool_metrics(metrics_registry, engine)
+    stats_components = {
+        "db_session": db_session_middleware,
+        "last_active": last_active_tracker,
+        "activity_log_sink": activity_log_sink,
+        "list_hierarchy_cache": list_hierarchy_cache,
+        "task_view_cache": task_view_cache,
+        "achievement_state_cache": achievement_state_cache,
+        "update_scheduler": update_scheduler,
+        "stats_rollup": stats_rollup,
+        "stats_counters": stats_counters,
+    }
+    if query_budget is not None:
+        stats_components["query_budget"] = query_budget
+    if throttling is not None:
+        stats_components["throttling"] = throttling
+    register_stats_metrics(metrics_registry, stats_components)
+
+    logger.info("Loading achievement catalog...")
+    async with session_maker() as session:
+        await achievement_catalog.load(session)
+    activity_log_sink.start(session_maker)
+    last_active_tracker.start()
+    stats_settings = config.stats_settings
+    if stats_settings.write_mode == "events":
+        stats_rollup.setup(
+            stats_settings.rollup_interval, stats_settings.rollup_batch_size
+        )
+        stats_rollup.start(session_maker)
+    elif stats_settings.write_mode == "redis":
+        stats_counters.setup(
+            redis_client,
+            stats_settings.redis_ttl,
+            stats_settings.rollup_interval,
+            stats_settings.rollup_batch_size,
+        )
+        stats_counters.start(session_maker)
+
     setup_dishka(container, dp)
 
-    try:
-        await dp.start_polling(
-            bot,
-            owner_id=config.bot_settings.owner_id.get_secret_value()
+    metrics_settings = config.metrics_settings
+    metrics_runner = None
+    if metrics_settings.enabled:
+        metrics_runner = await start_metrics_server(
+            metrics_registry,
+            metrics_settings.host,
+            metrics_settings.port,
+            metrics_settings.path,
         )
+
+    owner_id = config.bot_settings.owner_id.get_secret_value()
+    webhook_settings = config.webhook_settings
+    try:
+        if webhook_settings.enabled:
+            app = make_webhook_app(
+                dp,
+                bot,
+                path=webhook_settings.path,
+                drain_timeout=webhook_settings.drain_timeout,
+                secret_token=(
+                    webhook_settings.secret_token.get_secret_value()
+                    if webhook_settings.secret_token else None
+                ),
+                webhook_url=webhook_settings.get_url(),
+                owner_id=owner_id,
+            )
+            await run_webhook(
+                app, webhook_settings.host, webhook_settings.port
+            )
+        else:
+            await dp.start_polling(bot, owner_id=owner_id)
     except asyncio.CancelledError:
         logger.info("Bot stopped")
     except Exception as e:
         logger.exception("Bot crashed", e)
     finally:
+        logger.info(
+            "Updates: %d, needed a database session: %d",
+            db_session_middleware.stats.updates,
+            db_session_middleware.stats.updates_with_session,
+        )
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await last_active_tracker.stop()
+        await activity_log_sink.stop()
+        await stats_rollup.stop()
+        await stats_counters.stop()
         await bot.session.close()
+        await container.close()
 
 
 asyncio.run(main())
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime, timezone
 from typing import Any
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, tuple_
 from sqlalchemy.dialects.postgresql import insert as upsert
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -47,6 +47,66 @@ async def get_user_achievements(
     return user_achievements_map
 
 
+async def get_users_achievements(
+        session: AsyncSession,
+        user_ids: list[int],
+) -> dict[int, dict[int, UserAchievement]]:
+    logger.debug(
+        "Получение связей user_achievement пользователей ids=%s",
+        user_ids,
+    )
+    result = await session.scalars(
+        select(UserAchievement)
+        .where(UserAchievement.user_id.in_(user_ids))
+    )
+    users_achievements_map: dict[int, dict[int, UserAchievement]] = {
+        user_id: {} for user_id in user_ids
+    }
+    count = 0
+    for user_achievement_link in result:
+        users_achievements_map[user_achievement_link.user_id][
+            user_achievement_link.achievement_id
+        ] = user_achievement_link
+        count += 1
+    logger.debug(
+        "Получено %d связей %d пользователей", count, len(user_ids)
+    )
+    return users_achievements_map
+
+
+async def get_users_completed_achievements(
+        session: AsyncSession,
+        user_ids: list[int],
+        achievement_ids: list[int],
+) -> dict[int, set[int]]:
+    """
+    Получение выполненных достижений пользователей среди заданных,
+    без загрузки остальных связей
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param achievement_ids: ID проверяемых достижений
+    :return: словарь {ID пользователя: ID выполненных достижений}
+    """
+    logger.debug(
+        "Получение выполненных достижений ids=%s пользователей ids=%s",
+        achievement_ids, user_ids,
+    )
+    completed: dict[int, set[int]] = {user_id: set() for user_id in user_ids}
+    if not achievement_ids:
+        return completed
+    result = await session.execute(
+        select(UserAchievement.user_id, UserAchievement.achievement_id)
+        .where(
+            UserAchievement.user_id.in_(user_ids),
+            UserAchievement.achievement_id.in_(achievement_ids),
+            UserAchievement.is_completed.is_(True),
+        )
+    )
+    for user_id, achievement_id in result:
+        completed[user_id].add(achievement_id)
+    return completed
+
+
 def get_user_achievements_updates(
         user_id: int,
         achievements: list[Achievement],
@@ -93,15 +153,11 @@ def get_user_achievements_updates(
     return updates
 
 
-async def upsert_user_achievements(
+async def upsert_users_achievements(
         session: AsyncSession,
-        user_id: int,
         updates: list[dict],
 ):
-    logger.debug(
-        "Вставка связей %s user_achievement пользователя id=%d",
-        updates, user_id,
-    )
+    logger.debug("Вставка %d связей user_achievement", len(updates))
     stmt = upsert(UserAchievement).values(updates)
     stmt = stmt.on_conflict_do_update(
         index_elements=["user_id", "achievement_id"],
@@ -113,6 +169,19 @@ async def upsert_user_achievements(
         },
     )
     await session.execute(stmt)
+    logger.debug("Обновлено %d связей user_achievement", len(updates))
+
+
+async def upsert_user_achievements(
+        session: AsyncSession,
+        user_id: int,
+        updates: list[dict],
+):
+    logger.debug(
+        "Вставка связей %s user_achievement пользователя id=%d",
+        updates, user_id,
+    )
+    await upsert_users_achievements(session, updates)
     logger.debug(
         "Обновлены связи user_achievement пользователя id=%d",
         user_id,
@@ -166,21 +235,17 @@ def get_user_achievements_rollback_updates(
     return updates
 
 
-async def rollback_user_achievements(
+async def rollback_users_achievements(
         session: AsyncSession,
-        user_id: int,
         updates: list[dict],
 ):
-    logger.debug(
-        "Откат связей %s user_achievement пользователя id=%d",
-        updates, user_id,
-    )
+    logger.debug("Откат %d связей user_achievement", len(updates))
     to_delete = []
     to_upsert = []
 
     for upd in updates:
         if upd["progress"] == 0 and upd["is_completed"] is False:
-            to_delete.append(upd["achievement_id"])
+            to_delete.append((upd["user_id"], upd["achievement_id"]))
         else:
             to_upsert.append(upd)
 
@@ -189,8 +254,10 @@ async def rollback_user_achievements(
         delete_stmt = (
             delete(UserAchievement)
             .where(
-                UserAchievement.user_id == user_id,
-                UserAchievement.achievement_id.in_(to_delete),
+                tuple_(
+                    UserAchievement.user_id,
+                    UserAchievement.achievement_id,
+                ).in_(to_delete),
             )
         )
         await session.execute(delete_stmt)
@@ -209,6 +276,18 @@ async def rollback_user_achievements(
         )
         await session.execute(upsert_stmt)
     logger.debug(
-        "Удалено %d, обновлено %d связей user_achievement пользователя id=%d",
-        len(to_delete), len(to_upsert), user_id,
+        "Удалено %d, обновлено %d связей user_achievement",
+        len(to_delete), len(to_upsert),
+    )
+
+
+async def rollback_user_achievements(
+        session: AsyncSession,
+        user_id: int,
+        updates: list[dict],
+):
+    logger.debug(
+        "Откат связей %s user_achievement пользователя id=%d",
+        updates, user_id,
     )
+    await rollback_users_achievements(session, updates)
@@ -1,10 +1,28 @@
 import logging
+from collections import defaultdict
 
-from sqlalchemy import func, update
+from sqlalchemy import (
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    union_all,
+    update,
+)
 from sqlalchemy.dialects.postgresql import insert as upsert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.modules.todo.models import UserStats
+from app.modules.todo.models import (
+    AccessRoleEnum,
+    ActivityLog,
+    StatsEvent,
+    Task,
+    TaskAccess,
+    TaskStatusEnum,
+    UserStats,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -73,17 +91,26 @@ def make_updates_on_conflict(model, stmt, updates: dict):
     }
 
 
-async def upsert_user_stats_on_task_completed(
+async def upsert_users_stats(
         session: AsyncSession,
-        user_id: int,
+        user_ids: list[int],
         updates: dict,
-):
+) -> dict[int, UserStats]:
+    """
+    Увеличение счётчиков статистики сразу нескольких пользователей
+    одним запросом
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param updates: словарь {категория: приращение}
+    :return: словарь {ID пользователя: статистика}
+    """
     logger.debug(
-        "Обновление при выполнении задачи "
-        "статистики (updates=%s) пользователя id=%d",
-        list(updates.keys()), user_id,
+        "Обновление статистики (updates=%s) пользователей ids=%s",
+        list(updates.keys()), user_ids,
     )
-    stmt = upsert(UserStats).values({"user_id": user_id, **updates})
+    stmt = upsert(UserStats).values([
+        {"user_id": user_id, **updates} for user_id in user_ids
+    ])
     updates_on_conflict = make_updates_on_conflict(UserStats, stmt, updates)
     stmt = stmt.on_conflict_do_update(
         index_elements=["user_id"],
@@ -92,9 +119,26 @@ async def upsert_user_stats_on_task_completed(
             "updated_at": func.now(),
         }
     ).returning(UserStats)
-    result = await session.execute(stmt)
-    logger.debug("Обновлена статистика пользователя id=%d", user_id)
-    return result.scalar_one()
+    result = await session.scalars(stmt)
+    users_stats = {user_stats.user_id: user_stats for user_stats in result}
+    logger.debug(
+        "Обновлена статистика %d пользователей", len(users_stats)
+    )
+    return users_stats
+
+
+async def upsert_user_stats_on_task_completed(
+        session: AsyncSession,
+        user_id: int,
+        updates: dict,
+):
+    logger.debug(
+        "Обновление при выполнении задачи "
+        "статистики (updates=%s) пользователя id=%d",
+        list(updates.keys()), user_id,
+    )
+    users_stats = await upsert_users_stats(session, [user_id], updates)
+    return users_stats[user_id]
 
 
 async def get_user_stats(
@@ -113,27 +157,51 @@ def make_rollback_updates(model, categories):
     }
 
 
-async def update_user_stats_on_task_uncompleted(
+async def rollback_users_stats(
         session: AsyncSession,
-        user_id: int,
+        user_ids: list[int],
         categories: list,
-):
+) -> dict[int, UserStats]:
+    """
+    Уменьшение счётчиков статистики сразу нескольких пользователей
+    одним запросом
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param categories: уменьшаемые категории статистики
+    :return: словарь {ID пользователя: статистика}
+    """
     logger.debug(
-        "Обновление при возвращении задачи в работу "
-        "статистики (categories=%s) пользователя id=%d",
-        categories, user_id,
+        "Откат статистики (categories=%s) пользователей ids=%s",
+        categories, user_ids,
     )
     back_updates = make_rollback_updates(UserStats, categories)
     stmt = (
         update(UserStats)
-        .where(UserStats.user_id == user_id)
+        .where(UserStats.user_id.in_(user_ids))
         .values({
             **back_updates,
             "updated_at": func.now(),
         }).returning(UserStats))
-    result = await session.execute(stmt)
-    logger.debug("Обновлена статистика пользователя id=%d", user_id)
-    return result.scalar_one()
+    result = await session.scalars(stmt)
+    users_stats = {user_stats.user_id: user_stats for user_stats in result}
+    logger.debug(
+        "Откачена статистика %d пользователей", len(users_stats)
+    )
+    return users_stats
+
+
+async def update_user_stats_on_task_uncompleted(
+        session: AsyncSession,
+        user_id: int,
+        categories: list,
+):
+    logger.debug(
+        "Обновление при возвращении задачи в работу "
+        "статистики (categories=%s) пользователя id=%d",
+        categories, user_id,
+    )
+    users_stats = await rollback_users_stats(session, [user_id], categories)
+    return users_stats[user_id]
 
 
 async def upsert_user_stats_on_task_canceled(
@@ -146,18 +214,8 @@ async def upsert_user_stats_on_task_canceled(
         "статистики (updates=%s) пользователя id=%d",
         updates, user_id,
     )
-    stmt = upsert(UserStats).values({"user_id": user_id, **updates})
-    updates_on_conflict = make_updates_on_conflict(UserStats, stmt, updates)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=["user_id"],
-        set_={
-            **updates_on_conflict,
-            "updated_at": func.now(),
-        }
-    ).returning(UserStats)
-    result = await session.execute(stmt)
-    logger.debug("Обновлена статистика пользователя id=%d", user_id)
-    return result.scalar_one()
+    users_stats = await upsert_users_stats(session, [user_id], updates)
+    return users_stats[user_id]
 
 
 async def update_user_stats_on_task_uncanceled(
@@ -170,14 +228,325 @@ async def update_user_stats_on_task_uncanceled(
         "статистики (categories=%s) пользователя id=%d",
         categories, user_id,
     )
-    back_updates = make_rollback_updates(UserStats, categories)
-    stmt = (
-        update(UserStats)
-        .where(UserStats.user_id == user_id)
-        .values({
-            **back_updates,
+    users_stats = await rollback_users_stats(session, [user_id], categories)
+    return users_stats[user_id]
+
+
+async def add_users_stats_events(
+        session: AsyncSession,
+        user_ids: list[int],
+        categories: list,
+        delta: int = 1,
+):
+    """
+    Добавление приращений статистики нескольких пользователей в журнал
+    одним запросом, без блокировки строк user_stats
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param categories: категории статистики
+    :param delta: приращение каждой категории
+    """
+    logger.debug(
+        "Добавление событий статистики (categories=%s, delta=%d) "
+        "пользователей ids=%s",
+        categories, delta, user_ids,
+    )
+    await session.execute(insert(StatsEvent).values([
+        {"user_id": user_id, "category": category, "delta": delta}
+        for user_id in user_ids
+        for category in categories
+    ]))
+
+
+def make_merged_stats_stmt(user_ids: list[int], categories: list):
+    """
+    Запрос значений категорий статистики: строка user_stats плюс
+    ещё не перенесённые в неё события. Один запрос читает один снимок,
+    поэтому перенос событий между чтениями не даёт двойного счёта
+    """
+    parts = [
+        select(
+            UserStats.user_id,
+            literal(category).label("category"),
+            getattr(UserStats, category).label("value"),
+        ).where(UserStats.user_id.in_(user_ids))
+        for category in categories
+    ]
+    parts.append(
+        select(
+            StatsEvent.user_id,
+            StatsEvent.category,
+            StatsEvent.delta.label("value"),
+        ).where(
+            StatsEvent.user_id.in_(user_ids),
+            StatsEvent.category.in_(categories),
+        )
+    )
+    merged = union_all(*parts).subquery()
+    return select(
+        merged.c.user_id,
+        merged.c.category,
+        func.sum(merged.c.value),
+    ).group_by(merged.c.user_id, merged.c.category)
+
+
+async def get_users_stats_merged(
+        session: AsyncSession,
+        user_ids: list[int],
+        categories: list,
+) -> dict[int, UserStats]:
+    """
+    Получение статистики нескольких пользователей с учётом журнала событий
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param categories: нужные категории статистики
+    :return: словарь {ID пользователя: статистика}; объекты не привязаны
+    к сессии и содержат только запрошенные категории
+    """
+    logger.debug(
+        "Получение статистики (categories=%s) пользователей ids=%s "
+        "с учётом событий",
+        categories, user_ids,
+    )
+    values = {
+        user_id: dict.fromkeys(categories, 0) for user_id in user_ids
+    }
+    result = await session.execute(make_merged_stats_stmt(user_ids, categories))
+    for user_id, category, value in result:
+        values[user_id][category] = int(value or 0)
+    return {
+        user_id: UserStats(user_id=user_id, **counters)
+        for user_id, counters in values.items()
+    }
+
+
+async def record_users_stats_events(
+        session: AsyncSession,
+        user_ids: list[int],
+        categories: list,
+        delta: int = 1,
+) -> dict[int, UserStats]:
+    """
+    Запись приращений статистики в журнал и чтение итоговых значений
+    для проверки достижений
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param categories: категории статистики
+    :param delta: 1 при начислении, -1 при откате
+    :return: словарь {ID пользователя: статистика}
+    """
+    await add_users_stats_events(session, user_ids, categories, delta)
+    return await get_users_stats_merged(session, user_ids, categories)
+
+
+def aggregate_stats_events(
+        events,
+) -> dict[int, dict[str, int]]:
+    """
+    Суммирование приращений по пользователям и категориям
+    :param events: строки (ID пользователя, категория, приращение)
+    :return: словарь {ID пользователя: {категория: сумма}}
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+    for user_id, category, delta in events:
+        totals[user_id][category] += delta
+    return {user_id: dict(counters) for user_id, counters in totals.items()}
+
+
+async def apply_users_stats_deltas(
+        session: AsyncSession,
+        totals: dict[int, dict[str, int]],
+):
+    """
+    Прибавление накопленных приращений к статистике нескольких
+    пользователей одним запросом. Строки обновляются в порядке ID,
+    чтобы параллельные переносы не взаимоблокировались
+    :param session: сессия СУБД
+    :param totals: словарь {ID пользователя: {категория: приращение}}
+    """
+    categories = sorted({
+        category for counters in totals.values() for category in counters
+    })
+    rows = [
+        {
+            "user_id": user_id,
+            **{category: totals[user_id].get(category, 0)
+               for category in categories},
+        }
+        for user_id in sorted(totals)
+    ]
+    stmt = upsert(UserStats).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            **make_updates_on_conflict(
+                UserStats, stmt, dict.fromkeys(categories)
+            ),
             "updated_at": func.now(),
-        }).returning(UserStats))
-    result = await session.execute(stmt)
-    logger.debug("Обновлена статистика пользователя id=%d", user_id)
-    return result.scalar_one()
+        },
+    )
+    await session.execute(stmt)
+
+
+async def rollup_stats_events(
+        session: AsyncSession,
+        batch_size: int,
+) -> int:
+    """
+    Перенос пачки событий статистики в user_stats: события удаляются
+    из журнала и одним запросом прибавляются к строкам пользователей.
+    Строки журнала, заблокированные другим воркером, пропускаются.
+    Фиксация транзакции остаётся за вызывающим
+    :param session: сессия СУБД
+    :param batch_size: максимум событий за раз
+    :return: количество перенесённых событий
+    """
+    batch = (
+        select(StatsEvent.event_id)
+        .order_by(StatsEvent.event_id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        delete(StatsEvent)
+        .where(StatsEvent.event_id.in_(batch.scalar_subquery()))
+        .returning(StatsEvent.user_id, StatsEvent.category, StatsEvent.delta)
+    )
+    events = (await session.execute(stmt)).all()
+    if not events:
+        return 0
+
+    totals = aggregate_stats_events(events)
+    await apply_users_stats_deltas(session, totals)
+    logger.debug(
+        "Перенесено %d событий статистики %d пользователей",
+        len(events), len(totals),
+    )
+    return len(events)
+
+
+STATS_CATEGORIES = [
+    column.key for column in UserStats.__table__.columns
+    if column.key not in ("user_id", "created_at", "updated_at")
+]
+
+
+def make_task_outcomes_stmt(shard: int, shards: int):
+    """
+    Запрос выполненных и отменённых задач пользователей шарда
+    (user_id % shards == shard), сгруппированных по признакам,
+    от которых зависят категории статистики. Пользователи задачи -
+    владельцы и редакторы, как в get_task_users
+    """
+    before_deadline = case(
+        (Task.deadline.is_(None), None),
+        else_=Task.completed_at < Task.deadline,
+    ).label("before_deadline")
+    is_checked = Task.parent_task_id.is_not(None).label("is_checked")
+    return (
+        select(
+            TaskAccess.user_id,
+            Task.status,
+            Task.priority,
+            Task.urgency,
+            is_checked,
+            Task.is_shared,
+            before_deadline,
+            func.count(),
+        )
+        .join(Task, Task.task_id == TaskAccess.task_id)
+        .where(
+            TaskAccess.user_id % shards == shard,
+            TaskAccess.role.in_([AccessRoleEnum.OWNER, AccessRoleEnum.EDITOR]),
+            Task.status.in_([TaskStatusEnum.DONE, TaskStatusEnum.CANCELED]),
+        )
+        .group_by(
+            TaskAccess.user_id,
+            Task.status,
+            Task.priority,
+            Task.urgency,
+            is_checked,
+            Task.is_shared,
+            before_deadline,
+        )
+        .order_by(TaskAccess.user_id)
+    )
+
+
+def make_logged_actions_stmt(shard: int, shards: int, actions: list[str]):
+    """
+    Запрос количества успешных действий пользователей шарда из журнала
+    activity_logs. Отдельно считаются действия с удалёнными задачами
+    (task_id обнулён при удалении)
+    """
+    task_deleted = ActivityLog.task_id.is_(None).label("task_deleted")
+    return (
+        select(
+            ActivityLog.user_id,
+            ActivityLog.action,
+            task_deleted,
+            func.count(),
+        )
+        .where(
+            ActivityLog.user_id % shards == shard,
+            ActivityLog.action.in_(actions),
+            ActivityLog.success.is_(True),
+        )
+        .group_by(ActivityLog.user_id, ActivityLog.action, task_deleted)
+        .order_by(ActivityLog.user_id)
+    )
+
+
+def make_users_stats_stmt(shard: int, shards: int):
+    """
+    Запрос строк user_stats пользователей шарда в порядке ID
+    """
+    return (
+        select(UserStats.user_id, *(
+            getattr(UserStats, category) for category in STATS_CATEGORIES
+        ))
+        .where(UserStats.user_id % shards == shard)
+        .order_by(UserStats.user_id)
+    )
+
+
+async def get_users_stats_events_totals(
+        session: AsyncSession,
+        user_ids: list[int],
+) -> dict[int, dict[str, int]]:
+    """
+    Суммы ещё не перенесённых в user_stats событий статистики
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :return: словарь {ID пользователя: {категория: сумма}}
+    """
+    result = await session.execute(
+        select(
+            StatsEvent.user_id,
+            StatsEvent.category,
+            func.sum(StatsEvent.delta),
+        )
+        .where(StatsEvent.user_id.in_(user_ids))
+        .group_by(StatsEvent.user_id, StatsEvent.category)
+    )
+    return aggregate_stats_events(
+        (user_id, category, int(total)) for user_id, category, total in result
+    )
+
+
+async def stream_partitions(
+        session: AsyncSession,
+        stmt,
+        batch_size: int,
+):
+    """
+    Чтение результата запроса пачками через курсор на стороне сервера
+    :param session: сессия СУБД
+    :param stmt: запрос
+    :param batch_size: количество строк в пачке
+    """
+    result = await session.stream(
+        stmt.execution_options(yield_per=batch_size)
+    )
+    async for partition in result.partitions():
+        yield partition
@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime, timezone
 
-from sqlalchemy import select, update, and_, exists, func, delete
+from sqlalchemy import select, update, and_, exists, func, delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.todo.models import (
@@ -182,15 +182,14 @@ async def get_user_tasks(
 
     stmt = (
         select(Task)
+        .join(TaskAccess, TaskAccess.task_id == Task.task_id)
         .where(
-            and_(
-                TaskAccess.task_id == Task.task_id,
-                TaskAccess.user_id == user_id,
-                Task.parent_task_id.is_(None),
-                Task.completed_at.is_(None),
-                Task.canceled_at.is_(None),
-            )
-        ).order_by(rule)
+            TaskAccess.user_id == user_id,
+            Task.parent_task_id.is_(None),
+            Task.completed_at.is_(None),
+            Task.canceled_at.is_(None),
+        )
+        .order_by(rule)
     )
 
     result = await session.scalars(stmt)
@@ -206,6 +205,63 @@ async def get_user_tasks(
     return tasks
 
 
+async def get_user_tasks_page(
+        session: AsyncSession,
+        user_id: int,
+        mode: str,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+) -> tuple[list[Task], bool]:
+    """
+    Запрос страницы активных задач пользователя (keyset-пагинация
+    по паре (updated_at, task_id))
+    :param session: сессия СУБД
+    :param user_id: ID пользователя
+    :param mode: режим сортировки задач
+    :param limit: размер страницы
+    :param after: ключ последней задачи предыдущей страницы
+    :return: задачи страницы и признак наличия следующей страницы
+    """
+    logger.debug(
+        "Запрос страницы задач пользователя id=%d после %s",
+        user_id, after,
+    )
+
+    key = tuple_(Task.updated_at, Task.task_id)
+    if mode == "default":
+        order_by = (Task.updated_at.desc(), Task.task_id.desc())
+    else:
+        order_by = (Task.updated_at, Task.task_id)
+
+    stmt = (
+        select(Task)
+        .join(TaskAccess, TaskAccess.task_id == Task.task_id)
+        .where(
+            TaskAccess.user_id == user_id,
+            Task.parent_task_id.is_(None),
+            Task.completed_at.is_(None),
+            Task.canceled_at.is_(None),
+        )
+        .order_by(*order_by)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(
+            key < tuple_(*after) if mode == "default" else key > tuple_(*after)
+        )
+
+    result = await session.scalars(stmt)
+    tasks = list(result.all())
+    has_next = len(tasks) > limit
+
+    logger.debug(
+        "Получено задач на странице: %d, пользователя id=%d, "
+        "есть следующая страница: %s",
+        min(len(tasks), limit), user_id, has_next,
+    )
+    return tasks[:limit], has_next
+
+
 async def get_user_tasks_in_list(
         session: AsyncSession,
         user_id: int,
@@ -311,6 +367,45 @@ async def get_task_access(
     return task_access
 
 
+async def get_task_details_for_user(
+        session: AsyncSession,
+        user_id: int,
+        task_id: int,
+) -> tuple[Task, TaskList, TaskAccess, str] | None:
+    """
+    Запрос задачи, её списка, доступа пользователя к задаче
+    и часового пояса пользователя одним обращением к СУБД
+    :param session: сессия СУБД
+    :param user_id: ID пользователя
+    :param task_id: ID задачи
+    :return: кортеж (задача, список, доступ, часовой пояс) или None
+    """
+    logger.debug(
+        "Запрос полной информации о задаче id=%d для пользователя id=%d",
+        task_id, user_id,
+    )
+    stmt = (
+        select(Task, TaskList, TaskAccess, User.timezone_name)
+        .join(
+            TaskAccess,
+            and_(
+                TaskAccess.task_id == Task.task_id,
+                TaskAccess.user_id == user_id,
+            ),
+        )
+        .join(TaskInList, TaskInList.task_id == Task.task_id)
+        .join(TaskList, TaskList.list_id == TaskInList.list_id)
+        .join(User, User.telegram_id == TaskAccess.user_id)
+        .where(Task.task_id == task_id)
+    )
+    result = await session.execute(stmt)
+    row = result.one_or_none()
+    if row is None:
+        return None
+    task, task_list, task_access, timezone_name = row
+    return task, task_list, task_access, timezone_name
+
+
 async def complete_task(
         session: AsyncSession,
         task_id: int,
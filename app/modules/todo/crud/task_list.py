@@ -60,6 +60,7 @@ async def fetch_user_lists_raw(
         )
         .join(ListAccess, ListAccess.list_id == TaskList.list_id)
         .where(ListAccess.user_id == user_id)
+        .order_by(ListAccess.position, TaskList.list_id)
     )
 
     return (await session.execute(stmt)).all()
@@ -164,6 +165,22 @@ async def get_user_sub_lists_in_list(
     return sub_lists
 
 
+async def get_list_user_ids(
+        session: AsyncSession,
+        list_id: int,
+) -> list[int]:
+    """
+    ID пользователей, у которых есть доступ к списку
+    :param session: сессия СУБД
+    :param list_id: ID списка задач
+    :return: список ID пользователей
+    """
+    result = await session.scalars(
+        select(ListAccess.user_id).where(ListAccess.list_id == list_id)
+    )
+    return list(result.all())
+
+
 async def db_delete_list(
         session: AsyncSession,
         user_id: int,
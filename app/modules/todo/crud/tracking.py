@@ -1,9 +1,13 @@
 import logging
+from datetime import datetime, timezone
+from functools import partial
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.db.transaction_hooks import after_commit
 from app.modules.todo.crud.common import filter_kwargs
 from app.modules.todo.models import ActivityLog
+from app.modules.todo.services.activity_log_sink import activity_log_sink
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +19,10 @@ async def log_activity(
         **kwargs,
 ):
     """
-    Запись логов действий пользователя
+    Запись логов действий пользователя. Если запущена фоновая запись,
+    лог пишется вне транзакции пользователя: лог успешного действия
+    ставится в очередь только после фиксации транзакции, лог ошибки -
+    сразу. Иначе лог добавляется в сессию
     :param session: сессия СУБД
     :param action: наименование действия
     :param success: успешность записи действия в БД
@@ -24,6 +31,15 @@ async def log_activity(
     """
     logger.debug("Запись лога action=%s", action)
     data = filter_kwargs(ActivityLog, kwargs)
+    if activity_log_sink.is_running:
+        record = {"action": action, "success": success, **data}
+        if not success:
+            await activity_log_sink.put(record)
+            return
+        # Время действия, а не фиксации транзакции
+        record["created_at"] = datetime.now(timezone.utc)
+        after_commit(session, partial(activity_log_sink.put, record))
+        return
     log_entry = ActivityLog(
         action=action,
         success=success,
@@ -25,6 +25,7 @@ from app.modules.todo.services.task import (
     update_users_stats_achievs_on_task_canceled,
     update_users_stats_achievs_on_task_uncanceled,
 )
+from app.modules.todo.services.task_view_cache import task_view_cache
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,7 @@ async def add_task_with_stats_achievs_log(
             list_id=list_id,
             task_id=task_id,
         )
+        await session.commit()
     except Exception as e:
         logger.exception("Failed to add task: %s", e)
         await log_activity(
@@ -92,10 +94,13 @@ async def complete_task_with_stats_achievs_log(
             task_id=task_id,
             extra={"old_list_id": list_id, "new_list_id": archive_list_id}
         )
+        await session.commit()
+        await task_view_cache.invalidate(task_id)
         logger.debug(
             "Обновлена база данных при выполнении задачи id=%d", task_id
         )
     except Exception as e:
+        await session.rollback()
         logger.exception(
             "Ошибка при обновлении базы данных "
             "при выполнении задачи id=%d: %s",
@@ -144,12 +149,15 @@ async def not_complete_task_with_stats_achievs_log(
             user_id=user_id,
             task_id=task_id,
         )
+        await session.commit()
+        await task_view_cache.invalidate(task_id)
         logger.debug(
             "Обновлена база данных при возвращении "
             "пользователем id=%d в работу задачи id=%d",
             user_id, task_id
         )
     except Exception as e:
+        await session.rollback()
         logger.exception(
             "Ошибка при обновлении базы данных при возвращении "
             "пользователем id=%d в работу задачи id=%d: %s",
@@ -198,12 +206,15 @@ async def cancel_task_with_stats_achievs_log(
             new_value=TaskStatusEnum.CANCELED,
             extra={"old_list_id": list_id, "new_list_id": trash_list_id}
         )
+        await session.commit()
+        await task_view_cache.invalidate(task_id)
         logger.debug(
             "Обновлена база данных при отмене пользователем id=%d "
             "задачи id=%d",
             user_id, task_id
         )
     except Exception as e:
+        await session.rollback()
         logger.exception(
             "Ошибка при обновлении базы данных при отмене "
             "пользователем id=%d задачи id=%d: %s",
@@ -258,12 +269,15 @@ async def not_cancel_task_with_stats_achievs_log(
             old_value=task_data.get("status"),
             new_value=TaskStatusEnum.IN_PROGRESS,
         )
+        await session.commit()
+        await task_view_cache.invalidate(task_id)
         logger.debug(
             "Обновлена база данных при возвращении "
             "пользователем id=%d в работу задачи id=%d",
             user_id, task_id
         )
     except Exception as e:
+        await session.rollback()
         logger.exception(
             "Ошибка при обновлении базы данных при возвращении "
             "пользователем id=%d в работу задачи id=%d: %s",
@@ -309,6 +323,7 @@ async def delete_task_with_log(
             "Обновлена база данных при удалении пользователем id=%d задачи id=%d",
             user_id, task_id
         )
+    await task_view_cache.invalidate(task_id)
 
 
 async def change_list_for_task_with_log(
@@ -334,12 +349,15 @@ async def change_list_for_task_with_log(
             old_value=old_list_id,
             new_value=new_list_id,
         )
+        await session.commit()
+        await task_view_cache.invalidate(task_id)
         logger.debug(
             "Обновлена база данных при изменении для пользователя id=%d "
             "у задачи id=%d списка с id=%d на id=%d",
             user_id, task_id, old_list_id, new_list_id
         )
     except Exception as e:
+        await session.rollback()
         logger.exception(
             "Ошибка при обновлении базы данных при изменении для "
             "пользователя id=%d у задачи id=%d списка с id=%d на id=%d: %s",
@@ -3,8 +3,13 @@ import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.todo.crud.stats import update_stats_on_list_deleted
-from app.modules.todo.crud.task_list import db_delete_list, change_parent_list
+from app.modules.todo.crud.task_list import (
+    db_delete_list,
+    change_parent_list,
+    get_list_user_ids,
+)
 from app.modules.todo.crud.tracking import log_activity
+from app.modules.todo.services.list_hierarchy_cache import list_hierarchy_cache
 from app.modules.todo.services.task_list import (
     db_add_list,
     update_stats_achievs_on_list_added,
@@ -36,6 +41,7 @@ async def add_list_with_stats_achievs_log(
             user_id=user_id,
             list_id=list_id,
         )
+        await session.commit()
         return list_id
     except Exception as e:
         logger.exception("Failed to add list: %s", e)
@@ -53,7 +59,10 @@ async def delete_list_with_stats_log(
         list_id: int,
 ):
     try:
+        list_user_ids = await get_list_user_ids(session, list_id)
         list_id = await db_delete_list(session, user_id, list_id)
+        # Кэш сбрасывается после фиксации удаления в db_delete_list
+        await list_hierarchy_cache.invalidate(*list_user_ids)
         await update_stats_on_list_deleted(session, user_id)
         await log_activity(
             session,
@@ -62,6 +71,7 @@ async def delete_list_with_stats_log(
             user_id=user_id,
             list_id=list_id,
         )
+        await session.commit()
     except Exception as e:
         logger.exception("Failed to add list: %s", e)
         await log_activity(
@@ -85,6 +95,7 @@ async def change_parent_list_with_log(
         user_id, list_id, old_parent_list_id, new_parent_list_id
     )
     try:
+        list_user_ids = await get_list_user_ids(session, list_id)
         await change_parent_list(session, list_id, new_parent_list_id)
         await log_activity(
             session,
@@ -95,6 +106,10 @@ async def change_parent_list_with_log(
             old_value=old_parent_list_id,
             new_value=new_parent_list_id,
         )
+        await session.commit()
+        # Только после фиксации: иначе читатель успел бы закэшировать
+        # старое дерево под новой версией
+        await list_hierarchy_cache.invalidate(*list_user_ids)
         logger.debug(
             "Обновлена база данных при изменении для пользователя id=%d "
             "у списка id=%d родительского списка с id=%r на id=%d",
@@ -30,6 +30,7 @@ async def upsert_user_with_log(
             session, user_id, first_name, last_name, username
         )
         await log_activity(session, success=True, user_id=user_id, **data)
+        await session.commit()
         logger.debug("Successfully upsert user: %d", user_id)
     except Exception as e:
         logger.exception("Failed to upsert user: %s", e)
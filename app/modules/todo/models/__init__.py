@@ -12,7 +12,7 @@ from .tag import Tag, UserTag, TaskTag
 from .task import Task, TaskInList, TaskAccess
 from .task_list import TaskList, ListAccess
 from .tracking import Reminder, ActivityLog, RecurrenceRule
-from .stats import UserStats
+from .stats import UserStats, StatsEvent
 from .user import User
 
 __all__ = [
@@ -38,4 +38,5 @@ __all__ = [
     "Achievement",
     "UserAchievement",
     "UserStats",
+    "StatsEvent",
 ]
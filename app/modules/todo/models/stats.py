@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from sqlalchemy import Integer, BigInteger, ForeignKey
+from sqlalchemy import Integer, BigInteger, ForeignKey, Index, String
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.modules.todo.models import Base
@@ -60,3 +60,22 @@ class UserStats(Base, make_timestamp_mixin()):
     recurring_reminders_created: Mapped[stats_counter]
     recurring_reminders_deleted: Mapped[stats_counter]
     recurrence_rules_created: Mapped[stats_counter]
+
+
+class StatsEvent(Base, make_timestamp_mixin(include_updated=False)):
+    """
+    Приращение счётчика статистики, ещё не перенесённое в user_stats
+    """
+    __tablename__ = "stats_events"
+    __table_args__ = (
+        Index("ix_stats_events_user_id_category", "user_id", "category"),
+    )
+
+    event_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("users.telegram_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    category: Mapped[str] = mapped_column(String(64), nullable=False)
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
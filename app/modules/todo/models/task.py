@@ -3,6 +3,7 @@ from typing import Optional
 
 from sqlalchemy import (
     CheckConstraint,
+    Index,
     Integer,
     BigInteger,
     ForeignKey,
@@ -10,6 +11,7 @@ from sqlalchemy import (
     Enum,
     DateTime,
     String,
+    text,
 )
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -27,6 +29,17 @@ class Task(Base, make_timestamp_mixin()):
                         name="chk_complete_after_created"),
         CheckConstraint("canceled_at IS NULL OR canceled_at >= created_at",
                         name="chk_canceled_after_created"),
+        Index("ix_tasks_parent_task_id", "parent_task_id"),
+        Index(
+            "ix_tasks_active_top_level_updated_at",
+            "updated_at",
+            "task_id",
+            postgresql_where=text(
+                "parent_task_id IS NULL "
+                "AND completed_at IS NULL "
+                "AND canceled_at IS NULL"
+            ),
+        ),
     )
 
     task_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -119,6 +132,9 @@ class Task(Base, make_timestamp_mixin()):
 
 class TaskInList(Base, make_timestamp_mixin()):
     __tablename__ = "tasks_in_lists"
+    __table_args__ = (
+        Index("ix_tasks_in_lists_task_id", "task_id"),
+    )
 
     list_id: Mapped[int] = mapped_column(
         Integer,
@@ -145,6 +161,9 @@ class TaskInList(Base, make_timestamp_mixin()):
 
 class TaskAccess(Base, make_timestamp_mixin()):
     __tablename__ = "task_accesses"
+    __table_args__ = (
+        Index("ix_task_accesses_user_id_task_id", "user_id", "task_id"),
+    )
 
     task_id: Mapped[int] = mapped_column(
         Integer,
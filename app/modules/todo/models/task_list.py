@@ -7,6 +7,7 @@ from sqlalchemy import (
     Enum, String,
     CheckConstraint,
     UniqueConstraint,
+    Index,
 )
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -77,6 +78,7 @@ class ListAccess(Base, make_timestamp_mixin()):
         UniqueConstraint("user_id", "list_id"),
         UniqueConstraint("user_id", "parent_list_id", "position",
                          name="uq_user_parent_position"),
+        Index("ix_list_accesses_user_id_role", "user_id", "role", "list_id"),
     )
 
     list_id: Mapped[int] = mapped_column(
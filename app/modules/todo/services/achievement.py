@@ -5,8 +5,9 @@ from sqlalchemy import func, select
 from sqlalchemy.dialects.postgresql import insert as upsert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.modules.todo.models import LevelEnum, Achievement, UserAchievement
+from app.modules.todo.models import LevelEnum, UserAchievement
 from app.modules.todo.models.stats import UserStats
+from app.modules.todo.services.achievement_catalog import achievement_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -98,10 +99,9 @@ async def update_stats_achievs_on_task_added(
             logger.debug("Добавление к категориям 'recurring_tasks_created'")
             categories.append("recurring_tasks_created")
 
-        achievements_query = await session.execute(
-            select(Achievement).where(Achievement.category.in_(categories))
+        achievements = await achievement_catalog.get_by_categories(
+            session, categories
         )
-        achievements = achievements_query.scalars().all()
 
         ua_query = await session.execute(
             select(UserAchievement).where(UserAchievement.user_id == user_id)
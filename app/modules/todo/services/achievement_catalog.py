@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from math import inf
+from typing import Any, Collection, Iterable
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.todo.models import Achievement
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogAchievement:
+    achievement_id: int
+    achievement_name: str
+    description: str
+    emoji: str | None
+    category: str | None
+    is_secret: bool
+    is_progression: bool
+    required_count: int | None
+    previous_achievement_id: int | None
+
+
+class AchievementCatalog:
+    """
+    Кэш справочника достижений в памяти процесса.
+
+    Таблица achievements заполняется миграцией и почти не меняется,
+    поэтому она читается один раз и индексируется по категориям
+    (по возрастанию порога, предыдущее достижение цепочки раньше
+    следующего при равных порогах) и по цепочкам
+    previous_achievement_id. Актуальность проверяется
+    по версии (количество строк и последний updated_at) не чаще,
+    чем раз в check_interval секунд; invalidate() сбрасывает кэш сразу.
+    """
+
+    def __init__(self, check_interval: float = 600):
+        self.check_interval = check_interval
+        self._lock = asyncio.Lock()
+        self._by_id: dict[int, CatalogAchievement] = {}
+        self._by_category: dict[str, list[CatalogAchievement]] = {}
+        self._thresholds: dict[str, list[int]] = {}
+        self._chain_order: list[CatalogAchievement] = []
+        self._next_by_previous: dict[
+            int | None, list[CatalogAchievement]
+        ] = {}
+        self._version: tuple[int, datetime | None] | None = None
+        self._checked_at = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._version is not None
+
+    @property
+    def version(self) -> tuple[int, datetime | None] | None:
+        return self._version
+
+    def invalidate(self):
+        logger.debug("Сброс кэша справочника достижений")
+        self._version = None
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            await self._load(session)
+
+    async def get_by_categories(
+            self,
+            session: AsyncSession,
+            categories: Iterable[str],
+    ) -> list[CatalogAchievement]:
+        await self._ensure_fresh(session)
+        achievements = []
+        for category in dict.fromkeys(categories):
+            achievements.extend(self._by_category.get(category, ()))
+        logger.debug(
+            "Из кэша получено %d достижений по категориям %s",
+            len(achievements), categories,
+        )
+        return achievements
+
+    def get(self, achievement_id: int) -> CatalogAchievement | None:
+        return self._by_id.get(achievement_id)
+
+    def get_next(
+            self,
+            achievement_id: int | None,
+    ) -> list[CatalogAchievement]:
+        return self._next_by_previous.get(achievement_id, [])
+
+    def fill(
+            self,
+            achievements: Iterable,
+            version: tuple[int, datetime | None],
+    ):
+        by_id = {
+            achievement.achievement_id: CatalogAchievement(
+                achievement_id=achievement.achievement_id,
+                achievement_name=achievement.achievement_name,
+                description=achievement.description,
+                emoji=achievement.emoji,
+                category=achievement.category,
+                is_secret=achievement.is_secret,
+                is_progression=achievement.is_progression,
+                required_count=achievement.required_count,
+                previous_achievement_id=achievement.previous_achievement_id,
+            )
+            for achievement in achievements
+        }
+        by_category: dict[str, list[CatalogAchievement]] = defaultdict(list)
+        next_by_previous: dict[
+            int | None, list[CatalogAchievement]
+        ] = defaultdict(list)
+        for achievement in by_id.values():
+            by_category[achievement.category].append(achievement)
+            next_by_previous[achievement.previous_achievement_id].append(
+                achievement
+            )
+        depths: dict[int, int] = {}
+        for achievement in by_id.values():
+            depths[achievement.achievement_id] = self._chain_depth(
+                achievement, by_id, depths
+            )
+        for category_achievements in by_category.values():
+            category_achievements.sort(key=lambda a: (
+                a.required_count or 0, depths[a.achievement_id],
+                a.achievement_id,
+            ))
+
+        self._by_id = by_id
+        self._by_category = dict(by_category)
+        self._thresholds = {
+            category: [a.required_count or 0 for a in category_achievements]
+            for category, category_achievements in by_category.items()
+        }
+        self._next_by_previous = dict(next_by_previous)
+        self._chain_order = sorted(by_id.values(), key=lambda a: (
+            depths[a.achievement_id], a.achievement_id,
+        ))
+        self._version = version
+        self._checked_at = time.monotonic()
+        logger.debug(
+            "Справочник достижений загружен в кэш: %d достижений, "
+            "%d категорий, версия %s",
+            len(by_id), len(by_category), version,
+        )
+
+    @staticmethod
+    def _chain_depth(
+            achievement: CatalogAchievement,
+            by_id: dict[int, CatalogAchievement],
+            depths: dict[int, int],
+    ) -> int:
+        chain = []
+        current = achievement
+        while (
+                current is not None
+                and current.achievement_id not in depths
+                and len(chain) <= len(by_id)
+        ):
+            chain.append(current.achievement_id)
+            current = by_id.get(current.previous_achievement_id)
+        depth = depths.get(current.achievement_id, -1) if current else -1
+        for achievement_id in reversed(chain):
+            depth += 1
+            depths[achievement_id] = depth
+        return depths[achievement.achievement_id]
+
+    def get_crossed(
+            self,
+            category: str,
+            low: int,
+            high: int,
+    ) -> list[CatalogAchievement]:
+        """
+        Достижения категории с порогом в полуинтервале (low, high]
+        :param category: категория статистики
+        :param low: нижняя граница порога (не включается)
+        :param high: верхняя граница порога
+        :return: достижения по возрастанию порога
+        """
+        thresholds = self._thresholds.get(category)
+        if not thresholds or high <= low:
+            return []
+        start = bisect_right(thresholds, low)
+        end = bisect_right(thresholds, high, lo=start)
+        return self._by_category[category][start:end]
+
+    def get_related_ids(self, categories: Iterable[str]) -> list[int]:
+        """
+        ID достижений категорий и предыдущих им в цепочках: только
+        их состояние нужно get_user_achievements_changes
+        :param categories: категории статистики
+        :return: ID достижений по возрастанию
+        """
+        related = set()
+        for category in categories:
+            for achievement in self._by_category.get(category, ()):
+                related.add(achievement.achievement_id)
+                if achievement.previous_achievement_id is not None:
+                    related.add(achievement.previous_achievement_id)
+        return sorted(related)
+
+    def get_user_achievements_changes(
+            self,
+            user_id: int,
+            categories: Iterable[str],
+            completed_ids: Collection[int],
+            user_stats,
+            delta: int,
+    ) -> list[dict[str, Any]]:
+        """
+        Изменения связей пользователь-достижение после изменения
+        счётчиков на delta. При начислении проверяются все достижения
+        с порогом не выше нового значения, при откате - с порогом выше
+        него, и следующие за ними в цепочке; возвращаются только связи,
+        у которых меняется is_completed. Окно не ограничивается старым
+        значением: параллельные транзакции видят только свои приращения,
+        и порог, пропущенный одной из них, проверяется следующим
+        изменением
+        :param user_id: ID пользователя
+        :param categories: изменённые категории статистики
+        :param completed_ids: ID выполненных достижений пользователя
+        (достаточно тех, что возвращает get_related_ids)
+        :param user_stats: статистика после изменения
+        :param delta: приращение счётчиков (-1 при откате)
+        :return: строки для upsert_users_achievements
+        (rollback_users_achievements при delta < 0)
+        """
+        values = {
+            category: getattr(user_stats, category, 0) or 0
+            for category in categories
+        }
+        changed: dict[int, bool] = {}
+
+        def is_completed(achievement_id: int | None) -> bool:
+            if achievement_id is None:
+                return True
+            if achievement_id in changed:
+                return changed[achievement_id]
+            return achievement_id in completed_ids
+
+        unlocked_at = datetime.now(timezone.utc)
+        updates = []
+        for category, value in values.items():
+            if delta > 0:
+                queue = self.get_crossed(category, -inf, value)
+            else:
+                queue = self.get_crossed(category, value, inf)
+            position = 0
+            while position < len(queue):
+                achievement = queue[position]
+                position += 1
+                completed = is_completed(achievement.achievement_id)
+                previous_completed = is_completed(
+                    achievement.previous_achievement_id
+                )
+                reached = (
+                    values[achievement.category]
+                    >= (achievement.required_count or 0)
+                )
+                if delta > 0:
+                    if not previous_completed:
+                        continue
+                    target = reached
+                else:
+                    target = completed and previous_completed and reached
+                if target == completed:
+                    continue
+                changed[achievement.achievement_id] = target
+                updates.append({
+                    "user_id": user_id,
+                    "achievement_id": achievement.achievement_id,
+                    "progress": values[achievement.category],
+                    "is_completed": target,
+                    "unlocked_at": unlocked_at if target else None,
+                })
+                # Изменение открывает или закрывает следующие в цепочке
+                queue.extend(
+                    next_achievement
+                    for next_achievement in self.get_next(
+                        achievement.achievement_id
+                    )
+                    if next_achievement.category in values
+                )
+
+        logger.debug(
+            "Изменено %d связей пользователь-достижение пользователя id=%d",
+            len(updates), user_id,
+        )
+        return updates
+
+    def get_completed_ids(
+            self,
+            categories: Collection[str],
+            completed_ids: Collection[int],
+            user_stats: dict[str, int],
+    ) -> set[int]:
+        """
+        Выполненные достижения, рассчитанные по статистике с нуля:
+        достижение выполнено, если счётчик достиг порога и выполнено
+        предыдущее в цепочке. Достижения других категорий и без порога
+        сохраняют текущее состояние
+        :param categories: проверяемые категории статистики
+        :param completed_ids: ID выполненных достижений пользователя
+        :param user_stats: словарь {категория: значение счётчика}
+        :return: ID выполненных достижений
+        """
+        completed = set(completed_ids)
+        for achievement in self._chain_order:
+            if (
+                    achievement.category not in categories
+                    or achievement.required_count is None
+            ):
+                continue
+            previous_id = achievement.previous_achievement_id
+            if (
+                    (previous_id is None or previous_id in completed)
+                    and user_stats.get(achievement.category, 0)
+                    >= achievement.required_count
+            ):
+                completed.add(achievement.achievement_id)
+            else:
+                completed.discard(achievement.achievement_id)
+        return completed
+
+    async def _ensure_fresh(self, session: AsyncSession):
+        if (
+                self.is_loaded
+                and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return
+        async with self._lock:
+            if not self.is_loaded:
+                await self._load(session)
+                return
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return
+            version = await self._fetch_version(session)
+            self._checked_at = time.monotonic()
+            if version != self._version:
+                logger.debug(
+                    "Версия справочника достижений изменилась: %s -> %s",
+                    self._version, version,
+                )
+                await self._load(session)
+
+    async def _load(self, session: AsyncSession):
+        logger.debug("Загрузка справочника достижений в кэш")
+        version = await self._fetch_version(session)
+        result = await session.scalars(select(Achievement))
+        self.fill(result.all(), version)
+
+    @staticmethod
+    async def _fetch_version(
+            session: AsyncSession,
+    ) -> tuple[int, datetime | None]:
+        result = await session.execute(
+            select(func.count(), func.max(Achievement.updated_at))
+            .select_from(Achievement)
+        )
+        count, last_updated_at = result.one()
+        return count, last_updated_at
+
+
+achievement_catalog = AchievementCatalog()
@@ -0,0 +1,240 @@
+import logging
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.todo.crud.achievement import get_users_completed_achievements
+from app.modules.todo.services.list_hierarchy_cache import CacheStats
+
+logger = logging.getLogger(__name__)
+
+# KEYS: пары битовых карт (known, completed) пользователей.
+# ARGV: ttl, затем по каждому пользователю число достижений и пары
+# (ID достижения, выполнено). Бит пишется, только если состояние
+# достижения ещё неизвестно: загруженное из БД состояние не затирает
+# записанное параллельно после фиксации транзакции.
+FILL_UNKNOWN_LUA = """
+local ttl = tonumber(ARGV[1])
+local pos = 2
+for i = 1, #KEYS / 2 do
+    local known = KEYS[i * 2 - 1]
+    local completed = KEYS[i * 2]
+    local count = tonumber(ARGV[pos])
+    pos = pos + 1
+    for j = 1, count do
+        local offset = tonumber(ARGV[pos])
+        if redis.call('GETBIT', known, offset) == 0 then
+            redis.call('SETBIT', completed, offset, tonumber(ARGV[pos + 1]))
+            redis.call('SETBIT', known, offset, 1)
+        end
+        pos = pos + 2
+    end
+    redis.call('EXPIRE', known, ttl)
+    redis.call('EXPIRE', completed, ttl)
+end
+return 1
+"""
+
+
+def get_bit(bitmap: bytes, offset: int) -> bool:
+    """
+    Бит битовой карты Redis (старший бит байта - первый)
+    """
+    index, shift = divmod(offset, 8)
+    return index < len(bitmap) and bool(bitmap[index] & (0x80 >> shift))
+
+
+class AchievementStateCache:
+    """
+    Состояние достижений пользователей для проверки при изменении
+    статистики.
+
+    В Redis у пользователя две битовые карты, бит - ID достижения:
+    known (состояние известно) и completed (достижение выполнено).
+    Если все нужные достижения известны, БД не читается; иначе
+    из БД загружаются только неизвестные (get_users_completed_achievements)
+    и дописываются в карты, если их состояние всё ещё неизвестно.
+    Изменения достижений записываются в карты через SETBIT только после
+    фиксации транзакции (update вызывается из after_commit), поэтому
+    откат не оставляет в картах невыданных достижений, а параллельные
+    записи разных достижений не затирают друг друга. Карты живут ttl
+    секунд с последней записи.
+    Без настроенного клиента Redis состояние каждый раз читается из БД,
+    но только для нужных достижений.
+    """
+
+    def __init__(self, ttl: int = 3600, prefix: str = "achievements"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+        self._redis: Redis | None = None
+        self._fill_unknown = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._redis is not None
+
+    def setup(self, redis: Redis | None, ttl: int | None = None):
+        self._redis = redis
+        if redis is not None:
+            self._fill_unknown = redis.register_script(FILL_UNKNOWN_LUA)
+        if ttl is not None:
+            self.ttl = ttl
+
+    def _known_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}:known"
+
+    def _completed_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}:completed"
+
+    async def get_completed(
+            self,
+            session: AsyncSession,
+            user_ids: list[int],
+            achievement_ids: list[int],
+    ) -> dict[int, set[int]]:
+        """
+        Выполненные достижения пользователей среди заданных
+        :param session: сессия СУБД
+        :param user_ids: ID пользователей
+        :param achievement_ids: ID нужных достижений
+        :return: словарь {ID пользователя: ID выполненных достижений}
+        """
+        completed: dict[int, set[int]] = {}
+        missing: dict[int, list[int]] = {}
+        bitmaps = await self._read(user_ids) if achievement_ids else None
+        for user_id in user_ids:
+            if bitmaps is None:
+                missing[user_id] = achievement_ids
+                continue
+            known, completed_bits = bitmaps[user_id]
+            unknown = [
+                achievement_id for achievement_id in achievement_ids
+                if not get_bit(known, achievement_id)
+            ]
+            completed[user_id] = {
+                achievement_id for achievement_id in achievement_ids
+                if get_bit(completed_bits, achievement_id)
+            }
+            if unknown:
+                missing[user_id] = unknown
+        if bitmaps is not None:
+            self.stats.hits += len(user_ids) - len(missing)
+            self.stats.misses += len(missing)
+        if not missing:
+            return completed
+
+        # Неизвестные достижения у разных пользователей обычно совпадают,
+        # поэтому они читаются одним запросом
+        wanted = sorted({
+            achievement_id
+            for achievement_ids in missing.values()
+            for achievement_id in achievement_ids
+        })
+        loaded = await get_users_completed_achievements(
+            session, list(missing), wanted
+        )
+        for user_id, completed_ids in loaded.items():
+            completed.setdefault(user_id, set()).update(completed_ids)
+        if bitmaps is not None:
+            await self._fill(missing, loaded)
+        return completed
+
+    async def _fill(
+            self,
+            missing: dict[int, list[int]],
+            loaded: dict[int, set[int]],
+    ):
+        keys, args = [], [self.ttl]
+        for user_id, achievement_ids in missing.items():
+            keys += [self._known_key(user_id), self._completed_key(user_id)]
+            args.append(len(achievement_ids))
+            for achievement_id in achievement_ids:
+                args += [achievement_id, int(achievement_id in loaded[user_id])]
+        try:
+            await self._fill_unknown(keys=keys, args=args)
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка записи состояния достижений пользователей ids=%s: %s",
+                sorted(missing), e,
+            )
+
+    async def update(self, updates: list[dict[str, Any]]):
+        """
+        Запись состояния достижений в битовые карты. Вызывается только
+        после фиксации транзакции, в которой изменены user_achievements
+        :param updates: строки с user_id, achievement_id и is_completed
+        (как для upsert_users_achievements)
+        """
+        if not self.is_enabled or not updates:
+            return
+        user_ids = set()
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                for update in updates:
+                    user_id = update["user_id"]
+                    user_ids.add(user_id)
+                    pipe.setbit(
+                        self._known_key(user_id), update["achievement_id"], 1
+                    )
+                    pipe.setbit(
+                        self._completed_key(user_id),
+                        update["achievement_id"],
+                        int(update["is_completed"]),
+                    )
+                for user_id in user_ids:
+                    pipe.expire(self._known_key(user_id), self.ttl)
+                    pipe.expire(self._completed_key(user_id), self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка записи состояния достижений пользователей ids=%s: %s",
+                sorted(user_ids), e,
+            )
+            await self.invalidate(*user_ids)
+
+    async def invalidate(self, *user_ids: int):
+        if not self.is_enabled or not user_ids:
+            return
+        self.stats.invalidations += len(user_ids)
+        keys = []
+        for user_id in user_ids:
+            keys += [self._known_key(user_id), self._completed_key(user_id)]
+        try:
+            await self._redis.delete(*keys)
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка сброса состояния достижений пользователей ids=%s: %s",
+                sorted(user_ids), e,
+            )
+
+    async def _read(
+            self,
+            user_ids: list[int],
+    ) -> dict[int, tuple[bytes, bytes]] | None:
+        if not self.is_enabled:
+            return None
+        keys = []
+        for user_id in user_ids:
+            keys += [self._known_key(user_id), self._completed_key(user_id)]
+        try:
+            values = await self._redis.mget(keys)
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка чтения состояния достижений пользователей ids=%s: %s",
+                user_ids, e,
+            )
+            return None
+        return {
+            user_id: (values[i * 2] or b"", values[i * 2 + 1] or b"")
+            for i, user_id in enumerate(user_ids)
+        }
+
+
+achievement_state_cache = AchievementStateCache()
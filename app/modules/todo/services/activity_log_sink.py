@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.modules.todo.models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+_COLUMNS = (
+    "user_id",
+    "task_id",
+    "list_id",
+    "action",
+    "old_value",
+    "new_value",
+    "extra",
+    "success",
+    "created_at",
+)
+
+
+@dataclass(slots=True)
+class SinkStats:
+    enqueued: int = 0
+    written: int = 0
+    dropped: int = 0
+    failed: int = 0
+    batches: int = 0
+
+
+class ActivityLogSink:
+    """
+    Фоновая запись логов действий пользователей.
+
+    Записи складываются в ограниченную очередь и пишутся отдельным
+    воркером пачками по batch_size строк или раз в flush_interval
+    секунд, в своей транзакции. Если очередь заполнена дольше
+    put_timeout секунд, запись отбрасывается, чтобы не задерживать
+    ответ пользователю. При остановке очередь дописывается.
+    """
+
+    def __init__(
+            self,
+            batch_size: int = 200,
+            flush_interval: float = 1.0,
+            max_queue_size: int = 10_000,
+            put_timeout: float = 0.05,
+            stop_timeout: float = 10.0,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.put_timeout = put_timeout
+        self.stop_timeout = stop_timeout
+        self.stats = SinkStats()
+        self._session_maker: async_sessionmaker[AsyncSession] | None = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self, session_maker: async_sessionmaker[AsyncSession]):
+        if self.is_running:
+            return
+        self._session_maker = session_maker
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(
+            self._run(), name="activity-log-sink"
+        )
+        logger.info("Запущена фоновая запись логов действий")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        logger.info(
+            "Остановка фоновой записи логов действий, в очереди %d записей",
+            self.queue_size,
+        )
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._worker, timeout=self.stop_timeout)
+        except TimeoutError:
+            logger.warning(
+                "Запись логов действий не завершилась за %s с, "
+                "потеряно записей: %d",
+                self.stop_timeout, self.queue_size,
+            )
+            self._worker.cancel()
+        self._worker = None
+        self._queue = None
+
+    async def put(self, record: dict[str, Any]) -> bool:
+        """
+        Постановка записи в очередь
+        :param record: значения столбцов activity_logs
+        :return: True, если запись принята
+        """
+        row = {column: record.get(column) for column in _COLUMNS}
+        for column in ("old_value", "new_value"):
+            if row[column] is not None:
+                row[column] = str(row[column])
+        if row["created_at"] is None:
+            row["created_at"] = datetime.now(timezone.utc)
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(
+                    self._queue.put(row), timeout=self.put_timeout
+                )
+            except TimeoutError:
+                self.stats.dropped += 1
+                logger.warning(
+                    "Очередь логов действий заполнена, запись action=%s "
+                    "отброшена",
+                    row["action"],
+                )
+                return False
+        self.stats.enqueued += 1
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(
+                        self._queue.get(), timeout=timeout
+                    )
+                except TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write(batch)
+        logger.info("Фоновая запись логов действий остановлена")
+
+    async def _write(self, batch: list[dict[str, Any]]):
+        try:
+            async with self._session_maker() as session:
+                await session.execute(insert(ActivityLog), batch)
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.warning(
+                "Ошибка записи пачки из %d логов действий, "
+                "запись по одному: %s",
+                len(batch), e,
+            )
+            await self._write_one_by_one(batch)
+            return
+        except Exception as e:
+            self.stats.failed += len(batch)
+            logger.exception(
+                "Не удалось записать %d логов действий: %s", len(batch), e
+            )
+            return
+        self.stats.batches += 1
+        self.stats.written += len(batch)
+        logger.debug("Записана пачка из %d логов действий", len(batch))
+
+    async def _write_one_by_one(self, batch: list[dict[str, Any]]):
+        for row in batch:
+            try:
+                async with self._session_maker() as session:
+                    await session.execute(insert(ActivityLog), [row])
+                    await session.commit()
+            except Exception as e:
+                self.stats.failed += 1
+                logger.warning(
+                    "Лог действия action=%s пользователя id=%s "
+                    "не записан: %s",
+                    row["action"], row["user_id"], e,
+                )
+                continue
+            self.stats.written += 1
+
+
+activity_log_sink = ActivityLogSink()
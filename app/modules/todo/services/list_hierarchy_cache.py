@@ -0,0 +1,183 @@
+import json
+import logging
+from dataclasses import dataclass
+from typing import Iterable, NamedTuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.modules.todo.models import SystemListTypeEnum
+
+logger = logging.getLogger(__name__)
+
+
+class ListNode(NamedTuple):
+    list_id: int
+    title: str
+    parent_list_id: int | None
+    position: int
+    system_type: SystemListTypeEnum | None
+    pos: str
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ListHierarchyCache:
+    """
+    Кэш упорядоченного дерева списков пользователя в Redis.
+
+    Для каждого пользователя хранится счётчик версии и дерево,
+    записанное под ключом с этой версией. Инвалидация увеличивает
+    версию, поэтому дерево, прочитанное из БД до изменения
+    и записанное после него, уже никогда не будет прочитано.
+    Без настроенного клиента Redis кэш ничего не хранит.
+    """
+
+    def __init__(self, ttl: int = 24 * 3600, prefix: str = "lists_tree"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+        self._redis: Redis | None = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._redis is not None
+
+    def setup(self, redis: Redis | None):
+        self._redis = redis
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}:version"
+
+    def _tree_key(self, user_id: int, version: int) -> str:
+        return f"{self.prefix}:{user_id}:{version}"
+
+    async def get_version(self, user_id: int) -> int:
+        version = await self._redis.get(self._version_key(user_id))
+        return int(version) if version else 0
+
+    async def get(
+            self,
+            user_id: int,
+    ) -> tuple[list[ListNode] | None, int | None]:
+        """
+        Чтение дерева списков пользователя
+        :param user_id: ID пользователя
+        :return: дерево (None при промахе) и версия, под которой
+        следует сохранить дерево, прочитанное из БД
+        """
+        if not self.is_enabled:
+            return None, None
+        try:
+            version = await self.get_version(user_id)
+            payload = await self._redis.get(self._tree_key(user_id, version))
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка чтения кэша списков пользователя id=%d: %s",
+                user_id, e,
+            )
+            return None, None
+
+        if payload is None:
+            self.stats.misses += 1
+            logger.debug(
+                "Промах кэша списков пользователя id=%d, версия %d",
+                user_id, version,
+            )
+            return None, version
+
+        self.stats.hits += 1
+        logger.debug(
+            "Попадание в кэш списков пользователя id=%d, версия %d",
+            user_id, version,
+        )
+        return self.loads(payload), version
+
+    async def set(
+            self,
+            user_id: int,
+            version: int,
+            nodes: Iterable[ListNode],
+    ):
+        if not self.is_enabled:
+            return
+        try:
+            await self._redis.set(
+                self._tree_key(user_id, version),
+                self.dumps(nodes),
+                ex=self.ttl,
+            )
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка записи кэша списков пользователя id=%d: %s",
+                user_id, e,
+            )
+
+    async def invalidate(self, *user_ids: int):
+        if not self.is_enabled or not user_ids:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.incr(self._version_key(user_id))
+                await pipe.execute()
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка сброса кэша списков пользователей %s: %s",
+                user_ids, e,
+            )
+            return
+        self.stats.invalidations += len(user_ids)
+        logger.debug("Сброшен кэш списков пользователей %s", user_ids)
+
+    @staticmethod
+    def dumps(nodes: Iterable[ListNode]) -> str:
+        return json.dumps(
+            [
+                [
+                    node.list_id,
+                    node.title,
+                    node.parent_list_id,
+                    node.position,
+                    node.system_type.name if node.system_type else None,
+                    node.pos,
+                ]
+                for node in nodes
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @staticmethod
+    def loads(payload: str | bytes) -> list[ListNode]:
+        return [
+            ListNode(
+                list_id=list_id,
+                title=title,
+                parent_list_id=parent_list_id,
+                position=position,
+                system_type=(
+                    SystemListTypeEnum[system_type] if system_type else None
+                ),
+                pos=pos,
+            )
+            for list_id, title, parent_list_id, position, system_type, pos
+            in json.loads(payload)
+        ]
+
+
+list_hierarchy_cache = ListHierarchyCache()
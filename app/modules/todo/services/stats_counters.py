@@ -0,0 +1,505 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.db.transaction_hooks import after_commit, after_rollback
+from app.modules.todo.crud.stats import (
+    apply_users_stats_deltas,
+    get_users_stats_merged,
+)
+from app.modules.todo.models import UserStats
+
+logger = logging.getLogger(__name__)
+
+# KEYS: хэши счётчиков пользователей, затем хэши неперенесённых
+# приращений, затем множество пользователей с приращениями.
+# ARGV: приращение, ttl, число пользователей, их ID, категории.
+# Если в хэше счётчиков нет какой-то категории, ничего не меняется
+# и возвращаются номера таких пользователей (их нужно загрузить из БД).
+INCREMENT_LUA = """
+local delta = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local users = tonumber(ARGV[3])
+local first_category = users + 4
+local missing = {}
+for i = 1, users do
+    for c = first_category, #ARGV do
+        if redis.call('HEXISTS', KEYS[i], ARGV[c]) == 0 then
+            table.insert(missing, i)
+            break
+        end
+    end
+end
+if #missing > 0 then
+    return {0, missing}
+end
+local values = {}
+for i = 1, users do
+    for c = first_category, #ARGV do
+        table.insert(values, redis.call('HINCRBY', KEYS[i], ARGV[c], delta))
+        redis.call('HINCRBY', KEYS[users + i], ARGV[c], delta)
+    end
+    redis.call('EXPIRE', KEYS[i], ttl)
+    redis.call('SADD', KEYS[users * 2 + 1], ARGV[3 + i])
+end
+return {1, values}
+"""
+
+# KEYS: хэши счётчиков пользователей, затем хэши неперенесённых
+# приращений, затем множество пользователей с приращениями.
+# ARGV: приращение, число пользователей, их ID, категории.
+# Отменяет приращение откатившейся транзакции: хэш приращений
+# уменьшается всегда, хэш счётчиков - только если категория в нём есть
+# (иначе она загрузится из БД уже с учётом отмены).
+REVERT_LUA = """
+local delta = tonumber(ARGV[1])
+local users = tonumber(ARGV[2])
+local first_category = users + 3
+for i = 1, users do
+    for c = first_category, #ARGV do
+        if redis.call('HEXISTS', KEYS[i], ARGV[c]) == 1 then
+            redis.call('HINCRBY', KEYS[i], ARGV[c], -delta)
+        end
+        redis.call('HINCRBY', KEYS[users + i], ARGV[c], -delta)
+    end
+    redis.call('SADD', KEYS[users * 2 + 1], ARGV[2 + i])
+end
+return users
+"""
+
+# KEYS: пары (хэш счётчиков, хэш приращений) пользователей, затем
+# номер поколения переносов.
+# ARGV: поколение на момент чтения БД, ttl, число категорий, категории,
+# значения из БД по пользователям.
+# Отсутствующая категория получает значение из БД плюс ещё
+# не перенесённое в БД приращение; существующие не меняются.
+# Если после чтения БД начался перенос или сброс счётчиков, значения
+# из БД могли устареть: ничего не меняется и возвращается 0.
+HYDRATE_LUA = """
+local generation = KEYS[#KEYS]
+if (redis.call('GET', generation) or '0') ~= ARGV[1] then
+    return 0
+end
+local ttl = tonumber(ARGV[2])
+local categories = tonumber(ARGV[3])
+local users = (#KEYS - 1) / 2
+for i = 1, users do
+    local counters = KEYS[i * 2 - 1]
+    local pending = KEYS[i * 2]
+    for c = 1, categories do
+        local category = ARGV[3 + c]
+        local value = tonumber(ARGV[3 + categories + (i - 1) * categories + c])
+        local delta = tonumber(redis.call('HGET', pending, category) or '0')
+        redis.call('HSETNX', counters, category, value + delta)
+    end
+    redis.call('EXPIRE', counters, ttl)
+end
+return users
+"""
+
+# KEYS: хэши приращений, затем номер поколения переносов и счётчик
+# незавершённых переносов. ARGV: ttl счётчика незавершённых переносов.
+# Возвращает содержимое хэшей и удаляет их
+TAKE_PENDING_LUA = """
+local users = #KEYS - 2
+local result = {}
+for i = 1, users do
+    result[i] = redis.call('HGETALL', KEYS[i])
+    redis.call('DEL', KEYS[i])
+end
+redis.call('INCR', KEYS[users + 1])
+redis.call('INCR', KEYS[users + 2])
+redis.call('EXPIRE', KEYS[users + 2], ARGV[1])
+return result
+"""
+
+# KEYS: счётчик незавершённых переносов
+FINISH_FLUSH_LUA = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(slots=True)
+class CountersStats:
+    increments: int = 0
+    hydrated_users: int = 0
+    redis_errors: int = 0
+    flushes: int = 0
+    flushed_users: int = 0
+    failed: int = 0
+
+
+class StatsCounters:
+    """
+    Счётчики статистики пользователей в хэшах Redis с отложенной
+    записью в user_stats.
+
+    Приращение - одно обращение к Redis: HINCRBY счётчиков пользователя
+    и хэша его неперенесённых приращений, ID пользователя попадает
+    в множество "грязных". Раз в interval секунд воркер забирает
+    до batch_size грязных пользователей и прибавляет их приращения
+    к user_stats одним запросом; если запись не удалась, приращения
+    возвращаются в Redis.
+
+    Категории, которых нет в хэше (новый пользователь, истёкший ttl,
+    потеря данных Redis), загружаются из user_stats с учётом
+    неперенесённых приращений. Загрузка повторяется, если во время
+    чтения БД шёл перенос. При потере данных Redis пропадают
+    только приращения, не перенесённые за последний interval.
+    Если транзакция, сделавшая приращение, откатилась, оно отменяется.
+    Ошибка Redis при приращении возвращает None, и вызывающий пишет
+    статистику в БД сам.
+    """
+
+    def __init__(
+            self,
+            ttl: int = 86400,
+            interval: float = 5.0,
+            batch_size: int = 5000,
+            prefix: str = "stats",
+            hydrate_attempts: int = 3,
+            hydrate_retry_delay: float = 0.05,
+            flush_timeout: int = 60,
+    ):
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.hydrate_attempts = hydrate_attempts
+        self.hydrate_retry_delay = hydrate_retry_delay
+        # Если перенос прервался, не завершив счётчик незавершённых
+        # переносов, загрузка из БД снова возможна через flush_timeout
+        self.flush_timeout = flush_timeout
+        self.stats = CountersStats()
+        self._redis: Redis | None = None
+        self._session_maker: async_sessionmaker[AsyncSession] | None = None
+        self._worker: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+        self._increment = None
+        self._revert = None
+        self._hydrate = None
+        self._take_pending = None
+        self._finish_flush = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def dirty_key(self) -> str:
+        return f"{self.prefix}:dirty"
+
+    @property
+    def generation_key(self) -> str:
+        return f"{self.prefix}:flush:generation"
+
+    @property
+    def flushing_key(self) -> str:
+        return f"{self.prefix}:flush:running"
+
+    def _counters_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def _pending_key(self, user_id: int) -> str:
+        return f"{self.prefix}:pending:{user_id}"
+
+    def setup(
+            self,
+            redis: Redis,
+            ttl: int | None = None,
+            interval: float | None = None,
+            batch_size: int | None = None,
+    ):
+        self._redis = redis
+        self._increment = redis.register_script(INCREMENT_LUA)
+        self._revert = redis.register_script(REVERT_LUA)
+        self._hydrate = redis.register_script(HYDRATE_LUA)
+        self._take_pending = redis.register_script(TAKE_PENDING_LUA)
+        self._finish_flush = redis.register_script(FINISH_FLUSH_LUA)
+        if ttl is not None:
+            self.ttl = ttl
+        if interval is not None:
+            self.interval = interval
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+    def start(self, session_maker: async_sessionmaker[AsyncSession]):
+        if self.is_running:
+            return
+        self._session_maker = session_maker
+        self._stopping.clear()
+        self._worker = asyncio.create_task(
+            self._run(), name="stats-counters-flush"
+        )
+        logger.info("Запущена отложенная запись счётчиков статистики")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        # Без отмены: забранные из Redis приращения дописываются в БД
+        self._stopping.set()
+        await self._worker
+        self._worker = None
+        await self.flush()
+        logger.info("Отложенная запись счётчиков статистики остановлена")
+
+    async def increment(
+            self,
+            session: AsyncSession,
+            user_ids: list[int],
+            categories: list,
+            delta: int = 1,
+    ) -> dict[int, UserStats] | None:
+        """
+        Приращение счётчиков статистики нескольких пользователей
+        :param session: сессия СУБД для загрузки отсутствующих счётчиков;
+        при откате её транзакции приращение отменяется
+        :param user_ids: ID пользователей
+        :param categories: категории статистики
+        :param delta: 1 при начислении, -1 при откате
+        :return: словарь {ID пользователя: статистика} с новыми значениями
+        категорий или None, если Redis недоступен
+        """
+        keys = self._increment_keys(user_ids)
+        args = [delta, self.ttl, len(user_ids), *user_ids, *categories]
+        try:
+            applied, values = await self._increment(keys=keys, args=args)
+            if not applied:
+                missing = [user_ids[index - 1] for index in values]
+                await self._hydrate_users(session, missing, categories)
+                applied, values = await self._increment(keys=keys, args=args)
+                if not applied:
+                    raise RedisError("счётчики пропали после загрузки")
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.warning(
+                "Ошибка счётчиков статистики в Redis, запись в БД: %s", e
+            )
+            # Вызывающий изменит user_stats в обход Redis
+            after_commit(session, partial(self.invalidate, *user_ids))
+            return None
+        self.stats.increments += 1
+        after_rollback(session, partial(
+            self._revert_increment, user_ids, categories, delta
+        ))
+
+        users_stats = {}
+        for position, user_id in enumerate(user_ids):
+            offset = position * len(categories)
+            users_stats[user_id] = UserStats(user_id=user_id, **{
+                category: int(values[offset + index])
+                for index, category in enumerate(categories)
+            })
+        return users_stats
+
+    def _increment_keys(self, user_ids: list[int]) -> list[str]:
+        keys = [self._counters_key(user_id) for user_id in user_ids]
+        keys += [self._pending_key(user_id) for user_id in user_ids]
+        keys.append(self.dirty_key)
+        return keys
+
+    async def _revert_increment(
+            self,
+            user_ids: list[int],
+            categories: list,
+            delta: int,
+    ):
+        logger.debug(
+            "Отмена приращения %d счётчиков статистики (categories=%s) "
+            "пользователей ids=%s после отката транзакции",
+            delta, categories, user_ids,
+        )
+        try:
+            await self._revert(
+                keys=self._increment_keys(user_ids),
+                args=[delta, len(user_ids), *user_ids, *categories],
+            )
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.error(
+                "Не отменено приращение счётчиков статистики "
+                "%d пользователей после отката транзакции: %s",
+                len(user_ids), e,
+            )
+
+    async def _hydrate_users(
+            self,
+            session: AsyncSession,
+            user_ids: list[int],
+            categories: list,
+    ):
+        logger.debug(
+            "Загрузка счётчиков статистики (categories=%s) "
+            "пользователей ids=%s из БД",
+            categories, user_ids,
+        )
+        keys = []
+        for user_id in user_ids:
+            keys += [self._counters_key(user_id), self._pending_key(user_id)]
+        keys.append(self.generation_key)
+        for attempt in range(self.hydrate_attempts):
+            if attempt:
+                await asyncio.sleep(self.hydrate_retry_delay)
+            # Перенос забирает приращения из Redis раньше, чем фиксирует
+            # их в БД: пока он не завершён, значения из БД неполны
+            generation, flushing = await self._redis.mget(
+                self.generation_key, self.flushing_key
+            )
+            if int(flushing or 0) > 0:
+                continue
+            users_stats = await get_users_stats_merged(
+                session, user_ids, categories
+            )
+            values = [
+                getattr(users_stats[user_id], category)
+                for user_id in user_ids
+                for category in categories
+            ]
+            if await self._hydrate(keys=keys, args=[
+                int(generation or 0), self.ttl, len(categories),
+                *categories, *values,
+            ]):
+                self.stats.hydrated_users += len(user_ids)
+                return
+        raise RedisError("не удалось загрузить счётчики во время переноса")
+
+    async def flush(self) -> int:
+        """
+        Перенос приращений всех грязных пользователей в user_stats
+        :return: количество пользователей, чьи приращения перенесены
+        """
+        total = 0
+        while True:
+            try:
+                user_ids = await self._redis.spop(
+                    self.dirty_key, self.batch_size
+                )
+                if not user_ids:
+                    break
+                user_ids = [int(user_id) for user_id in user_ids]
+                pending = await self._take_pending(
+                    keys=[
+                        *(self._pending_key(user_id) for user_id in user_ids),
+                        self.generation_key,
+                        self.flushing_key,
+                    ],
+                    args=[self.flush_timeout],
+                )
+            except RedisError as e:
+                self.stats.redis_errors += 1
+                logger.warning(
+                    "Ошибка чтения приращений статистики из Redis: %s", e
+                )
+                break
+
+            totals = {}
+            for user_id, fields in zip(user_ids, pending):
+                counters = {
+                    (category.decode() if isinstance(category, bytes)
+                     else category): int(value)
+                    for category, value in zip(fields[::2], fields[1::2])
+                }
+                counters = {
+                    category: value
+                    for category, value in counters.items() if value
+                }
+                if counters:
+                    totals[user_id] = counters
+            written = not totals or await self._write(totals)
+            await self._finish()
+            if not written:
+                break
+            total += len(totals)
+            if len(user_ids) < self.batch_size:
+                break
+        if total:
+            logger.debug(
+                "Перенесены счётчики статистики %d пользователей", total
+            )
+        return total
+
+    async def _finish(self):
+        try:
+            await self._finish_flush(keys=[self.flushing_key])
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.warning(
+                "Ошибка завершения переноса счётчиков статистики: %s", e
+            )
+
+    async def invalidate(self, *user_ids: int):
+        """
+        Удаление хэшей счётчиков пользователей после изменения user_stats
+        в обход Redis. Неперенесённые приращения сохраняются и будут
+        учтены при заполнении хэша из БД; начатая до сброса загрузка
+        из БД не запишет устаревшие значения
+        :param user_ids: ID пользователей
+        """
+        if self._redis is None or not user_ids:
+            return
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.delete(*(
+                    self._counters_key(user_id) for user_id in user_ids
+                ))
+                pipe.incr(self.generation_key)
+                await pipe.execute()
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.warning(
+                "Ошибка сброса счётчиков статистики %d пользователей: %s",
+                len(user_ids), e,
+            )
+
+    async def _write(self, totals: dict[int, dict[str, int]]) -> bool:
+        try:
+            async with self._session_maker() as session:
+                await apply_users_stats_deltas(session, totals)
+                await session.commit()
+        except Exception as e:
+            self.stats.failed += 1
+            logger.exception(
+                "Ошибка записи счётчиков статистики %d пользователей, "
+                "приращения возвращены в Redis: %s",
+                len(totals), e,
+            )
+            await self._restore(totals)
+            return False
+        self.stats.flushes += 1
+        self.stats.flushed_users += len(totals)
+        return True
+
+    async def _restore(self, totals: dict[int, dict[str, int]]):
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                for user_id, counters in totals.items():
+                    for category, value in counters.items():
+                        pipe.hincrby(self._pending_key(user_id), category, value)
+                pipe.sadd(self.dirty_key, *totals)
+                await pipe.execute()
+        except RedisError as e:
+            self.stats.redis_errors += 1
+            logger.error(
+                "Приращения статистики %d пользователей потеряны: %s",
+                len(totals), e,
+            )
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.interval
+                )
+            except TimeoutError:
+                await self.flush()
+
+
+stats_counters = StatsCounters()
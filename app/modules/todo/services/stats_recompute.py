@@ -0,0 +1,541 @@
+"""
+Пересчёт статистики и достижений пользователей по исходным данным.
+
+Счётчики выполненных и отменённых задач считаются по задачам
+(tasks + task_accesses) с добавлением выполнений и отмен уже удалённых
+задач из activity_logs, счётчики созданных задач и списков - по
+activity_logs. Остальные категории не пересчитываются, но отрицательные
+значения в них обнуляются. Достижения всех категорий проверяются
+по итоговой статистике с нуля.
+
+Пользователи делятся на шарды по user_id % shards, шарды
+обрабатываются в пуле процессов. Без --apply изменения только
+выводятся. По умолчанию счётчики только увеличиваются до пересчитанных
+значений: журнал действий может быть неполным (например, после
+потери логов при переполнении очереди), а удалённые задачи не дают
+разбивки по приоритету и срочности. --exact записывает пересчитанные
+значения как есть. Для точного результата бот должен быть остановлен.
+
+При STATS_WRITE_MODE=redis часть приращений может ждать переноса
+в хэшах stats:pending:<ID>, которых нет в user_stats: после записи
+исправлений перенос прибавил бы их повторно. Поэтому --apply
+запускается только после остановки бота и полного переноса, пока
+множество stats:dirty не пусто, запись отклоняется.
+
+Запуск:
+    python -m app.modules.todo.services.stats_recompute --shards 8
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import product
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.modules.todo.crud.achievement import (
+    get_users_completed_achievements,
+    upsert_users_achievements,
+)
+from app.modules.todo.crud.stats import (
+    STATS_CATEGORIES,
+    apply_users_stats_deltas,
+    get_users_stats_events_totals,
+    make_logged_actions_stmt,
+    make_task_outcomes_stmt,
+    make_users_stats_stmt,
+    stream_partitions,
+)
+from app.modules.todo.crud.task import get_stats_and_achievs_categories
+from app.modules.todo.models import LevelEnum, TaskStatusEnum
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+from app.modules.todo.services.achievement_state_cache import (
+    achievement_state_cache,
+)
+from app.modules.todo.services.stats_counters import stats_counters
+
+logger = logging.getLogger(__name__)
+
+TASK_ACTIONS = {
+    TaskStatusEnum.DONE: "complete",
+    TaskStatusEnum.CANCELED: "cancel",
+}
+# Действие журнала: (категория, приращение)
+LOGGED_ACTIONS = {
+    "create_task": ("tasks_created", 1),
+    "add_list": ("lists_created", 1),
+    "delete_list": ("lists_deleted", 1),
+}
+# Действия с задачами, которые уже удалены и не попадают в выборку задач
+DELETED_TASK_ACTIONS = {
+    "complete_task": ("tasks_completed", 1),
+    "not_complete_task": ("tasks_completed", -1),
+    "cancel_task": ("tasks_canceled", 1),
+    "not_cancel_task": ("tasks_canceled", -1),
+}
+STATS_CATEGORIES_SET = frozenset(STATS_CATEGORIES)
+
+
+@lru_cache(maxsize=None)
+def get_task_outcome_categories(
+        status: TaskStatusEnum,
+        priority: LevelEnum,
+        urgency: LevelEnum,
+        is_checked: bool,
+        is_shared: bool,
+        before_deadline: bool | None,
+) -> tuple[str, ...]:
+    """
+    Категории статистики, которые выполнение или отмена задачи
+    увеличивает каждому её пользователю
+    """
+    categories = get_stats_and_achievs_categories(
+        {
+            "priority": priority,
+            "urgency": urgency,
+            "parent_task_id": is_checked or None,
+            "is_shared": is_shared,
+        },
+        TASK_ACTIONS[status],
+    )
+    if status == TaskStatusEnum.DONE and before_deadline is not None:
+        categories.append(
+            "tasks_completed_before_deadline" if before_deadline
+            else "tasks_completed_after_deadline"
+        )
+    return tuple(categories)
+
+
+RECOMPUTED_CATEGORIES = sorted({
+    *(category for category, _delta in LOGGED_ACTIONS.values()),
+    *(category for category, _delta in DELETED_TASK_ACTIONS.values()),
+    *(
+        category
+        for outcome in product(
+            TASK_ACTIONS, LevelEnum, LevelEnum,
+            (False, True), (False, True), (None, False, True),
+        )
+        for category in get_task_outcome_categories(*outcome)
+    ),
+})
+
+
+@dataclass(frozen=True, slots=True)
+class StatsDiff:
+    user_id: int
+    category: str
+    stored: int
+    expected: int
+
+
+@dataclass(frozen=True, slots=True)
+class AchievementDiff:
+    user_id: int
+    achievement_id: int
+    is_completed: bool
+
+
+@dataclass(slots=True)
+class ShardReport:
+    shard: int
+    users: int = 0
+    rows: int = 0
+    changed_users: int = 0
+    stats_changes: int = 0
+    achievement_changes: int = 0
+    elapsed: float = 0.0
+    stats_diffs: list[StatsDiff] = field(default_factory=list)
+    achievement_diffs: list[AchievementDiff] = field(default_factory=list)
+
+
+def add_task_outcomes(
+        totals: dict[int, dict[str, int]],
+        rows,
+):
+    """
+    Добавление к пересчитанным счётчикам сгруппированных задач
+    :param totals: словарь {ID пользователя: {категория: значение}}
+    :param rows: строки make_task_outcomes_stmt
+    """
+    for user_id, *outcome, count in rows:
+        counters = totals[user_id]
+        for category in get_task_outcome_categories(*outcome):
+            counters[category] += count
+
+
+def add_logged_actions(
+        totals: dict[int, dict[str, int]],
+        rows,
+):
+    """
+    Добавление к пересчитанным счётчикам действий из журнала
+    :param totals: словарь {ID пользователя: {категория: значение}}
+    :param rows: строки make_logged_actions_stmt
+    """
+    for user_id, action, task_deleted, count in rows:
+        if action in LOGGED_ACTIONS:
+            category, delta = LOGGED_ACTIONS[action]
+        elif task_deleted and action in DELETED_TASK_ACTIONS:
+            category, delta = DELETED_TASK_ACTIONS[action]
+        else:
+            continue
+        totals[user_id][category] += delta * count
+
+
+def get_expected_stats(
+        stored: dict[str, int],
+        computed: dict[str, int],
+        exact: bool = False,
+) -> dict[str, int]:
+    """
+    Итоговая статистика пользователя
+    :param stored: текущие значения счётчиков
+    :param computed: пересчитанные значения
+    :param exact: записывать пересчитанные значения как есть,
+    а не только увеличивать до них счётчики
+    :return: словарь {категория: значение} для всех категорий
+    """
+    expected = {
+        category: max(stored.get(category, 0), 0)
+        for category in STATS_CATEGORIES
+    }
+    for category in RECOMPUTED_CATEGORIES:
+        value = max(computed.get(category, 0), 0)
+        expected[category] = value if exact else max(value, expected[category])
+    return expected
+
+
+async def reconcile_users(
+        session: AsyncSession,
+        catalog: AchievementCatalog,
+        users_stats: dict[int, dict[str, int]],
+        computed: dict[int, dict[str, int]],
+        report: ShardReport,
+        exact: bool = False,
+        apply: bool = False,
+        max_diffs: int = 0,
+):
+    """
+    Сверка пачки пользователей с пересчитанными значениями и,
+    при apply, запись исправлений в одной транзакции
+    :param session: сессия СУБД
+    :param catalog: загруженный справочник достижений
+    :param users_stats: словарь {ID пользователя: строка user_stats}
+    :param computed: пересчитанные счётчики шарда; сверенные
+    пользователи из него удаляются
+    :param report: отчёт шарда
+    :param exact: записывать пересчитанные значения как есть
+    :param apply: записать исправления
+    :param max_diffs: сколько расхождений сохранить в отчёте
+    """
+    user_ids = list(users_stats)
+    events = await get_users_stats_events_totals(session, user_ids)
+    users_completed = await get_users_completed_achievements(
+        session, user_ids, catalog.get_related_ids(STATS_CATEGORIES)
+    )
+    unlocked_at = datetime.now(timezone.utc)
+    deltas: dict[int, dict[str, int]] = {}
+    achievs_updates = []
+    for user_id, row in users_stats.items():
+        stored = dict(row)
+        for category, delta in events.get(user_id, {}).items():
+            stored[category] = stored.get(category, 0) + delta
+        expected = get_expected_stats(
+            stored, computed.pop(user_id, {}), exact
+        )
+        user_deltas = {
+            category: value - stored.get(category, 0)
+            for category, value in expected.items()
+            if value != stored.get(category, 0)
+        }
+        completed = users_completed[user_id]
+        expected_completed = catalog.get_completed_ids(
+            STATS_CATEGORIES_SET, completed, expected
+        )
+        changed_ids = sorted(completed ^ expected_completed)
+        if user_deltas:
+            deltas[user_id] = user_deltas
+        for achievement_id in changed_ids:
+            is_completed = achievement_id in expected_completed
+            category = catalog.get(achievement_id).category
+            achievs_updates.append({
+                "user_id": user_id,
+                "achievement_id": achievement_id,
+                "progress": expected[category],
+                "is_completed": is_completed,
+                "unlocked_at": unlocked_at if is_completed else None,
+            })
+        if user_deltas or changed_ids:
+            report.changed_users += 1
+        report.stats_changes += len(user_deltas)
+        report.achievement_changes += len(changed_ids)
+        for category, delta in user_deltas.items():
+            if len(report.stats_diffs) < max_diffs:
+                report.stats_diffs.append(StatsDiff(
+                    user_id, category, stored.get(category, 0),
+                    stored.get(category, 0) + delta,
+                ))
+        for achievement_id in changed_ids:
+            if len(report.achievement_diffs) < max_diffs:
+                report.achievement_diffs.append(AchievementDiff(
+                    user_id, achievement_id,
+                    achievement_id in expected_completed,
+                ))
+    report.users += len(user_ids)
+
+    if not apply or not (deltas or achievs_updates):
+        return
+    # Исправления пишутся приращениями, а не значениями: так они
+    # не затирают неперенесённые события журнала stats_events
+    if deltas:
+        await apply_users_stats_deltas(session, deltas)
+    if achievs_updates:
+        await upsert_users_achievements(session, achievs_updates)
+    await session.commit()
+    await stats_counters.invalidate(*deltas)
+    await achievement_state_cache.update(achievs_updates)
+    logger.info(
+        "Исправлена статистика %d и достижения %d пользователей",
+        len(deltas), len({update["user_id"] for update in achievs_updates}),
+    )
+
+
+async def recompute_shard(
+        session_maker: async_sessionmaker[AsyncSession],
+        shard: int,
+        shards: int,
+        batch_size: int = 1000,
+        exact: bool = False,
+        apply: bool = False,
+        max_diffs: int = 0,
+) -> ShardReport:
+    """
+    Пересчёт статистики и достижений пользователей шарда.
+    Задачи и журнал действий читаются курсором на стороне сервера
+    уже сгруппированными по признакам, определяющим категории,
+    затем строки user_stats сверяются пачками по batch_size
+    :param session_maker: фабрика сессий СУБД
+    :param shard: номер шарда
+    :param shards: количество шардов
+    :param batch_size: строк в пачке курсора и пользователей в пачке сверки
+    :param exact: записывать пересчитанные значения как есть
+    :param apply: записать исправления
+    :param max_diffs: сколько расхождений сохранить в отчёте
+    :return: отчёт шарда
+    """
+    started = time.perf_counter()
+    report = ShardReport(shard)
+    catalog = AchievementCatalog()
+    computed: dict[int, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    options = {"exact": exact, "apply": apply, "max_diffs": max_diffs}
+    async with session_maker() as reader, session_maker() as writer:
+        await catalog.load(reader)
+        async for rows in stream_partitions(
+                reader, make_task_outcomes_stmt(shard, shards), batch_size
+        ):
+            report.rows += len(rows)
+            add_task_outcomes(computed, rows)
+        actions = [*LOGGED_ACTIONS, *DELETED_TASK_ACTIONS]
+        async for rows in stream_partitions(
+                reader, make_logged_actions_stmt(shard, shards, actions),
+                batch_size,
+        ):
+            report.rows += len(rows)
+            add_logged_actions(computed, rows)
+
+        async for rows in stream_partitions(
+                reader, make_users_stats_stmt(shard, shards), batch_size
+        ):
+            report.rows += len(rows)
+            users_stats = {
+                user_id: dict(zip(STATS_CATEGORIES, values))
+                for user_id, *values in rows
+            }
+            await reconcile_users(
+                writer, catalog, users_stats, computed, report, **options
+            )
+        # Пользователи, у которых ещё нет строки user_stats
+        missing = sorted(computed)
+        for start in range(0, len(missing), batch_size):
+            await reconcile_users(
+                writer,
+                catalog,
+                {user_id: {} for user_id in missing[start:start + batch_size]},
+                computed,
+                report,
+                **options,
+            )
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def make_redis() -> Redis:
+    from app.core.config.settings import config
+
+    return Redis(
+        host=config.redis_settings.host,
+        port=config.redis_settings.port,
+        db=config.redis_settings.db,
+        password=config.redis_settings.password.get_secret_value(),
+        username=config.redis_settings.username,
+    )
+
+
+async def count_unflushed_users() -> int:
+    """
+    Количество пользователей с неперенесёнными в user_stats
+    приращениями счётчиков Redis
+    :return: размер множества грязных пользователей
+    """
+    redis_client = make_redis()
+    try:
+        return await redis_client.scard(stats_counters.dirty_key)
+    finally:
+        await redis_client.aclose()
+
+
+async def _run_shard(
+        shard: int,
+        shards: int,
+        batch_size: int,
+        exact: bool,
+        apply: bool,
+        max_diffs: int,
+) -> ShardReport:
+    from app.core.config.settings import config
+    from app.core.db.session import create_engine
+
+    engine = create_engine(config.pg_settings)
+    redis_client = None
+    if apply:
+        redis_client = make_redis()
+        achievement_state_cache.setup(
+            redis_client, config.achievements_settings.state_cache_ttl
+        )
+        stats_counters.setup(redis_client, config.stats_settings.redis_ttl)
+    try:
+        return await recompute_shard(
+            async_sessionmaker(engine, expire_on_commit=False),
+            shard, shards, batch_size, exact, apply, max_diffs,
+        )
+    finally:
+        await engine.dispose()
+        if redis_client is not None:
+            await redis_client.aclose()
+
+
+def run_shard(
+        shard: int,
+        shards: int,
+        batch_size: int = 1000,
+        exact: bool = False,
+        apply: bool = False,
+        max_diffs: int = 0,
+) -> ShardReport:
+    """
+    Точка входа процесса пула: у каждого процесса свои соединения
+    с Postgres и Redis
+    """
+    # Настройки читаются из окружения только в процессах инструмента
+    from app.core.config.settings import config
+
+    logging.basicConfig(
+        level=logging.getLevelName(level=config.log_settings.level),
+        format=config.log_settings.format,
+    )
+    return asyncio.run(
+        _run_shard(shard, shards, batch_size, exact, apply, max_diffs)
+    )
+
+
+def format_report(report: ShardReport) -> list[str]:
+    lines = [
+        f"user_id={diff.user_id} {diff.category}: "
+        f"{diff.stored} -> {diff.expected}"
+        for diff in report.stats_diffs
+    ]
+    lines.extend(
+        f"user_id={diff.user_id} achievement_id={diff.achievement_id}: "
+        f"{'выдать' if diff.is_completed else 'отозвать'}"
+        for diff in report.achievement_diffs
+    )
+    elapsed = max(report.elapsed, 1e-9)
+    lines.append(
+        f"Шард {report.shard}: пользователей {report.users}, "
+        f"изменений статистики {report.stats_changes}, "
+        f"достижений {report.achievement_changes} "
+        f"у {report.changed_users} пользователей; "
+        f"{report.rows} строк за {report.elapsed:.2f} с "
+        f"({report.rows / elapsed:.0f} строк/с, "
+        f"{report.users / elapsed:.0f} пользователей/с)"
+    )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пересчёт статистики и достижений пользователей"
+    )
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-diffs", type=int, default=20,
+                        help="сколько расхождений вывести на шард")
+    parser.add_argument("--exact", action="store_true",
+                        help="записывать пересчитанные значения как есть")
+    parser.add_argument("--apply", action="store_true",
+                        help="записать исправления (без него - только вывод)")
+    args = parser.parse_args()
+
+    if args.apply:
+        unflushed = asyncio.run(count_unflushed_users())
+        if unflushed:
+            parser.error(
+                f"у {unflushed} пользователей есть неперенесённые "
+                "приращения счётчиков в Redis: остановите бота, дождитесь "
+                "переноса и повторите запуск"
+            )
+
+    started = time.perf_counter()
+    reports = []
+    # spawn: дочерние процессы не наследуют соединения и цикл событий
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+            max_workers=args.workers or args.shards, mp_context=context
+    ) as executor:
+        futures = [
+            executor.submit(
+                run_shard, shard, args.shards, args.batch_size,
+                args.exact, args.apply, args.max_diffs,
+            )
+            for shard in range(args.shards)
+        ]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            print("\n".join(format_report(report)))
+
+    elapsed = time.perf_counter() - started
+    users = sum(report.users for report in reports)
+    rows = sum(report.rows for report in reports)
+    print(
+        f"Всего: пользователей {users}, изменено "
+        f"{sum(report.changed_users for report in reports)}, "
+        f"{rows} строк за {elapsed:.2f} с "
+        f"({rows / elapsed:.0f} строк/с, {users / elapsed:.0f} "
+        f"пользователей/с)"
+    )
+    if not args.apply:
+        print("Проверка без записи: для исправления запустите с --apply")
+
+
+if __name__ == "__main__":
+    main()
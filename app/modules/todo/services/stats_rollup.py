@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.modules.todo.crud.stats import rollup_stats_events
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class RollupStats:
+    runs: int = 0
+    batches: int = 0
+    events: int = 0
+    failed: int = 0
+
+
+class StatsRollup:
+    """
+    Фоновый перенос журнала stats_events в user_stats.
+
+    Раз в interval секунд воркер переносит события пачками
+    по batch_size, каждую в своей транзакции, пока журнал не опустеет.
+    Пока воркер запущен, статистика пишется в журнал, а не в user_stats
+    (см. update_users_stats_achievs). При остановке журнал
+    переносится целиком.
+    """
+
+    def __init__(
+            self,
+            interval: float = 5.0,
+            batch_size: int = 5000,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stats = RollupStats()
+        self._session_maker: async_sessionmaker[AsyncSession] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def setup(
+            self,
+            interval: float | None = None,
+            batch_size: int | None = None,
+    ):
+        if interval is not None:
+            self.interval = interval
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+    def start(self, session_maker: async_sessionmaker[AsyncSession]):
+        if self.is_running:
+            return
+        self._session_maker = session_maker
+        self._worker = asyncio.create_task(
+            self._run(), name="stats-rollup"
+        )
+        logger.info("Запущен перенос событий статистики")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await self.rollup()
+        logger.info("Перенос событий статистики остановлен")
+
+    async def rollup(self) -> int:
+        """
+        Перенос всех накопленных событий
+        :return: количество перенесённых событий
+        """
+        self.stats.runs += 1
+        total = 0
+        while True:
+            try:
+                async with self._session_maker() as session:
+                    moved = await rollup_stats_events(session, self.batch_size)
+                    await session.commit()
+            except Exception as e:
+                self.stats.failed += 1
+                logger.exception(
+                    "Ошибка переноса событий статистики: %s", e
+                )
+                break
+            if moved:
+                self.stats.batches += 1
+                self.stats.events += moved
+                total += moved
+            if moved < self.batch_size:
+                break
+        if total:
+            logger.debug("Перенесено %d событий статистики", total)
+        return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.rollup()
+
+
+stats_rollup = StatsRollup()
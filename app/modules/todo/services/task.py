@@ -1,22 +1,20 @@
 import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import partial
 from typing import Any
 from zoneinfo import ZoneInfo
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.db.transaction_hooks import after_commit
 from app.modules.todo.crud.achievement import (
-    get_achievements_by_categories,
-    get_user_achievements,
-    upsert_user_achievements,
-    get_user_achievements_updates,
-    get_user_achievements_rollback_updates,
-    rollback_user_achievements
+    upsert_users_achievements,
+    rollback_users_achievements,
 )
 from app.modules.todo.crud.stats import (
-    upsert_user_stats_on_task_completed,
-    update_user_stats_on_task_uncompleted,
-    upsert_user_stats_on_task_canceled,
-    update_user_stats_on_task_uncanceled
+    record_users_stats_events,
+    rollback_users_stats,
+    upsert_users_stats,
 )
 from app.modules.todo.crud.task import (
     make_list_query_by_list_id,
@@ -26,12 +24,17 @@ from app.modules.todo.crud.task import (
     create_task_access,
     get_task_users,
     get_stats_and_achievs_categories,
-    get_task_for_user,
-    get_list_for_task,
-    get_task_access,
+    get_task_details_for_user,
+    get_user_tasks_page,
 )
-from app.modules.todo.crud.user import get_user_timezone
 from app.modules.todo.models import Task, TaskList, TaskAccess
+from app.modules.todo.services.achievement_catalog import achievement_catalog
+from app.modules.todo.services.achievement_state_cache import (
+    achievement_state_cache,
+)
+from app.modules.todo.services.stats_counters import stats_counters
+from app.modules.todo.services.stats_rollup import stats_rollup
+from app.modules.todo.services.task_view_cache import task_view_cache
 from app.core.locales.ru import (
     PRIORITY_LABELS,
     URGENCY_LABELS,
@@ -108,30 +111,91 @@ async def get_full_task_info(
         "Получение полной информации о задаче id=%d пользователем id=%d",
         task_id, user_id
     )
-    task = await get_task_for_user(session, user_id, task_id)
-    if not task:
+    task_details = await get_task_details_for_user(session, user_id, task_id)
+    if not task_details:
         logger.debug(
             "Задача id=%d не найдена или недоступна для пользователя id=%d",
             task_id, user_id
         )
         return None
 
-    task_list = await get_list_for_task(session, task_id)
-    if not task_list:
-        logger.debug("Не найден список для задачи id=%d", task_id)
-        return None
+    return task_details
 
-    access = await get_task_access(session, user_id, task_id)
-    if not access:
-        logger.debug(
-            "Задача id=%d недоступна для пользователя id=%d",
-            task_id, user_id
-        )
+
+async def get_task_view(
+        session: AsyncSession,
+        user_id: int,
+        task_id: int,
+) -> tuple[dict[str, Any], int] | None:
+    """
+    Карточка задачи для диалога: из кэша, а при промахе из БД
+    с записью в кэш
+    :param session: сессия СУБД
+    :param user_id: ID пользователя
+    :param task_id: ID задачи
+    :return: карточка задачи и её версия или None, если задача
+    недоступна пользователю
+    """
+    view, version = await task_view_cache.get(user_id, task_id)
+    if view is not None:
+        return view, version
+
+    task_details = await get_full_task_info(session, user_id, task_id)
+    if not task_details:
         return None
+    view = make_task_data_for_dialog(*task_details)
+    if version is not None:
+        await task_view_cache.set(user_id, task_id, version, view)
+    return view, version or 0
+
+
+_CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_task_cursor(task: Task) -> str:
+    """
+    Компактный ключ задачи для keyset-пагинации:
+    updated_at в микросекундах и task_id в шестнадцатеричном виде
+    :param task: задача
+    :return: строка вида «<микросекунды>.<task_id>»
+    """
+    updated_at = task.updated_at
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=dt_timezone.utc)
+    microseconds = (updated_at - _CURSOR_EPOCH) // _MICROSECOND
+    return f"{microseconds:x}.{task.task_id:x}"
 
-    timezone = await get_user_timezone(session, user_id)
 
-    return task, task_list, access, timezone
+def decode_task_cursor(cursor: str) -> tuple[datetime, int]:
+    microseconds, task_id = cursor.split(".")
+    updated_at = _CURSOR_EPOCH + int(microseconds, 16) * _MICROSECOND
+    return updated_at, int(task_id, 16)
+
+
+async def get_user_tasks_feed_page(
+        session: AsyncSession,
+        user_id: int,
+        mode: str,
+        page_size: int,
+        cursor: str | None = None,
+) -> tuple[list[Task], str | None]:
+    """
+    Страница ленты активных задач пользователя
+    :param session: сессия СУБД
+    :param user_id: ID пользователя
+    :param mode: режим сортировки задач
+    :param page_size: размер страницы
+    :param cursor: ключ последней задачи предыдущей страницы
+    :return: задачи страницы и ключ для следующей страницы (None,
+    если страница последняя)
+    """
+    after = decode_task_cursor(cursor) if cursor else None
+    tasks, has_next = await get_user_tasks_page(
+        session, user_id, mode, page_size, after
+    )
+    next_cursor = encode_task_cursor(tasks[-1]) if has_next else None
+    return tasks, next_cursor
 
 
 def make_task_data_for_dialog(
@@ -171,7 +235,7 @@ def make_task_data_for_dialog(
         "canceled_at": canceled_at_format,
         "postponed_count": task.postponed_count,
         "is_recurring": task.is_recurring,
-        "recurrence_rule_id": task.recurrence_rules,
+        "recurrence_rule_id": task.recurrence_rule_id,
         "recurrence_rule_text": "",
         "duration": task.duration,
         "remind": task.remind,
@@ -183,50 +247,119 @@ def make_task_data_for_dialog(
     return task_data
 
 
-async def update_users_stats_achievs_on_task_completed(
+async def write_users_stats(
+        session: AsyncSession,
+        user_ids: list[int],
+        categories: list,
+        rollback: bool = False,
+) -> dict:
+    """
+    Запись приращений статистики пользователей: в счётчики Redis или
+    журнал событий, если запущен их воркер (STATS_WRITE_MODE), иначе
+    сразу в user_stats. При недоступности Redis статистика пишется в БД
+    :param session: сессия СУБД
+    :param user_ids: ID пользователей
+    :param categories: категории статистики
+    :param rollback: уменьшить счётчики вместо увеличения
+    :return: словарь {ID пользователя: статистика}
+    """
+    delta = -1 if rollback else 1
+    if stats_counters.is_running:
+        users_stats = await stats_counters.increment(
+            session, user_ids, categories, delta
+        )
+        if users_stats is not None:
+            return users_stats
+    if stats_rollup.is_running:
+        # Приращения идут в журнал, строки user_stats не блокируются
+        return await record_users_stats_events(
+            session, user_ids, categories, delta
+        )
+    if rollback:
+        return await rollback_users_stats(session, user_ids, categories)
+    return await upsert_users_stats(
+        session, user_ids, dict.fromkeys(categories, 1)
+    )
+
+
+async def update_users_stats_achievs(
         session: AsyncSession,
         task_data: dict,
+        action: str,
+        rollback: bool = False,
 ):
     """
-    Проверяет и обновляет статистику и достижения пользователей
-    при выполнении задачи
+    Обновляет статистику и достижения всех пользователей задачи
+    фиксированным числом запросов независимо от количества пользователей
     :param session: сессия СУБД
-    :param task_data: параметры выполненной задачи
+    :param task_data: параметры задачи
+    :param action: действие для определения категорий статистики
+    :param rollback: откатить статистику и достижения вместо начисления
     """
+    task_id = task_data.get("task_id")
     logger.debug(
-        "Обновление статистики и достижений пользователей "
-        "при выполнении задачи..."
+        "Обновление статистики и достижений пользователей задачи id=%s "
+        "(action=%s, rollback=%s)",
+        task_id, action, rollback,
     )
-    task_id = task_data.get("task_id")
     users = await get_task_users(session, task_id)
-    categories = get_stats_and_achievs_categories(task_data, "complete")
-    achievements = await get_achievements_by_categories(session, categories)
-    stats_updates = dict.fromkeys(categories, 1)
-
-    for user in users:
-        user_id = user.telegram_id
-        user_stats = await upsert_user_stats_on_task_completed(
-            session, user_id, stats_updates
-        )
-        user_achievements = await get_user_achievements(session, user_id)
-        achievs_updates = get_user_achievements_updates(
-            user_id, achievements, user_achievements, user_stats
+    if not users:
+        return
+    user_ids = [user.telegram_id for user in users]
+    categories = get_stats_and_achievs_categories(task_data, action)
+    achievements = await achievement_catalog.get_by_categories(
+        session, categories
+    )
+
+    users_stats = await write_users_stats(
+        session, user_ids, categories, rollback
+    )
+    if not achievements:
+        return
+
+    users_completed = await achievement_state_cache.get_completed(
+        session, user_ids, achievement_catalog.get_related_ids(categories)
+    )
+    achievs_updates = []
+    for user_id, user_stats in users_stats.items():
+        achievs_updates.extend(
+            achievement_catalog.get_user_achievements_changes(
+                user_id,
+                categories,
+                users_completed[user_id],
+                user_stats,
+                -1 if rollback else 1,
+            )
         )
-        if achievs_updates:
-            await upsert_user_achievements(session, user_id, achievs_updates)
 
-        logger.debug(
-            "Обновлены статистика и достижения для пользователя id=%d",
-            user_id,
+    if achievs_updates:
+        if rollback:
+            await rollback_users_achievements(session, achievs_updates)
+        else:
+            await upsert_users_achievements(session, achievs_updates)
+        after_commit(
+            session, partial(achievement_state_cache.update, achievs_updates)
         )
 
     logger.debug(
-        "Обновлена статистика и достижения при выполнении задачи "
-        "для %d пользователей",
-        len(users),
+        "Обновлены статистика и достижения для %d пользователей",
+        len(users_stats),
     )
 
 
+async def update_users_stats_achievs_on_task_completed(
+        session: AsyncSession,
+        task_data: dict,
+):
+    """
+    Проверяет и обновляет статистику и достижения пользователей
+    при выполнении задачи
+    :param session: сессия СУБД
+    :param task_data: параметры выполненной задачи
+    """
+    await update_users_stats_achievs(session, task_data, "complete")
+
+
 async def update_users_stats_achievs_on_task_uncompleted(
         session: AsyncSession,
         task_data: dict,
@@ -237,39 +370,8 @@ async def update_users_stats_achievs_on_task_uncompleted(
     :param session: сессия СУБД
     :param task_data: параметры возвращаемой в работу задачи
     """
-    logger.debug(
-        "Обновление статистики и достижений пользователей "
-        "при возвращении в работу задачи..."
-    )
-    task_id = task_data.get("task_id")
-    logger.debug("...id=%d", task_id)
-    users = await get_task_users(session, task_id)
-    categories = get_stats_and_achievs_categories(task_data, "complete")
-    achievements = await get_achievements_by_categories(session, categories)
-
-    for user in users:
-        user_id = user.telegram_id
-        user_stats = await update_user_stats_on_task_uncompleted(
-            session, user_id, categories
-        )
-        user_achievements = await get_user_achievements(session, user_id)
-        achievs_rollback_updates = get_user_achievements_rollback_updates(
-            user_id, achievements, user_achievements, user_stats
-        )
-        if achievs_rollback_updates:
-            await rollback_user_achievements(
-                session, user_id, achievs_rollback_updates
-            )
-
-        logger.debug(
-            "Обновлены статистика и достижения для пользователя id=%d",
-            user_id,
-        )
-
-    logger.debug(
-        "Обновлена статистика и достижения "
-        "при возвращении задачи в работу для %d пользователей",
-        len(users),
+    await update_users_stats_achievs(
+        session, task_data, "complete", rollback=True
     )
 
 
@@ -283,39 +385,7 @@ async def update_users_stats_achievs_on_task_canceled(
     :param session: сессия СУБД
     :param task_data: параметры отменяемой задачи
     """
-    logger.debug(
-        "Обновление статистики и достижений пользователей "
-        "при отмене задачи..."
-    )
-    task_id = task_data.get("task_id")
-    logger.debug("...id=%d", task_id)
-    users = await get_task_users(session, task_id)
-    categories = get_stats_and_achievs_categories(task_data, "cancel")
-    achievements = await get_achievements_by_categories(session, categories)
-    stats_updates = dict.fromkeys(categories, 1)
-
-    for user in users:
-        user_id = user.telegram_id
-        user_stats = await upsert_user_stats_on_task_canceled(
-            session, user_id, stats_updates
-        )
-        user_achievements = await get_user_achievements(session, user_id)
-        achievs_updates = get_user_achievements_updates(
-            user_id, achievements, user_achievements, user_stats
-        )
-        if achievs_updates:
-            await upsert_user_achievements(session, user_id, achievs_updates)
-
-        logger.debug(
-            "Обновлены статистика и достижения для пользователя id=%d",
-            user_id,
-        )
-
-    logger.debug(
-        "Обновлена статистика и достижения при отмене задачи "
-        "для %d пользователей",
-        len(users),
-    )
+    await update_users_stats_achievs(session, task_data, "cancel")
 
 
 async def update_users_stats_achievs_on_task_uncanceled(
@@ -328,37 +398,6 @@ async def update_users_stats_achievs_on_task_uncanceled(
     :param session: сессия СУБД
     :param task_data: параметры восстанавливаемой задачи
     """
-    logger.debug(
-        "Обновление статистики и достижений пользователей "
-        "при смене статуса с «Отменена» на «В работе» задачи..."
-    )
-    task_id = task_data.get("task_id")
-    logger.debug("...id=%d", task_id)
-    users = await get_task_users(session, task_id)
-    categories = get_stats_and_achievs_categories(task_data, "cancel")
-    achievements = await get_achievements_by_categories(session, categories)
-
-    for user in users:
-        user_id = user.telegram_id
-        user_stats = await update_user_stats_on_task_uncanceled(
-            session, user_id, categories
-        )
-        user_achievements = await get_user_achievements(session, user_id)
-        achievs_rollback_updates = get_user_achievements_rollback_updates(
-            user_id, achievements, user_achievements, user_stats
-        )
-        if achievs_rollback_updates:
-            await rollback_user_achievements(
-                session, user_id, achievs_rollback_updates
-            )
-
-        logger.debug(
-            "Обновлены статистика и достижения для пользователя id=%d",
-            user_id,
-        )
-
-    logger.debug(
-        "Обновлена статистика и достижения "
-        "при возвращении задачи в работу для %d пользователей",
-        len(users),
+    await update_users_stats_achievs(
+        session, task_data, "cancel", rollback=True
     )
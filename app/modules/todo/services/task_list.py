@@ -1,25 +1,113 @@
 import logging
 from collections import defaultdict
-from typing import Any, Sequence, Callable
+from functools import partial
+from operator import attrgetter
+from typing import Any, Sequence, Callable, Iterator
 
 from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.modules.todo.crud.achievement import (
-    get_achievements_by_categories,
-    get_user_achievements,
-    upsert_user_achievements,
-    get_user_achievements_updates
-)
+from app.core.db.transaction_hooks import after_commit
+from app.modules.todo.crud.achievement import upsert_user_achievements
 from app.modules.todo.crud.stats import upsert_user_stats_on_list_added
 from app.modules.todo.crud.task_list import (
     create_list_access,
     get_max_position,
     create_list,
+    fetch_user_lists_raw,
+)
+from app.modules.todo.services.achievement_catalog import achievement_catalog
+from app.modules.todo.services.achievement_state_cache import (
+    achievement_state_cache,
+)
+from app.modules.todo.services.list_hierarchy_cache import (
+    ListNode,
+    list_hierarchy_cache,
 )
 
 logger = logging.getLogger(__name__)
 
+MAX_LIST_DEPTH = 64
+
+
+def build_ordered_nodes(
+        rows: Sequence[Row],
+        *,
+        max_depth: int = MAX_LIST_DEPTH,
+) -> list[ListNode]:
+    """
+    Обход дерева списков в порядке отображения
+    :param rows: строки списков пользователя
+    :param max_depth: предельная глубина вложенности; более глубокие
+    списки не попадают в результат
+    :return: все списки, достижимые от корня, с номером позиции
+    вида «1.2.»
+    """
+    sub_lists_map: dict[int | None, list] = defaultdict(list)
+    for row in sorted(rows, key=attrgetter("position")):
+        sub_lists_map[row.parent_list_id].append(row)
+    get_sub_lists = sub_lists_map.get
+
+    ordered_nodes: list[ListNode] = []
+    append = ordered_nodes.append
+    truncated = 0
+    # Стек итераторов по подспискам: глубина равна длине стека
+    stack: list[tuple[Iterator[Row], str]] = [
+        (iter(get_sub_lists(None, ())), "")
+    ]
+    while stack:
+        sub_lists, prefix = stack[-1]
+        for row in sub_lists:
+            pos = f"{prefix}{row.position}."
+            append(ListNode(
+                row.list_id,
+                row.title,
+                row.parent_list_id,
+                row.position,
+                getattr(row, "system_type", None),
+                pos,
+            ))
+            children = get_sub_lists(row.list_id)
+            if not children:
+                continue
+            if len(stack) >= max_depth:
+                truncated += len(children)
+                continue
+            stack.append((iter(children), pos))
+            break
+        else:
+            stack.pop()
+
+    if truncated:
+        logger.warning(
+            "Превышена глубина вложенности списков %d: "
+            "пропущено подсписков: %d",
+            max_depth, truncated,
+        )
+    return ordered_nodes
+
+
+def select_visible_lists(
+        nodes: Sequence[ListNode],
+        *,
+        is_hidden: Callable[[ListNode], bool] | None = None,
+) -> tuple[list[dict], dict]:
+    """
+    Кнопки и словарь списков без скрытых списков. Скрытый список
+    не показывается, но его подсписки сохраняют свою позицию
+    :param nodes: упорядоченное дерево списков
+    :param is_hidden: признак скрытого списка
+    :return: кнопки и словарь {list_id: title}
+    """
+    if is_hidden:
+        nodes = [node for node in nodes if not is_hidden(node)]
+    ordered_buttons: list[dict[str, Any]] = [
+        {"list_id": node.list_id, "list_title": node.title, "pos": node.pos}
+        for node in nodes
+    ]
+    ordered_lists: dict[int, str] = {node.list_id: node.title for node in nodes}
+    return ordered_buttons, ordered_lists
+
 
 def build_ordered_hierarchy(
         rows: Sequence[Row],
@@ -29,41 +117,32 @@ def build_ordered_hierarchy(
     if not rows:
         logger.debug("rows is empty")
         return [], {}
-    logger.debug("rows=%s", rows)
+    logger.debug("Построение иерархии из %d списков", len(rows))
+    return select_visible_lists(
+        build_ordered_nodes(rows), is_hidden=is_hidden
+    )
 
-    sub_lists_map: dict[int | None, list] = defaultdict(list)
 
-    for row in rows:
-        sub_lists_map[row.parent_list_id].append({
-            "list_id": row.list_id,
-            "list_title": row.title,
-            "parent_list_id": row.parent_list_id,
-            "position": row.position,
-            "is_hidden": is_hidden(row) if is_hidden else False,
-        })
-
-    ordered_buttons: list[dict[str, Any]] = []
-    ordered_lists: dict[int, str] = {}
-
-    def traverse(parent_id: int | None, prefix: str):
-        sub_lists = sorted(
-            sub_lists_map.get(parent_id, []),
-            key=lambda n: n["position"],
-        )
+async def get_user_lists_hierarchy(
+        session: AsyncSession,
+        user_id: int,
+) -> list[ListNode]:
+    """
+    Упорядоченное дерево списков пользователя: из кэша,
+    а при промахе из БД с записью в кэш
+    :param session: сессия СУБД
+    :param user_id: ID пользователя
+    :return: упорядоченное дерево списков
+    """
+    nodes, version = await list_hierarchy_cache.get(user_id)
+    if nodes is not None:
+        return nodes
 
-        for sub_list in sub_lists:
-            pos = f"{prefix}{sub_list['position']}."
-            if not sub_list["is_hidden"]:
-                ordered_buttons.append({
-                    "list_id": sub_list["list_id"],
-                    "list_title": sub_list["list_title"],
-                    "pos": pos,
-                })
-                ordered_lists[sub_list["list_id"]] = sub_list["list_title"]
-            traverse(sub_list["list_id"], pos)
-
-    traverse(None, "")
-    return ordered_buttons, ordered_lists
+    rows = await fetch_user_lists_raw(session, user_id)
+    nodes = build_ordered_nodes(rows)
+    if version is not None:
+        await list_hierarchy_cache.set(user_id, version, nodes)
+    return nodes
 
 
 async def db_add_list(
@@ -110,6 +189,7 @@ async def db_add_list(
         raise
 
     await session.commit()
+    await list_hierarchy_cache.invalidate(user_id)
     logger.debug(
         "Список задач id=%d добавлен пользователем id=%d "
         "(parent_list_id=%s, position=%d)",
@@ -134,14 +214,23 @@ async def update_stats_achievs_on_list_added(
         user_stats = await upsert_user_stats_on_list_added(session, user_id)
 
         categories = ["lists_created"]
-        achievements = await get_achievements_by_categories(session,
-                                                            categories)
-        user_achievements = await get_user_achievements(session, user_id)
-        updates = get_user_achievements_updates(
-            user_id, achievements, user_achievements, user_stats
+        achievements = await achievement_catalog.get_by_categories(
+            session, categories
+        )
+        if not achievements:
+            await session.commit()
+            return
+        users_completed = await achievement_state_cache.get_completed(
+            session, [user_id], achievement_catalog.get_related_ids(categories)
+        )
+        updates = achievement_catalog.get_user_achievements_changes(
+            user_id, categories, users_completed[user_id], user_stats, 1
         )
         if updates:
             await upsert_user_achievements(session, user_id, updates)
+            after_commit(
+                session, partial(achievement_state_cache.update, updates)
+            )
 
         await session.commit()
         logger.debug(
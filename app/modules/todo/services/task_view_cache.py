@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.utils.dialog_serialization import from_dialog_safe, to_dialog_safe
+from app.modules.todo.services.list_hierarchy_cache import CacheStats
+
+logger = logging.getLogger(__name__)
+
+
+class TaskViewCache:
+    """
+    Кэш карточек задач для диалогов (результат make_task_data_for_dialog)
+    в Redis.
+
+    Карточка зависит от пользователя (роль, часовой пояс), поэтому
+    хранится под ключом задачи, версии и пользователя. Изменение задачи
+    записывает новую версию (отметку времени), и карточки всех её
+    пользователей перестают читаться. Ключ версии живёт дольше карточек:
+    когда он истекает, карточек со старыми версиями уже нет, а задач
+    в кэше может быть много. Изменения, которые не проходят через CRUD задачи
+    (переименование списка, смена часового пояса), видны после ttl.
+    Без настроенного клиента Redis кэш ничего не хранит.
+    """
+
+    def __init__(self, ttl: int = 300, prefix: str = "task_view"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = CacheStats()
+        self._redis: Redis | None = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._redis is not None
+
+    def setup(self, redis: Redis | None, ttl: int | None = None):
+        self._redis = redis
+        if ttl is not None:
+            self.ttl = ttl
+
+    def _version_key(self, task_id: int) -> str:
+        return f"{self.prefix}:{task_id}:version"
+
+    def _view_key(self, task_id: int, version: int, user_id: int) -> str:
+        return f"{self.prefix}:{task_id}:{version}:{user_id}"
+
+    async def get(
+            self,
+            user_id: int,
+            task_id: int,
+    ) -> tuple[dict | None, int | None]:
+        """
+        Чтение карточки задачи
+        :param user_id: ID пользователя
+        :param task_id: ID задачи
+        :return: карточка (None при промахе) и версия, под которой
+        следует сохранить карточку, прочитанную из БД
+        """
+        if not self.is_enabled:
+            return None, None
+        try:
+            version = await self._redis.get(self._version_key(task_id))
+            version = int(version) if version else 0
+            payload = await self._redis.get(
+                self._view_key(task_id, version, user_id)
+            )
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка чтения кэша задачи id=%d пользователя id=%d: %s",
+                task_id, user_id, e,
+            )
+            return None, None
+
+        if payload is None:
+            self.stats.misses += 1
+            logger.debug(
+                "Промах кэша задачи id=%d пользователя id=%d, версия %d",
+                task_id, user_id, version,
+            )
+            return None, version
+
+        self.stats.hits += 1
+        return from_dialog_safe(json.loads(payload)), version
+
+    async def set(
+            self,
+            user_id: int,
+            task_id: int,
+            version: int,
+            view: dict,
+    ):
+        if not self.is_enabled:
+            return
+        try:
+            await self._redis.set(
+                self._view_key(task_id, version, user_id),
+                json.dumps(
+                    to_dialog_safe(view),
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ),
+                ex=self.ttl,
+            )
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка записи кэша задачи id=%d пользователя id=%d: %s",
+                task_id, user_id, e,
+            )
+
+    async def invalidate(self, *task_ids: int):
+        if not self.is_enabled or not task_ids:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                version = time.time_ns()
+                for task_id in task_ids:
+                    pipe.set(
+                        self._version_key(task_id), version, ex=self.ttl * 2
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning(
+                "Ошибка сброса кэша задач %s: %s", task_ids, e,
+            )
+            return
+        self.stats.invalidations += len(task_ids)
+        logger.debug("Сброшен кэш задач %s", task_ids)
+
+
+task_view_cache = TaskViewCache()
@@ -0,0 +1,154 @@
+import logging
+from typing import Any, Iterable
+
+from aiogram_dialog import DialogManager
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.todo.services.task import get_task_view
+from app.modules.todo.services.task_list import get_user_lists_hierarchy
+from app.modules.todo.ui.dialogs.enums import DialogStateMode
+from app.core.utils.dialog_serialization import (
+    from_dialog_safe,
+    from_dialog_safe_keys,
+    to_dialog_safe,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ключ middleware_data, под которым живёт кэш одного апдейта
+REQUEST_CACHE_KEY = "dialog_state_cache"
+
+
+class DialogState:
+    """
+    Хранение карточки задачи и карты списков в dialog_data.
+
+    В режиме copy карточка и карта копируются в dialog_data и
+    сохраняются в хранилище FSM при каждом переходе. В режиме reference
+    в dialog_data остаются только идентификаторы задачи и списка,
+    а данные подгружаются при обращении: из кэша
+    апдейта, из Redis (task_view_cache, list_hierarchy_cache) и из БД.
+    """
+
+    def __init__(self, mode: DialogStateMode = DialogStateMode.COPY):
+        self.mode = mode
+
+    def setup(self, mode: DialogStateMode | str):
+        self.mode = DialogStateMode(mode)
+
+    @property
+    def is_reference(self) -> bool:
+        return self.mode == DialogStateMode.REFERENCE
+
+    @staticmethod
+    def _request_cache(dialog_manager: DialogManager) -> dict:
+        return dialog_manager.middleware_data.setdefault(REQUEST_CACHE_KEY, {})
+
+    async def load_task(
+            self,
+            dialog_manager: DialogManager,
+            session: AsyncSession,
+            user_id: int,
+            task_id: int,
+    ) -> tuple[dict[str, Any], int] | None:
+        """
+        Карточка задачи и её версия; в пределах апдейта читается
+        не больше одного раза
+        :param dialog_manager: менеджер диалога
+        :param session: сессия СУБД
+        :param user_id: ID пользователя
+        :param task_id: ID задачи
+        :return: карточка и версия или None, если задача недоступна
+        """
+        cache = self._request_cache(dialog_manager)
+        key = ("task", user_id, task_id)
+        if key not in cache:
+            cache[key] = await get_task_view(session, user_id, task_id)
+        return cache[key]
+
+    def store_task(
+            self,
+            dialog_manager: DialogManager,
+            task_data: dict[str, Any],
+    ):
+        if not self.is_reference:
+            dialog_manager.dialog_data.update(to_dialog_safe(task_data))
+            return
+        dialog_manager.dialog_data.update(
+            task_id=task_data["task_id"],
+            selected_list_id=task_data["selected_list_id"],
+        )
+
+    async def get_task_data(
+            self,
+            dialog_manager: DialogManager,
+            session: AsyncSession,
+            user_id: int,
+            keys: Iterable[str],
+    ) -> dict[str, Any]:
+        """
+        Нужные хендлеру поля карточки задачи
+        :param dialog_manager: менеджер диалога
+        :param session: сессия СУБД
+        :param user_id: ID пользователя
+        :param keys: поля карточки
+        :return: словарь из найденных полей
+        """
+        dialog_data = dialog_manager.dialog_data
+        if not self.is_reference:
+            return from_dialog_safe_keys(dialog_data, keys)
+
+        task_id = dialog_data.get("task_id")
+        loaded = None
+        if task_id:
+            loaded = await self.load_task(
+                dialog_manager, session, user_id, task_id
+            )
+        if loaded is None:
+            logger.debug(
+                "Карточка задачи id=%r недоступна пользователю id=%d",
+                task_id, user_id,
+            )
+            return from_dialog_safe_keys(dialog_data, keys)
+        view, _version = loaded
+        return {key: view[key] for key in keys if key in view}
+
+    def store_lists(
+            self,
+            dialog_manager: DialogManager,
+            lists: dict[int, str],
+    ):
+        if not self.is_reference:
+            dialog_manager.dialog_data["lists"] = to_dialog_safe(lists)
+            return
+        dialog_manager.dialog_data.pop("lists", None)
+
+    async def get_list_title(
+            self,
+            dialog_manager: DialogManager,
+            session: AsyncSession,
+            user_id: int,
+            list_id: int,
+    ) -> str | None:
+        """
+        Название списка пользователя: из карты в dialog_data,
+        если она там есть, иначе из дерева списков
+        :param dialog_manager: менеджер диалога
+        :param session: сессия СУБД
+        :param user_id: ID пользователя
+        :param list_id: ID списка
+        :return: название списка или None, если список недоступен
+        """
+        lists = dialog_manager.dialog_data.get("lists")
+        if lists is not None:
+            return from_dialog_safe(lists).get(list_id)
+
+        cache = self._request_cache(dialog_manager)
+        key = ("lists", user_id)
+        if key not in cache:
+            nodes = await get_user_lists_hierarchy(session, user_id)
+            cache[key] = {node.list_id: node.title for node in nodes}
+        return cache[key].get(list_id)
+
+
+dialog_state = DialogState()
@@ -7,3 +7,8 @@ class ListSelectionMode(StrEnum):
     CREATE_LIST = "create_list"
     EDIT_LIST = "edit_list"
     VIEW_ALL_LISTS = "view_all_lists"
+
+
+class DialogStateMode(StrEnum):
+    COPY = "copy"
+    REFERENCE = "reference"
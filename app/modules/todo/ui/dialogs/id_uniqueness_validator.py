@@ -1,9 +1,15 @@
+import hashlib
 import logging
 from collections import defaultdict
+from pathlib import Path
 from typing import Tuple, Any
 
 logger = logging.getLogger(__name__)
 
+DIALOGS_DIR = Path(__file__).resolve().parent
+# Хэш исходников диалогов, для которых проверка уже пройдена
+STAMP_PATH = DIALOGS_DIR / ".validated"
+
 CHILD_CONTAINERS = (
     "buttons", "children", "widgets", "items", "rows", "columns", "inputs"
 )
@@ -21,7 +27,6 @@ def _get_widget_id(widget) -> str | None:
     for attribute in ("widget_id", "id", "name", "widget_name"):
         value = getattr(widget, attribute, None)
         if value is not None:
-            logger.info("return value=%r", value)
             return value
 
     for method in ("get_widget_id", "get_id"):
@@ -32,7 +37,6 @@ def _get_widget_id(widget) -> str | None:
             except TypeError:
                 continue
             if value is not None:
-                logger.info("return value=%r", value)
                 return value
 
     return None
@@ -142,3 +146,68 @@ def validate_dialogs(all_dialogs):
         "Completed validation: "
         "unique widget IDs confirmed within dialog windows"
     )
+
+
+def dialogs_source_hash(root: Path = DIALOGS_DIR) -> str:
+    """
+    Хэш исходников диалогов (вместе с этим модулем): пока он
+    не изменился, не меняются и идентификаторы виджетов в окнах.
+    Зависимости в хэш не входят: хэш пишется при сборке образа,
+    а обновление зависимостей образ пересобирает
+    :param root: каталог с модулями диалогов
+    :return: sha256 в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    for path in sorted(root.rglob("*.py")):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def write_validation_stamp(
+        source_hash: str,
+        stamp_path: Path = STAMP_PATH,
+):
+    try:
+        stamp_path.write_text(source_hash)
+    except OSError as e:
+        logger.warning(
+            "Не удалось сохранить хэш проверки диалогов в %s: %s",
+            stamp_path, e,
+        )
+
+
+def validate_dialogs_cached(
+        all_dialogs,
+        stamp_path: Path = STAMP_PATH,
+        root: Path = DIALOGS_DIR,
+) -> bool:
+    """
+    Проверка диалогов, которая пропускается, если для текущих
+    исходников она уже пройдена (при сборке или в тестах)
+    :param all_dialogs: диалоги
+    :param stamp_path: файл с хэшем проверенных исходников
+    :param root: каталог с модулями диалогов
+    :return: True, если проверка пропущена
+    """
+    source_hash = dialogs_source_hash(root)
+    try:
+        stored_hash = stamp_path.read_text().strip()
+    except OSError:
+        stored_hash = None
+    if stored_hash == source_hash:
+        logger.debug("Диалоги не менялись после проверки, проверка пропущена")
+        return True
+
+    validate_dialogs(all_dialogs)
+    write_validation_stamp(source_hash, stamp_path)
+    return False
+
+
+if __name__ == "__main__":
+    from app.modules.todo.ui.dialogs import dialogs
+
+    validate_dialogs(dialogs)
+    write_validation_stamp(dialogs_source_hash())
+    print(f"Диалоги проверены, хэш записан в {STAMP_PATH}")
@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.todo.ui.dialogs.enums import ListSelectionMode
 from app.modules.todo.ui.dialogs.select_list.scenarios import get_select_list_scenario
-from app.core.utils.dialog_serialization import to_dialog_safe
+from app.modules.todo.ui.dialogs.common.dialog_state import dialog_state
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +31,7 @@ async def lists_getter_core(
         dialog_manager=dialog_manager,
     )
 
-    dialog_manager.dialog_data["lists"] = to_dialog_safe(lists)
+    dialog_state.store_lists(dialog_manager, lists)
     logger.debug(
         "Для пользователя id=%d в режиме mode=%r получены buttons=%r, lists=%r",
         user_id, mode.value, buttons, lists
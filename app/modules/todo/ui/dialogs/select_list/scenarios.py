@@ -2,12 +2,14 @@ from aiogram_dialog import DialogManager
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.todo.ui.dialogs.enums import ListSelectionMode
-from app.modules.todo.crud.task_list import fetch_user_lists_raw
 from app.modules.todo.models import SystemListTypeEnum
 from app.modules.todo.facade.task import change_list_for_task_with_log
 from app.modules.todo.facade.task_list import change_parent_list_with_log
-from app.modules.todo.services.task_list import build_ordered_hierarchy
-from app.core.utils.dialog_serialization import from_dialog_safe
+from app.modules.todo.services.task_list import (
+    get_user_lists_hierarchy,
+    select_visible_lists,
+)
+from app.modules.todo.ui.dialogs.common.dialog_state import dialog_state
 
 
 class SelectListScenario:
@@ -36,18 +38,22 @@ class CreateTaskScenario(SelectListScenario):
     async def get_lists(self, *, session, dialog_manager):
         user_id = dialog_manager.event.from_user.id
 
-        rows = await fetch_user_lists_raw(session, user_id)
+        nodes = await get_user_lists_hierarchy(session, user_id)
 
         def is_hidden(row):
             return row.system_type in {SystemListTypeEnum.TRASH, SystemListTypeEnum.ARCHIVE}
 
-        return build_ordered_hierarchy(rows, is_hidden=is_hidden)
+        return select_visible_lists(nodes, is_hidden=is_hidden)
 
     async def apply(self, *, session, dialog_manager, list_id):
-        lists = from_dialog_safe(dialog_manager.dialog_data["lists"])
         return {
             "selected_list_id": list_id,
-            "selected_list_title": lists[list_id],
+            "selected_list_title": await dialog_state.get_list_title(
+                dialog_manager,
+                session,
+                dialog_manager.event.from_user.id,
+                list_id,
+            ),
         }
 
 
@@ -56,13 +62,13 @@ class EditTaskScenario(SelectListScenario):
         user_id = dialog_manager.event.from_user.id
         old_list_id = dialog_manager.dialog_data["list_id"]
 
-        rows = await fetch_user_lists_raw(session, user_id)
+        nodes = await get_user_lists_hierarchy(session, user_id)
 
         def is_hidden(row):
             return (row.system_type in {SystemListTypeEnum.TRASH, SystemListTypeEnum.ARCHIVE}
                     or row.list_id == old_list_id)
 
-        return build_ordered_hierarchy(rows, is_hidden=is_hidden)
+        return select_visible_lists(nodes, is_hidden=is_hidden)
 
     async def apply(self, *, session, dialog_manager, list_id):
         await change_list_for_task_with_log(
@@ -73,10 +79,14 @@ class EditTaskScenario(SelectListScenario):
             list_id,
         )
 
-        lists = from_dialog_safe(dialog_manager.dialog_data["lists"])
         return {
             "selected_list_id": list_id,
-            "selected_list_title": lists[list_id],
+            "selected_list_title": await dialog_state.get_list_title(
+                dialog_manager,
+                session,
+                dialog_manager.event.from_user.id,
+                list_id,
+            ),
         }
 
 
@@ -84,7 +94,7 @@ class CreateListScenario(SelectListScenario):
     async def get_lists(self, *, session, dialog_manager):
         user_id = dialog_manager.event.from_user.id
 
-        rows = await fetch_user_lists_raw(session, user_id)
+        nodes = await get_user_lists_hierarchy(session, user_id)
 
         def is_hidden(row):
             return row.system_type in {
@@ -93,13 +103,17 @@ class CreateListScenario(SelectListScenario):
                 SystemListTypeEnum.ARCHIVE,
             }
 
-        return build_ordered_hierarchy(rows, is_hidden=is_hidden)
+        return select_visible_lists(nodes, is_hidden=is_hidden)
 
     async def apply(self, *, session, dialog_manager, list_id):
-        lists = from_dialog_safe(dialog_manager.dialog_data["lists"])
         return {
             "selected_list_id": list_id,
-            "selected_list_title": lists[list_id],
+            "selected_list_title": await dialog_state.get_list_title(
+                dialog_manager,
+                session,
+                dialog_manager.event.from_user.id,
+                list_id,
+            ),
         }
 
 
@@ -109,7 +123,7 @@ class EditListScenario(SelectListScenario):
         current_list_id = dialog_manager.dialog_data["list_id"]
         old_parent_list_id = dialog_manager.dialog_data.get("parent_list_id")
 
-        rows = await fetch_user_lists_raw(session, user_id)
+        nodes = await get_user_lists_hierarchy(session, user_id)
 
         def is_hidden(row):
             is_system = row.system_type in {
@@ -120,7 +134,7 @@ class EditListScenario(SelectListScenario):
             is_current = row.list_id in {current_list_id, old_parent_list_id}
             return is_system or is_current
 
-        return build_ordered_hierarchy(rows, is_hidden=is_hidden)
+        return select_visible_lists(nodes, is_hidden=is_hidden)
 
     async def apply(self, *, session, dialog_manager, list_id):
         user_id = dialog_manager.event.from_user.id
@@ -136,10 +150,14 @@ class EditListScenario(SelectListScenario):
             new_parent_list_id,
         )
 
-        lists = from_dialog_safe(dialog_manager.dialog_data["lists"])
         return {
             "selected_list_id": list_id,
-            "selected_list_title": lists[list_id],
+            "selected_list_title": await dialog_state.get_list_title(
+                dialog_manager,
+                session,
+                user_id,
+                list_id,
+            ),
         }
 
 
@@ -147,12 +165,12 @@ class ViewAllListsScenario(SelectListScenario):
     async def get_lists(self, *, session, dialog_manager):
         user_id = dialog_manager.event.from_user.id
 
-        rows = await fetch_user_lists_raw(session, user_id)
+        nodes = await get_user_lists_hierarchy(session, user_id)
 
         def is_hidden(row):
             return row.system_type == SystemListTypeEnum.TRASH
 
-        return build_ordered_hierarchy(rows, is_hidden=is_hidden)
+        return select_visible_lists(nodes, is_hidden=is_hidden)
 
 
 def get_select_list_scenario(mode: ListSelectionMode) -> SelectListScenario:
@@ -9,7 +9,8 @@ from app.modules.todo.services.task import (
     get_full_task_info,
     make_task_data_for_dialog
 )
-from app.core.utils.dialog_serialization import to_dialog_safe
+from app.modules.todo.services.task_view_cache import task_view_cache
+from app.modules.todo.ui.dialogs.common.dialog_state import dialog_state
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +27,25 @@ async def get_task(
     if not task_id:
         logger.debug("В словаре диалога нет task_id")
         return {}
-    task, task_list, access, timezone = await get_full_task_info(
-        session, user_id, task_id
-    )
-    task_data = make_task_data_for_dialog(task, task_list, access, timezone)
-    dialog_manager.dialog_data.update(to_dialog_safe(task_data))
+    if dialog_state.is_reference:
+        loaded = await dialog_state.load_task(
+            dialog_manager, session, user_id, task_id
+        )
+    else:
+        task_details = await get_full_task_info(session, user_id, task_id)
+        loaded = None
+        if task_details:
+            loaded = make_task_data_for_dialog(*task_details), 0
+    if not loaded:
+        logger.debug(
+            "Задача id=%d недоступна пользователю id=%d", task_id, user_id
+        )
+        return {}
+    task_data, _version = loaded
+    dialog_state.store_task(dialog_manager, task_data)
     if task_data["status"] == TaskStatusEnum.NEW.value:
         await mark_task_in_process(session, task_id, user_id)
+        await task_view_cache.invalidate(task_id)
         logger.debug("Статус задачи изменён с «Новая» на «В работе»")
     logger.debug("Получен task_data=%s", task_data)
     return task_data
@@ -16,10 +16,24 @@ from app.modules.todo.facade.task import (
     not_cancel_task_with_stats_achievs_log,
     delete_task_with_log,
 )
-from app.core.utils.dialog_serialization import from_dialog_safe
+from app.modules.todo.ui.dialogs.common.dialog_state import dialog_state
 
 logger = logging.getLogger(__name__)
 
+# Ключи dialog_data, которые нужны фасадам при смене статуса
+# и удалении задачи (статистика, достижения, перенос между списками)
+TASK_STATUS_CHANGE_KEYS = (
+    "task_id",
+    "task_title",
+    "selected_list_id",
+    "status",
+    "priority",
+    "urgency",
+    "deadline",
+    "parent_task_id",
+    "is_shared",
+)
+
 
 async def go_complete_yes(
         callback: CallbackQuery,
@@ -31,7 +45,9 @@ async def go_complete_yes(
     task_id = dialog_manager.dialog_data.get("task_id")
     logger.debug("...id=%d пользователем id=%d", task_id, user_id)
     session: AsyncSession = dialog_manager.middleware_data["session"]
-    task_data = from_dialog_safe(dialog_manager.dialog_data)
+    task_data = await dialog_state.get_task_data(
+        dialog_manager, session, user_id, TASK_STATUS_CHANGE_KEYS
+    )
     task_title = task_data.get("task_title")
 
     await complete_task_with_stats_achievs_log(
@@ -64,7 +80,9 @@ async def go_not_complete_yes(
     task_id = dialog_manager.dialog_data.get("task_id")
     logger.debug("...id=%d пользователем id=%d", task_id, user_id)
     session: AsyncSession = dialog_manager.middleware_data["session"]
-    task_data = from_dialog_safe(dialog_manager.dialog_data)
+    task_data = await dialog_state.get_task_data(
+        dialog_manager, session, user_id, TASK_STATUS_CHANGE_KEYS
+    )
     task_title = task_data.get("task_title")
 
     await not_complete_task_with_stats_achievs_log(
@@ -97,7 +115,9 @@ async def go_cancel_yes(
     task_id = dialog_manager.dialog_data.get("task_id")
     logger.debug("...id=%d пользователем id=%d", task_id, user_id)
     session: AsyncSession = dialog_manager.middleware_data["session"]
-    task_data = from_dialog_safe(dialog_manager.dialog_data)
+    task_data = await dialog_state.get_task_data(
+        dialog_manager, session, user_id, TASK_STATUS_CHANGE_KEYS
+    )
     task_title = task_data.get("task_title")
 
     await cancel_task_with_stats_achievs_log(
@@ -130,7 +150,9 @@ async def go_not_cancel_yes(
     task_id = dialog_manager.dialog_data.get("task_id")
     logger.debug("...id=%d пользователем id=%d", task_id, user_id)
     session: AsyncSession = dialog_manager.middleware_data["session"]
-    task_data = from_dialog_safe(dialog_manager.dialog_data)
+    task_data = await dialog_state.get_task_data(
+        dialog_manager, session, user_id, TASK_STATUS_CHANGE_KEYS
+    )
     task_title = task_data.get("task_title")
 
     await not_cancel_task_with_stats_achievs_log(
@@ -162,7 +184,9 @@ async def go_delete_task_yes_core(
     user_id = callback.from_user.id
     task_id = dialog_manager.dialog_data.get("task_id")
     logger.debug("Удаление задачи id=%d пользователем id=%d", task_id, user_id)
-    task_data = from_dialog_safe(dialog_manager.dialog_data)
+    task_data = await dialog_state.get_task_data(
+        dialog_manager, session, user_id, TASK_STATUS_CHANGE_KEYS
+    )
     task_title = task_data.get("task_title")
 
     try:
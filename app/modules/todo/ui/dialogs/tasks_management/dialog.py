@@ -4,6 +4,7 @@ from aiogram_dialog.widgets.kbd import (
     Button,
     Cancel,
     ListGroup,
+    Row,
     ScrollingGroup,
     Start,
     SwitchTo,
@@ -18,26 +19,39 @@ from app.modules.todo.ui.dialogs.tasks_management.getters import (
     get_tasks_in_trash,
     get_tasks_in_archive,
 )
-from app.modules.todo.ui.dialogs.tasks_management.handlers import go_selected_task
+from app.modules.todo.ui.dialogs.tasks_management.handlers import (
+    go_selected_task,
+    go_next_tasks_page,
+    go_prev_tasks_page,
+)
 
 tasks_management_dialog = Dialog(
     WindowWithInput(
         Const("Показаны все задачи в порядке"),
         Const("от последних к более ранним", when="time_back"),
-        ScrollingGroup(
-            ListGroup(
-                Button(
-                    Format("{item[pos]}. {item[task_title]}"),
-                    id="select_task",
-                    on_click=go_selected_task,
-                ),
-                id="tasks_search",
-                item_id_getter=lambda item: item["task_id"],
-                items="task_buttons"
+        ListGroup(
+            Button(
+                Format("{item[pos]}. {item[task_title]}"),
+                id="select_task",
+                on_click=go_selected_task,
+            ),
+            id="tasks_search",
+            item_id_getter=lambda item: item["task_id"],
+            items="task_buttons"
+        ),
+        Row(
+            Button(
+                text=Const("◀️"),
+                id="prev_tasks_page",
+                on_click=go_prev_tasks_page,
+                when="has_prev_page",
+            ),
+            Button(
+                text=Const("▶️"),
+                id="next_tasks_page",
+                on_click=go_next_tasks_page,
+                when="has_next_page",
             ),
-            id="scroll_tasks_search",
-            width=1,
-            height=10,
         ),
         Start(
             text=Const("➕ Новая задача"),
@@ -3,40 +3,52 @@ import logging
 from aiogram.types import User
 from aiogram_dialog import DialogManager
 
-from app.modules.todo.crud.task import get_user_tasks, get_user_tasks_in_list
+from app.modules.todo.crud.task import get_user_tasks_in_list
 from app.modules.todo.crud.task_list import (
     get_user_trash_list_id,
     get_user_archive_list_id,
 )
+from app.modules.todo.services.task import get_user_tasks_feed_page
 from app.core.utils.dialog_serialization import to_dialog_safe
 
 logger = logging.getLogger(__name__)
 
+TASKS_PAGE_SIZE = 10
+
 
 async def get_all_tasks(
         dialog_manager: DialogManager,
         event_from_user: User,
         **_kwargs
 ) -> dict:
-    logger.debug("Апдейт здесь")
     session = dialog_manager.middleware_data["session"]
     user_id = event_from_user.id
     mode = dialog_manager.dialog_data.get("show_tasks_mode", "default")
-    tasks = await get_user_tasks(session, user_id, mode)
+    cursors = dialog_manager.dialog_data.get("tasks_cursors", [])
+    cursor = cursors[-1] if cursors else None
+    logger.debug(
+        "Получение страницы %d задач пользователя id=%d",
+        len(cursors) + 1, user_id,
+    )
+    tasks, next_cursor = await get_user_tasks_feed_page(
+        session, user_id, mode, TASKS_PAGE_SIZE, cursor
+    )
     dialog_manager.dialog_data["tasks"] = to_dialog_safe({
         task.task_id: task.title for task in tasks
     })
-    logger.debug("Словарь dialog_data:")
-    logger.debug(dialog_manager.dialog_data)
+    dialog_manager.dialog_data["tasks_next_cursor"] = next_cursor
+    offset = len(cursors) * TASKS_PAGE_SIZE
     task_buttons = [
         {"pos": i, "task_id": task.task_id, "task_title": task.title}
-        for i, task in enumerate(tasks, 1)
+        for i, task in enumerate(tasks, offset + 1)
     ]
     logger.debug("Получившийся список для кнопок:")
     logger.debug(task_buttons)
     window_data = {
         "time_back": True,
         "task_buttons": task_buttons,
+        "has_prev_page": bool(cursors),
+        "has_next_page": next_cursor is not None,
     }
     return window_data
 
@@ -30,3 +30,27 @@ async def go_selected_task(
         state=TaskActionsDialogSG.main_task_window,
         data=data,
     )
+
+
+async def go_next_tasks_page(
+        _callback: CallbackQuery,
+        _widget: Button,
+        dialog_manager: DialogManager,
+):
+    next_cursor = dialog_manager.dialog_data.get("tasks_next_cursor")
+    if not next_cursor:
+        return
+    cursors = dialog_manager.dialog_data.setdefault("tasks_cursors", [])
+    cursors.append(next_cursor)
+    logger.debug("Переход к странице задач %d", len(cursors) + 1)
+
+
+async def go_prev_tasks_page(
+        _callback: CallbackQuery,
+        _widget: Button,
+        dialog_manager: DialogManager,
+):
+    cursors = dialog_manager.dialog_data.get("tasks_cursors", [])
+    if cursors:
+        cursors.pop()
+    logger.debug("Переход к странице задач %d", len(cursors) + 1)
@@ -0,0 +1,101 @@
+"""
+Проверка достижений при выполнении задачи: прежние функции
+(все достижения категорий) против поиска пересечённых порогов
+в справочнике.
+
+Пользователь выполняет --steps задач подряд; для каждого шага
+считаются время вычисления обновлений и число строк, которые ушли бы
+в upsert_users_achievements. Категории и цепочки как в справочнике
+по умолчанию: tasks_completed (1, 5, 10, 50, 100) и категории
+приоритета и срочности с одним достижением.
+
+Запуск:
+    python -m benchmarks.achievement_changes --steps 200 --repeats 50
+"""
+import argparse
+import statistics
+import time
+from types import SimpleNamespace
+
+from app.modules.todo.crud.achievement import get_user_achievements_updates
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+
+USER_ID = 1
+CHAINS = {
+    "tasks_completed": [1, 5, 10, 50, 100],
+    "medium_priority_tasks_completed": [10],
+    "medium_urgency_tasks_completed": [10],
+}
+
+
+def make_achievements() -> list[SimpleNamespace]:
+    achievements = []
+    for category, thresholds in CHAINS.items():
+        previous_id = None
+        for required_count in thresholds:
+            achievement_id = len(achievements) + 1
+            achievements.append(SimpleNamespace(
+                achievement_id=achievement_id,
+                achievement_name=f"achievement {achievement_id}",
+                description="",
+                emoji=None,
+                category=category,
+                is_secret=False,
+                is_progression=True,
+                required_count=required_count,
+                previous_achievement_id=previous_id,
+            ))
+            previous_id = achievement_id
+    return achievements
+
+
+def apply(links: dict, updates: list[dict]):
+    for update in updates:
+        links[update["achievement_id"]] = SimpleNamespace(
+            is_completed=update["is_completed"]
+        )
+
+
+def run(steps: int, repeats: int):
+    achievements = make_achievements()
+    catalog = AchievementCatalog()
+    catalog.fill(achievements, (len(achievements), None))
+    categories = list(CHAINS)
+
+    def previous(links, stats):
+        return get_user_achievements_updates(
+            USER_ID, achievements, links, stats
+        )
+
+    def changes(links, stats):
+        completed_ids = {
+            achievement_id for achievement_id, link in links.items()
+            if link.is_completed
+        }
+        return catalog.get_user_achievements_changes(
+            USER_ID, categories, completed_ids, stats, 1
+        )
+
+    print(f"{'evaluator':<10}{'us/call':>10}{'rows':>10}{'rows/step':>12}")
+    for name, evaluate in (("previous", previous), ("changes", changes)):
+        links, rows, samples = {}, 0, []
+        for step in range(1, steps + 1):
+            stats = SimpleNamespace(**dict.fromkeys(categories, step))
+            started = time.perf_counter()
+            for _ in range(repeats):
+                updates = evaluate(links, stats)
+            samples.append((time.perf_counter() - started) / repeats * 1e6)
+            rows += len(updates)
+            apply(links, updates)
+        print(
+            f"{name:<10}{statistics.median(samples):>10.2f}"
+            f"{rows:>10}{rows / steps:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    run(args.steps, args.repeats)
@@ -0,0 +1,57 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config.settings import config
+
+
+def make_engine() -> AsyncEngine:
+    return create_async_engine(config.pg_settings.get_dsn(), echo=False)
+
+
+class StatementCounter:
+    """
+    Счётчик обращений к СУБД (round trips) через события движка
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *_args, **_kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(
+            self.engine.sync_engine, "before_cursor_execute", self._on_execute
+        )
+        return self
+
+    def __exit__(self, *_exc):
+        event.remove(
+            self.engine.sync_engine, "before_cursor_execute", self._on_execute
+        )
+
+
+@contextmanager
+def timer(samples: list[float]):
+    started = time.perf_counter()
+    yield
+    samples.append((time.perf_counter() - started) * 1000)
+
+
+def percentile(samples: list[float], pct: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100)[pct - 1]
+
+
+def report(title: str, samples: list[float], statements: int) -> str:
+    return (
+        f"{title:<28} round_trips={statements / len(samples):>5.1f} "
+        f"p50={percentile(samples, 50):>7.2f}ms "
+        f"p95={percentile(samples, 95):>7.2f}ms"
+    )
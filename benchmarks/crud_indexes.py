@@ -0,0 +1,251 @@
+"""
+Планы выполнения и время CRUD-запросов на синтетических данных
+до и после создания индексов из миграции 5b7e2c41d9a3.
+
+Скрипт пересоздаёт схему в ОТДЕЛЬНОЙ базе (по умолчанию bench_db
+на том же сервере), заполняет её и для каждого масштаба выводит
+EXPLAIN (ANALYZE, BUFFERS) и медиану времени каждого запроса.
+
+Запуск:
+    python -m benchmarks.crud_indexes --scales 10000 100000 1000000 \
+        --output crud_indexes.md
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import MagicMock
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection
+
+from app.core.config.settings import config
+from app.modules.todo.crud.task import (
+    get_user_tasks,
+    get_user_tasks_in_list,
+    get_task_details_for_user,
+    get_task_users,
+)
+from app.modules.todo.crud.task_list import (
+    get_user_trash_list_id,
+    fetch_user_lists_raw,
+    get_max_position,
+    get_previous_list_id,
+)
+from app.modules.todo.models import Base
+
+INDEXES = {
+    "ix_task_accesses_user_id_task_id":
+        "CREATE INDEX ix_task_accesses_user_id_task_id "
+        "ON task_accesses (user_id, task_id)",
+    "ix_list_accesses_user_id_role":
+        "CREATE INDEX ix_list_accesses_user_id_role "
+        "ON list_accesses (user_id, role, list_id)",
+    "ix_tasks_in_lists_task_id":
+        "CREATE INDEX ix_tasks_in_lists_task_id ON tasks_in_lists (task_id)",
+    "ix_tasks_parent_task_id":
+        "CREATE INDEX ix_tasks_parent_task_id ON tasks (parent_task_id)",
+    "ix_tasks_active_top_level_updated_at":
+        "CREATE INDEX ix_tasks_active_top_level_updated_at "
+        "ON tasks (updated_at, task_id) WHERE parent_task_id IS NULL "
+        "AND completed_at IS NULL AND canceled_at IS NULL",
+}
+
+LISTS_PER_USER = 5
+TASKS_PER_USER = 100
+
+SEED_SQL = [
+    """
+    INSERT INTO users (telegram_id, first_name, gender, timezone_name,
+                       timezone_offset, is_bot_stopped, stopped_count)
+    SELECT u, 'user ' || u, 'OTHER', 'Europe/Moscow', interval '3 hours',
+           false, 0
+    FROM generate_series(1, :users) AS u
+    """,
+    """
+    INSERT INTO lists (list_id, title, system_type)
+    SELECT l,
+           'list ' || l,
+           (ARRAY['TRASH', 'INBOX', 'ARCHIVE', 'NONE', 'NONE']::systemlisttypeenum[])
+           [((l - 1) % 5) + 1]
+    FROM generate_series(1, :users * 5) AS l
+    """,
+    """
+    INSERT INTO list_accesses (list_id, user_id, role, granted_by, position)
+    SELECT l, ((l - 1) / 5) + 1, 'OWNER', ((l - 1) / 5) + 1, (l - 1) % 5
+    FROM generate_series(1, :users * 5) AS l
+    """,
+    """
+    INSERT INTO tasks (task_id, message_id, title, priority, urgency, status,
+                       is_shared, parent_task_id, completed_at, canceled_at,
+                       is_recurring, remind, created_at, updated_at)
+    SELECT t, t, 'task ' || t, 'MEDIUM', 'MEDIUM',
+           CASE WHEN t % 7 = 0 THEN 'DONE'
+                WHEN t % 11 = 0 THEN 'CANCELED'
+                ELSE 'IN_PROGRESS' END::taskstatusenum,
+           false,
+           CASE WHEN t % 10 = 0 THEN t - 1 END,
+           CASE WHEN t % 7 = 0 THEN now() END,
+           CASE WHEN t % 11 = 0 AND t % 7 <> 0 THEN now() END,
+           false, false,
+           now() - interval '1 year',
+           now() - (t % 100000) * interval '1 minute'
+    FROM generate_series(1, :tasks) AS t
+    """,
+    """
+    INSERT INTO task_accesses (task_id, user_id, role, granted_by)
+    SELECT t, (t % :users) + 1, 'OWNER', (t % :users) + 1
+    FROM generate_series(1, :tasks) AS t
+    """,
+    """
+    INSERT INTO tasks_in_lists (list_id, task_id)
+    SELECT (t % :users) * 5
+           + CASE WHEN t % 7 = 0 THEN 3
+                  WHEN t % 11 = 0 THEN 1
+                  ELSE 2 END,
+           t
+    FROM generate_series(1, :tasks) AS t
+    """,
+]
+
+
+class CapturingSession:
+    """
+    Подменяет сессию, чтобы получить запрос, который строит CRUD-функция
+    """
+
+    def __init__(self):
+        self.statement = None
+
+    async def execute(self, statement, *_args, **_kwargs):
+        self.statement = statement
+        return MagicMock()
+
+    async def scalars(self, statement, *_args, **_kwargs):
+        self.statement = statement
+        return MagicMock()
+
+
+async def capture_sql(crud_function, *args) -> str:
+    session = CapturingSession()
+    try:
+        await crud_function(session, *args)
+    except (TypeError, ValueError):
+        # Разбор подставного результата не важен: запрос уже перехвачен
+        if session.statement is None:
+            raise
+    return str(session.statement.compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={"literal_binds": True},
+    ))
+
+
+async def build_queries(users: int) -> dict[str, str]:
+    user_id = users // 2 + 1
+    inbox_list_id = (user_id - 1) * LISTS_PER_USER + 2
+    task_id = user_id - 1
+    return {
+        "get_user_tasks": await capture_sql(
+            get_user_tasks, user_id, "default"
+        ),
+        "get_user_tasks_in_list": await capture_sql(
+            get_user_tasks_in_list, user_id, inbox_list_id, "default"
+        ),
+        "get_task_details_for_user": await capture_sql(
+            get_task_details_for_user, user_id, task_id
+        ),
+        "get_task_users": await capture_sql(get_task_users, task_id),
+        "get_user_trash_list_id": await capture_sql(
+            get_user_trash_list_id, user_id
+        ),
+        "fetch_user_lists_raw": await capture_sql(
+            fetch_user_lists_raw, user_id
+        ),
+        "get_max_position": await capture_sql(
+            get_max_position, user_id, None
+        ),
+        "get_previous_list_id": await capture_sql(
+            get_previous_list_id, task_id, inbox_list_id
+        ),
+    }
+
+
+async def seed(connection: AsyncConnection, tasks: int) -> int:
+    users = max(tasks // TASKS_PER_USER, 1)
+    await connection.run_sync(Base.metadata.drop_all)
+    await connection.run_sync(Base.metadata.create_all)
+    for index_name in INDEXES:
+        await connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    for sql in SEED_SQL:
+        await connection.execute(
+            text(sql), {"users": users, "tasks": tasks}
+        )
+    await connection.execute(text("ANALYZE"))
+    return users
+
+
+async def measure(
+        connection: AsyncConnection,
+        sql: str,
+        repeats: int,
+) -> tuple[str, float]:
+    plan = (await connection.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+    )).scalars().all()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await connection.execute(text(sql))
+        samples.append((time.perf_counter() - started) * 1000)
+    return "\n".join(plan), statistics.median(samples)
+
+
+async def run(scales: list[int], database: str, repeats: int) -> str:
+    dsn = config.pg_settings.get_dsn().set(database=database)
+    engine = create_async_engine(dsn, echo=False)
+    report = []
+
+    for tasks in scales:
+        async with engine.begin() as connection:
+            users = await seed(connection, tasks)
+        queries = await build_queries(users)
+        report.append(f"# {tasks} задач, {users} пользователей\n")
+
+        for indexed in (False, True):
+            async with engine.begin() as connection:
+                if indexed:
+                    for sql in INDEXES.values():
+                        await connection.execute(text(sql))
+                    await connection.execute(text("ANALYZE"))
+                report.append(
+                    f"## {'С индексами' if indexed else 'Без индексов'}\n"
+                )
+                for name, sql in queries.items():
+                    plan, median_ms = await measure(connection, sql, repeats)
+                    report.append(
+                        f"### {name}: {median_ms:.3f} ms\n"
+                        f"```\n{plan}\n```\n"
+                    )
+                    print(
+                        f"{tasks:>8} {'indexed' if indexed else 'plain':<8} "
+                        f"{name:<28} {median_ms:>9.3f} ms"
+                    )
+
+    await engine.dispose()
+    return "\n".join(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--database", default="bench_db")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.scales, args.database, args.repeats))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(result)
@@ -0,0 +1,142 @@
+"""
+Размер и время (де)сериализации состояния диалога за один клик:
+JSON aiogram против BinaryStateSerializer без сжатия и со сжатием.
+
+На каждый клик aiogram-dialog сохраняет контекст (dialog_data
+с карточкой задачи и картой списков) и стек диалогов.
+
+Запуск (БД и Redis не нужны):
+    python -m benchmarks.dialog_state --lists 10 100 500
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.storage.serializer import (
+    BinaryStateSerializer,
+    JsonStateSerializer,
+)
+from app.core.utils.dialog_serialization import to_dialog_safe
+from app.modules.todo.models import (
+    LevelEnum,
+    SystemListTypeEnum,
+    TaskStatusEnum,
+)
+
+
+def make_task(task_id: int) -> dict:
+    now = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+    return {
+        "task_id": task_id,
+        "task_title": f"Задача №{task_id}",
+        "task_description": "Описание задачи " * 5,
+        "status": TaskStatusEnum.IN_PROGRESS,
+        "priority": LevelEnum.HIGH,
+        "priority_label": "🔴 Высокий",
+        "urgency": LevelEnum.LOW,
+        "urgency_label": "🟢 Низкая",
+        "created_at": now - timedelta(days=3),
+        "updated_at": now,
+        "deadline": now + timedelta(days=1),
+        "postponed_count": 0,
+        "is_recurring": False,
+        "selected_list_id": 2,
+        "selected_list_title": "Входящие",
+        "role": "Владелец",
+        "has_checklist": False,
+    }
+
+
+def make_lists(count: int) -> dict:
+    return {
+        list_id: {
+            "list_id": list_id,
+            "title": f"Список {list_id}",
+            "parent_list_id": list_id // 2 or None,
+            "system_type": (
+                SystemListTypeEnum.INBOX if list_id == 1
+                else SystemListTypeEnum.NONE
+            ),
+            "position": list_id,
+            "level": list_id.bit_length() - 1,
+        }
+        for list_id in range(1, count + 1)
+    }
+
+
+def make_click_payloads(lists: int) -> list[dict]:
+    context = {
+        "_intent_id": "aBcDeFgHiJ",
+        "_stack_id": "",
+        "state": "TaskActionsSG:main",
+        "start_data": {"task_id": 15, "mode": "move_task"},
+        "dialog_data": {
+            **to_dialog_safe(make_task(15)),
+            "lists": to_dialog_safe(make_lists(lists)),
+        },
+        "widget_data": {"lists_scroll": 0},
+        "access_settings": {"user_ids": [123456789], "custom": {}},
+    }
+    stack = {
+        "_id": "",
+        "intents": ["kLmNoPqRsT", "aBcDeFgHiJ"],
+        "last_message_id": 4321,
+        "last_reply_keyboard": False,
+        "last_media_id": None,
+        "last_media_unique_id": None,
+        "last_income_media_group_id": None,
+    }
+    return [context, stack]
+
+
+def measure(serializer, payloads: list[dict], iterations: int):
+    dumped = [serializer.dumps(payload) for payload in payloads]
+    size = sum(
+        len(value.encode() if isinstance(value, str) else value)
+        for value in dumped
+    )
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for payload in payloads:
+            serializer.dumps(payload)
+    encode_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for value in dumped:
+            serializer.loads(value)
+    decode_us = (time.perf_counter() - started) / iterations * 1e6
+    return size, encode_us, decode_us
+
+
+def run(list_counts: list[int], iterations: int):
+    serializers = (
+        ("json", JsonStateSerializer()),
+        ("binary", BinaryStateSerializer(compress_threshold=-1)),
+        ("binary+zlib", BinaryStateSerializer(compress_threshold=1024)),
+    )
+    print(
+        f"{'lists':>6} {'serializer':<12} {'bytes/click':>12} "
+        f"{'encode µs':>10} {'decode µs':>10}"
+    )
+    for lists in list_counts:
+        payloads = make_click_payloads(lists)
+        for title, serializer in serializers:
+            size, encode_us, decode_us = measure(
+                serializer, payloads, iterations
+            )
+            print(
+                f"{lists:>6} {title:<12} {size:>12} "
+                f"{encode_us:>10.1f} {decode_us:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--lists", type=int, nargs="+", default=[10, 100, 500]
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    run(args.lists, args.iterations)
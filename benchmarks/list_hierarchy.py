@@ -0,0 +1,127 @@
+"""
+Построение дерева списков пользователя: прежний рекурсивный обход
+против итеративного build_ordered_hierarchy и выбора видимых списков
+из уже построенного (кэшированного) дерева.
+
+Дерево случайное, каждый седьмой список скрыт. Для каждого размера
+печатается лучшее время из --repeats запусков.
+
+Запуск:
+    python -m benchmarks.list_hierarchy --sizes 10 1000 50000 --repeats 3
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from app.modules.todo.services.task_list import (
+    build_ordered_hierarchy,
+    build_ordered_nodes,
+    select_visible_lists,
+)
+
+
+def recursive_build_ordered_hierarchy(rows, *, is_hidden=None):
+    sub_lists_map = defaultdict(list)
+    for row in rows:
+        sub_lists_map[row.parent_list_id].append({
+            "list_id": row.list_id,
+            "list_title": row.title,
+            "position": row.position,
+            "is_hidden": is_hidden(row) if is_hidden else False,
+        })
+
+    ordered_buttons = []
+    ordered_lists = {}
+
+    def traverse(parent_id, prefix):
+        sub_lists = sorted(
+            sub_lists_map.get(parent_id, []),
+            key=lambda n: n["position"],
+        )
+        for sub_list in sub_lists:
+            pos = f"{prefix}{sub_list['position']}."
+            if not sub_list["is_hidden"]:
+                ordered_buttons.append({
+                    "list_id": sub_list["list_id"],
+                    "list_title": sub_list["list_title"],
+                    "pos": pos,
+                })
+                ordered_lists[sub_list["list_id"]] = sub_list["list_title"]
+            traverse(sub_list["list_id"], pos)
+
+    traverse(None, "")
+    return ordered_buttons, ordered_lists
+
+
+def synthetic_tree(size: int, seed: int = 0) -> list[SimpleNamespace]:
+    rnd = random.Random(seed)
+    rows = []
+    positions = defaultdict(int)
+    for list_id in range(1, size + 1):
+        parent_list_id = rnd.choice(
+            [None, rnd.randint(1, list_id - 1)] if list_id > 1 else [None]
+        )
+        positions[parent_list_id] += 1
+        rows.append(SimpleNamespace(
+            list_id=list_id,
+            title=f"L{list_id}",
+            parent_list_id=parent_list_id,
+            position=positions[parent_list_id],
+        ))
+    rows.sort(key=lambda r: (r.position, r.list_id))
+    return rows
+
+
+def is_hidden_every_7th(row) -> bool:
+    return row.list_id % 7 == 0
+
+
+def best_of(func, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(sizes: list[int], repeats: int):
+    print(
+        f"{'lists':>8}{'recursive ms':>15}{'iterative ms':>15}"
+        f"{'cached ms':>12}"
+    )
+    for size in sizes:
+        rows = synthetic_tree(size)
+        nodes = build_ordered_nodes(rows)
+        old = best_of(
+            lambda: recursive_build_ordered_hierarchy(
+                rows, is_hidden=is_hidden_every_7th
+            ),
+            repeats,
+        )
+        new = best_of(
+            lambda: build_ordered_hierarchy(
+                rows, is_hidden=is_hidden_every_7th
+            ),
+            repeats,
+        )
+        cached = best_of(
+            lambda: select_visible_lists(nodes, is_hidden=is_hidden_every_7th),
+            repeats,
+        )
+        print(
+            f"{size:>8}{old * 1000:>15.3f}{new * 1000:>15.3f}"
+            f"{cached * 1000:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 1_000, 50_000]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeats)
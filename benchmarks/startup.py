@@ -0,0 +1,128 @@
+"""
+Время запуска бота: импорт роутеров и диалогов, проверка
+идентификаторов виджетов (always/cached/off), сборка диспетчера
+и обработка первого апдейта.
+
+Каждый замер - отдельный процесс, чтобы импорт не брался из кэша
+модулей. Telegram, БД и Redis не нужны: запросы к Bot API
+перехватываются, состояние диалогов хранится в памяти.
+
+Запуск:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+STAGES = ("import_ms", "validate_ms", "setup_ms", "first_update_ms")
+MODES = ("always", "cached", "off")
+
+
+def run_child(mode: str, stamp_path: str):
+    started = time.perf_counter()
+    import asyncio
+    from datetime import datetime, timezone
+
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.base import BaseSession
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Chat, Message, Update, User
+    from aiogram_dialog import setup_dialogs
+
+    from app.modules.base.ui.handlers import routers
+    from app.modules.base.ui.handlers.others import others_router
+    from app.modules.todo.ui.dialogs import dialogs
+    from app.modules.todo.ui.dialogs.id_uniqueness_validator import (
+        validate_dialogs,
+        validate_dialogs_cached,
+    )
+    imported = time.perf_counter()
+
+    if mode == "cached":
+        validate_dialogs_cached(dialogs, stamp_path=Path(stamp_path))
+    elif mode == "always":
+        validate_dialogs(dialogs)
+    validated = time.perf_counter()
+
+    class NullSession(BaseSession):
+        async def make_request(self, bot, method, timeout=None):
+            return None
+
+        async def stream_content(self, *args, **kwargs):
+            raise NotImplementedError
+
+        async def close(self):
+            pass
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_routers(*routers)
+    dp.include_routers(*dialogs)
+    setup_dialogs(dp)
+    dp.include_router(others_router)
+    bot = Bot(token="42:TEST", session=NullSession())
+    set_up = time.perf_counter()
+
+    update = Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="Тест"),
+            text="привет",
+        ),
+    )
+    asyncio.run(dp.feed_update(bot, update))
+    handled = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "validate_ms": (validated - imported) * 1000,
+        "setup_ms": (set_up - validated) * 1000,
+        "first_update_ms": (handled - set_up) * 1000,
+    }))
+
+
+def measure(mode: str, stamp_path: str) -> dict[str, float]:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup",
+         "--child", mode, "--stamp", stamp_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def run(runs: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        stamp_path = str(Path(tmp) / "dialogs.validated")
+        # Первый запуск в режиме cached проверяет диалоги и пишет хэш
+        measure("cached", stamp_path)
+        columns = STAGES + ("process_ms",)
+        print(f"{'mode':<8}" + "".join(f"{name:>16}" for name in columns))
+        for mode in MODES:
+            samples = [measure(mode, stamp_path) for _ in range(runs)]
+            medians = [
+                statistics.median(sample[name] for sample in samples)
+                for name in columns
+            ]
+            print(f"{mode:<8}" + "".join(f"{value:>16.1f}" for value in medians))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=MODES)
+    parser.add_argument("--stamp", default="")
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child, args.stamp)
+    else:
+        run(args.runs)
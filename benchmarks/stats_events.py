@@ -0,0 +1,243 @@
+"""
+Запись статистики под конкурентной нагрузкой: upsert строки user_stats
+против журнала stats_events и счётчиков в Redis с фоновым переносом.
+
+Скрипт пересоздаёт схему в ОТДЕЛЬНОЙ базе (по умолчанию bench_db
+на том же сервере). Каждый из --workers воркеров в своей транзакции
+начисляет статистику случайной группе из --users-per-task пользователей,
+выбранных среди --users (малое число пользователей - горячие строки).
+Для каждого режима выводятся пропускная способность, задержка
+транзакции, обновления и мёртвые версии строк user_stats и объём WAL
+(включая перенос приращений в конце замера). Режим redis использует
+ключи с префиксом bench_stats в Redis из настроек.
+
+Запуск:
+    python -m benchmarks.stats_events --users 10 1000 --workers 32 \
+        --duration 10
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from redis.asyncio import Redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.core.config.settings import config
+from app.modules.todo.crud.stats import (
+    record_users_stats_events,
+    rollup_stats_events,
+    upsert_users_stats,
+)
+from app.modules.todo.models import Base
+from app.modules.todo.services.stats_counters import StatsCounters
+
+CATEGORIES = ["tasks_completed", "medium_priority_tasks_completed"]
+MODES = ("upsert", "events", "redis")
+
+TABLE_STATS_SQL = """
+SELECT coalesce(sum(n_tup_ins), 0), coalesce(sum(n_tup_upd), 0),
+       coalesce(sum(n_tup_hot_upd), 0), coalesce(sum(n_dead_tup), 0)
+FROM pg_stat_user_tables
+WHERE relname = :table
+"""
+
+
+async def seed(engine: AsyncEngine, users: int):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(text(
+            """
+            INSERT INTO users (telegram_id, first_name, gender, timezone_name,
+                               timezone_offset, is_bot_stopped, stopped_count)
+            SELECT u, 'user ' || u, 'OTHER', 'Europe/Moscow',
+                   interval '3 hours', false, 0
+            FROM generate_series(1, :users) AS u
+            """
+        ), {"users": users})
+        await connection.execute(text(
+            "INSERT INTO user_stats (user_id) "
+            "SELECT u FROM generate_series(1, :users) AS u"
+        ), {"users": users})
+
+
+async def snapshot(engine: AsyncEngine) -> dict[str, int]:
+    async with engine.connect() as connection:
+        # Счётчики pg_stat отправляются с задержкой
+        await connection.execute(text("SELECT pg_stat_force_next_flush()"))
+        await connection.execute(text("SELECT pg_stat_clear_snapshot()"))
+        inserted, updated, hot, dead = (await connection.execute(
+            text(TABLE_STATS_SQL), {"table": "user_stats"}
+        )).one()
+        lsn = (await connection.execute(
+            text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn")
+        )).scalar_one()
+    return {
+        "inserted": inserted, "updated": updated, "hot": hot, "dead": dead,
+        "wal": int(lsn),
+    }
+
+
+async def write(
+        session: AsyncSession,
+        mode: str,
+        user_ids: list[int],
+        counters: StatsCounters,
+):
+    if mode == "redis":
+        await counters.increment(session, user_ids, CATEGORIES)
+    elif mode == "events":
+        await record_users_stats_events(session, user_ids, CATEGORIES)
+    else:
+        await upsert_users_stats(
+            session, user_ids, dict.fromkeys(CATEGORIES, 1)
+        )
+
+
+async def worker(
+        session_maker: async_sessionmaker[AsyncSession],
+        mode: str,
+        users: int,
+        users_per_task: int,
+        deadline: float,
+        latencies: list[float],
+        counters: StatsCounters,
+):
+    while time.perf_counter() < deadline:
+        user_ids = random.sample(range(1, users + 1), users_per_task)
+        started = time.perf_counter()
+        async with session_maker() as session:
+            await write(session, mode, user_ids, counters)
+            await session.commit()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def rollup_events(
+        session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int,
+):
+    while True:
+        async with session_maker() as session:
+            moved = await rollup_stats_events(session, batch_size)
+            await session.commit()
+        if moved < batch_size:
+            break
+
+
+async def rollup_loop(
+        session_maker: async_sessionmaker[AsyncSession],
+        mode: str,
+        interval: float,
+        batch_size: int,
+        stop: asyncio.Event,
+        counters: StatsCounters,
+):
+    while True:
+        stopped = stop.is_set()
+        if not stopped:
+            await asyncio.sleep(interval)
+        if mode == "redis":
+            await counters.flush()
+        else:
+            await rollup_events(session_maker, batch_size)
+        if stopped:
+            break
+
+
+async def run_mode(
+        engine: AsyncEngine,
+        mode: str,
+        args: argparse.Namespace,
+        users: int,
+        counters: StatsCounters,
+) -> dict[str, float]:
+    await seed(engine, users)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    counters._session_maker = session_maker
+    keys = [key async for key in counters._redis.scan_iter(
+        f"{counters.prefix}:*"
+    )]
+    if keys:
+        await counters._redis.delete(*keys)
+    before = await snapshot(engine)
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    rollup = None
+    if mode != "upsert":
+        rollup = asyncio.create_task(rollup_loop(
+            session_maker, mode, args.rollup_interval,
+            args.rollup_batch_size, stop, counters,
+        ))
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        worker(
+            session_maker, mode, users, args.users_per_task,
+            deadline, latencies, counters,
+        )
+        for _ in range(args.workers)
+    ))
+    elapsed = time.perf_counter() - started
+    if rollup is not None:
+        stop.set()
+        await rollup
+    after = await snapshot(engine)
+    latencies.sort()
+    return {
+        "tx_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99)],
+        "upd": after["updated"] - before["updated"],
+        "hot_upd": after["hot"] - before["hot"],
+        "dead_tup": after["dead"],
+        "wal_kb": (after["wal"] - before["wal"]) / 1024,
+    }
+
+
+async def run(args: argparse.Namespace):
+    dsn = config.pg_settings.get_dsn().set(database=args.database)
+    engine = create_async_engine(
+        dsn, pool_size=args.workers + 1, max_overflow=0
+    )
+    redis_settings = config.redis_settings
+    redis = Redis(
+        host=redis_settings.host,
+        port=redis_settings.port,
+        db=redis_settings.db,
+        password=redis_settings.password.get_secret_value(),
+        username=redis_settings.username,
+    )
+    counters = StatsCounters(prefix="bench_stats")
+    counters.setup(redis, batch_size=args.rollup_batch_size)
+    columns = ("tx_per_s", "p50_ms", "p99_ms", "upd", "hot_upd",
+               "dead_tup", "wal_kb")
+    print(f"{'users':>8} {'mode':<8}" + "".join(f"{c:>12}" for c in columns))
+    for users in args.users:
+        for mode in MODES:
+            result = await run_mode(engine, mode, args, users, counters)
+            print(
+                f"{users:>8} {mode:<8}"
+                + "".join(f"{result[c]:>12.1f}" for c in columns)
+            )
+    await engine.dispose()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--users-per-task", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--rollup-interval", type=float, default=1)
+    parser.add_argument("--rollup-batch-size", type=int, default=5000)
+    parser.add_argument("--database", default="bench_db")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""
+Сравнение загрузки карточки задачи: четыре последовательных запроса
+против одного объединённого (get_task_details_for_user).
+
+Запуск (нужна заполненная БД):
+    python -m benchmarks.task_detail --iterations 500
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.modules.todo.crud.task import (
+    get_task_for_user,
+    get_list_for_task,
+    get_task_access,
+    get_task_details_for_user,
+)
+from app.modules.todo.crud.user import get_user_timezone
+from app.modules.todo.models import TaskAccess
+from benchmarks.common import make_engine, StatementCounter, timer, report
+
+
+async def load_sequential(session, user_id, task_id):
+    task = await get_task_for_user(session, user_id, task_id)
+    task_list = await get_list_for_task(session, task_id)
+    access = await get_task_access(session, user_id, task_id)
+    timezone = await get_user_timezone(session, user_id)
+    return task, task_list, access, timezone
+
+
+async def load_combined(session, user_id, task_id):
+    return await get_task_details_for_user(session, user_id, task_id)
+
+
+async def run(iterations: int):
+    engine = make_engine()
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_maker() as session:
+        access = (await session.execute(select(TaskAccess).limit(1))).scalar()
+    if access is None:
+        raise SystemExit("В БД нет ни одной задачи для замера")
+
+    for title, loader in (
+            ("sequential (4 queries)", load_sequential),
+            ("combined (1 query)", load_combined),
+    ):
+        samples: list[float] = []
+        with StatementCounter(engine) as counter:
+            for _ in range(iterations):
+                async with session_maker() as session:
+                    with timer(samples):
+                        await loader(session, access.user_id, access.task_id)
+        print(report(title, samples, counter.count))
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
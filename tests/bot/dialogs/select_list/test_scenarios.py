@@ -61,7 +61,7 @@ async def test_create_task_scenario_get_lists(
     scenario = CreateTaskScenario(ListSelectionMode.CREATE_TASK)
 
     with patch(
-            "app.bot.dialogs.select_list.scenarios.fetch_user_lists_raw",
+            "app.modules.todo.services.task_list.fetch_user_lists_raw",
             return_value=FAKE_LISTS,
     ):
         buttons, lists = await scenario.get_lists(
@@ -108,7 +108,7 @@ async def test_edit_task_get_lists(
     scenario = EditTaskScenario(ListSelectionMode.EDIT_TASK)
 
     with patch(
-            "app.bot.dialogs.select_list.scenarios.fetch_user_lists_raw",
+            "app.modules.todo.services.task_list.fetch_user_lists_raw",
             AsyncMock(return_value=FAKE_LISTS),
     ):
         buttons, lists = await scenario.get_lists(
@@ -169,7 +169,7 @@ async def test_create_list_scenario_get_lists(
     scenario = CreateListScenario(ListSelectionMode.CREATE_LIST)
 
     with patch(
-            "app.bot.dialogs.select_list.scenarios.fetch_user_lists_raw",
+            "app.modules.todo.services.task_list.fetch_user_lists_raw",
             return_value=FAKE_LISTS,
     ):
         buttons, lists = await scenario.get_lists(
@@ -218,7 +218,7 @@ async def test_edit_list_get_lists(
     scenario = EditListScenario(ListSelectionMode.EDIT_LIST)
 
     with patch(
-            "app.bot.dialogs.select_list.scenarios.fetch_user_lists_raw",
+            "app.modules.todo.services.task_list.fetch_user_lists_raw",
             AsyncMock(return_value=FAKE_LISTS),
     ):
         buttons, lists = await scenario.get_lists(
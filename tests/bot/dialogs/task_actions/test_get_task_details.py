@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from app.modules.todo.models import (
+    LevelEnum,
+    TaskStatusEnum,
+    AccessRoleEnum,
+)
+from app.modules.todo.ui.dialogs.task_actions.getters import get_task
+
+GETTERS = "app.modules.todo.ui.dialogs.task_actions.getters"
+
+
+def fake_task_details(status: TaskStatusEnum = TaskStatusEnum.IN_PROGRESS):
+    task = SimpleNamespace(
+        task_id=7,
+        title="Задача",
+        description=None,
+        priority=LevelEnum.HIGH,
+        urgency=LevelEnum.LOW,
+        status=status,
+        is_shared=False,
+        parent_task_id=None,
+        deadline=None,
+        completed_at=None,
+        canceled_at=None,
+        postponed_count=None,
+        is_recurring=False,
+        recurrence_rule_id=None,
+        duration=None,
+        remind=False,
+    )
+    task_list = SimpleNamespace(list_id=3, title="Работа")
+    access = SimpleNamespace(role=AccessRoleEnum.OWNER)
+    return task, task_list, access, "Europe/Moscow"
+
+
+@pytest.mark.asyncio
+async def test_get_task_uses_single_details_call(
+        fake_dialog_manager,
+        mock_session,
+):
+    fake_dialog_manager.dialog_data = {"task_id": 7}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+    details = AsyncMock(return_value=fake_task_details())
+
+    with patch(f"{GETTERS}.get_full_task_info", details):
+        data = await get_task(
+            fake_dialog_manager,
+            event_from_user=SimpleNamespace(id=42),
+        )
+
+    details.assert_awaited_once_with(mock_session, 42, 7)
+    assert data["task_title"] == "Задача"
+    assert data["selected_list_id"] == 3
+    assert fake_dialog_manager.dialog_data["selected_list_title"] == "Работа"
+
+
+@pytest.mark.asyncio
+async def test_get_task_marks_new_task_in_process(
+        fake_dialog_manager,
+        mock_session,
+):
+    fake_dialog_manager.dialog_data = {"task_id": 7}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+    mark = AsyncMock()
+
+    with (
+        patch(
+            f"{GETTERS}.get_full_task_info",
+            AsyncMock(return_value=fake_task_details(TaskStatusEnum.NEW)),
+        ),
+        patch(f"{GETTERS}.mark_task_in_process", mark),
+    ):
+        await get_task(
+            fake_dialog_manager,
+            event_from_user=SimpleNamespace(id=42),
+        )
+
+    mark.assert_awaited_once_with(mock_session, 7, 42)
+
+
+@pytest.mark.asyncio
+async def test_get_task_unavailable(fake_dialog_manager, mock_session):
+    fake_dialog_manager.dialog_data = {"task_id": 7}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+
+    with patch(
+            f"{GETTERS}.get_full_task_info",
+            AsyncMock(return_value=None),
+    ):
+        data = await get_task(
+            fake_dialog_manager,
+            event_from_user=SimpleNamespace(id=42),
+        )
+
+    assert data == {}
@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.modules.todo.crud.task import get_user_tasks_page
+from app.modules.todo.services.task import (
+    encode_task_cursor,
+    decode_task_cursor,
+)
+from app.modules.todo.ui.dialogs.tasks_management.getters import (
+    get_all_tasks,
+    TASKS_PAGE_SIZE,
+)
+from app.modules.todo.ui.dialogs.tasks_management.handlers import (
+    go_next_tasks_page,
+    go_prev_tasks_page,
+)
+
+GETTERS = "app.modules.todo.ui.dialogs.tasks_management.getters"
+
+
+def fake_task(task_id: int):
+    return SimpleNamespace(
+        task_id=task_id,
+        title=f"Задача {task_id}",
+        updated_at=datetime(2026, 1, 1, 12, 0, task_id, 123456, timezone.utc),
+    )
+
+
+def test_task_cursor_round_trip():
+    task = fake_task(42)
+
+    cursor = encode_task_cursor(task)
+
+    assert decode_task_cursor(cursor) == (task.updated_at, 42)
+    assert len(cursor) < 20
+
+
+@pytest.mark.asyncio
+async def test_tasks_page_joins_accesses_and_uses_keyset():
+    session = AsyncMock()
+    session.scalars.return_value = MagicMock(
+        all=MagicMock(return_value=[fake_task(i) for i in range(11)])
+    )
+    after = (datetime(2026, 1, 1, tzinfo=timezone.utc), 5)
+
+    tasks, has_next = await get_user_tasks_page(
+        session, 1, "default", 10, after
+    )
+
+    stmt = session.scalars.await_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "JOIN task_accesses ON task_accesses.task_id = tasks.task_id" in sql
+    assert "FROM tasks, task_accesses" not in sql
+    assert "(tasks.updated_at, tasks.task_id) <" in sql
+    assert "LIMIT" in sql
+    assert len(tasks) == 10
+    assert has_next is True
+
+
+@pytest.mark.asyncio
+async def test_get_all_tasks_renders_one_page(fake_dialog_manager, mock_session):
+    first_page = [fake_task(i) for i in range(1, TASKS_PAGE_SIZE + 1)]
+    fake_dialog_manager.dialog_data = {}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+    feed = AsyncMock(return_value=(first_page, "abc.a"))
+
+    with patch(f"{GETTERS}.get_user_tasks_feed_page", feed):
+        data = await get_all_tasks(
+            fake_dialog_manager, event_from_user=SimpleNamespace(id=42)
+        )
+
+    feed.assert_awaited_once_with(
+        mock_session, 42, "default", TASKS_PAGE_SIZE, None
+    )
+    assert len(data["task_buttons"]) == TASKS_PAGE_SIZE
+    assert data["has_next_page"] is True
+    assert data["has_prev_page"] is False
+    assert fake_dialog_manager.dialog_data["tasks_next_cursor"] == "abc.a"
+
+
+@pytest.mark.asyncio
+async def test_tasks_page_navigation(fake_dialog_manager, mock_session):
+    fake_dialog_manager.dialog_data = {"tasks_next_cursor": "abc.a"}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+
+    await go_next_tasks_page(None, None, fake_dialog_manager)
+    feed = AsyncMock(return_value=([fake_task(11)], None))
+    with patch(f"{GETTERS}.get_user_tasks_feed_page", feed):
+        data = await get_all_tasks(
+            fake_dialog_manager, event_from_user=SimpleNamespace(id=42)
+        )
+
+    feed.assert_awaited_once_with(
+        mock_session, 42, "default", TASKS_PAGE_SIZE, "abc.a"
+    )
+    assert data["task_buttons"][0]["pos"] == TASKS_PAGE_SIZE + 1
+    assert data["has_prev_page"] is True
+    assert data["has_next_page"] is False
+
+    await go_prev_tasks_page(None, None, fake_dialog_manager)
+    assert fake_dialog_manager.dialog_data["tasks_cursors"] == []
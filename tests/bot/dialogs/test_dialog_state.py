@@ -0,0 +1,139 @@
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from app.modules.todo.models import LevelEnum
+from app.modules.todo.ui.dialogs.common.dialog_state import DialogState
+from app.modules.todo.ui.dialogs.enums import DialogStateMode
+from app.modules.todo.ui.dialogs.task_actions.getters import get_task
+from app.modules.todo.ui.dialogs.task_actions.handlers import (
+    TASK_STATUS_CHANGE_KEYS,
+)
+from app.core.utils.dialog_serialization import to_dialog_safe
+
+DIALOG_STATE = "app.modules.todo.ui.dialogs.common.dialog_state"
+GETTERS = "app.modules.todo.ui.dialogs.task_actions.getters"
+
+TASK_VIEW = {
+    "task_id": 7,
+    "task_title": "Задача",
+    "description": "Описание",
+    "priority": LevelEnum.HIGH.value,
+    "status": "in_progress",
+    "selected_list_id": 3,
+    "selected_list_title": "Работа",
+}
+
+
+@pytest.fixture
+def reference_state():
+    state = DialogState(DialogStateMode.REFERENCE)
+    with patch(f"{GETTERS}.dialog_state", state):
+        yield state
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_keeps_only_ids(
+        reference_state,
+        fake_dialog_manager,
+        mock_session,
+):
+    fake_dialog_manager.dialog_data = {"task_id": 7}
+    fake_dialog_manager.middleware_data["session"] = mock_session
+    view = AsyncMock(return_value=(dict(TASK_VIEW), 5))
+
+    with patch(f"{DIALOG_STATE}.get_task_view", view):
+        data = await get_task(
+            fake_dialog_manager,
+            event_from_user=SimpleNamespace(id=42),
+        )
+
+    assert data["selected_list_title"] == "Работа"
+    assert fake_dialog_manager.dialog_data == {
+        "task_id": 7,
+        "selected_list_id": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_task_is_loaded_once_per_update(
+        reference_state,
+        fake_dialog_manager,
+        mock_session,
+):
+    fake_dialog_manager.dialog_data = {"task_id": 7}
+    view = AsyncMock(return_value=(dict(TASK_VIEW), 5))
+
+    with patch(f"{DIALOG_STATE}.get_task_view", view):
+        task_data = await reference_state.get_task_data(
+            fake_dialog_manager, mock_session, 42, TASK_STATUS_CHANGE_KEYS
+        )
+        await reference_state.get_task_data(
+            fake_dialog_manager, mock_session, 42, TASK_STATUS_CHANGE_KEYS
+        )
+
+    view.assert_awaited_once_with(mock_session, 42, 7)
+    assert task_data == {
+        "task_id": 7,
+        "task_title": "Задача",
+        "priority": "high",
+        "status": "in_progress",
+        "selected_list_id": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_copy_mode_reads_dialog_data(fake_dialog_manager, mock_session):
+    state = DialogState()
+    fake_dialog_manager.dialog_data = to_dialog_safe(TASK_VIEW)
+    view = AsyncMock()
+
+    with patch(f"{DIALOG_STATE}.get_task_view", view):
+        task_data = await state.get_task_data(
+            fake_dialog_manager, mock_session, 42, ("task_id", "task_title")
+        )
+
+    view.assert_not_awaited()
+    assert task_data == {"task_id": 7, "task_title": "Задача"}
+
+
+@pytest.mark.asyncio
+async def test_list_title_is_resolved_from_hierarchy(
+        reference_state,
+        fake_dialog_manager,
+        mock_session,
+):
+    reference_state.store_lists(fake_dialog_manager, {2: "Работа"})
+    nodes = [
+        SimpleNamespace(list_id=2, title="Работа"),
+        SimpleNamespace(list_id=3, title="Отчёты"),
+    ]
+    hierarchy = AsyncMock(return_value=nodes)
+
+    with patch(f"{DIALOG_STATE}.get_user_lists_hierarchy", hierarchy):
+        title = await reference_state.get_list_title(
+            fake_dialog_manager, mock_session, 42, 3
+        )
+
+    assert "lists" not in fake_dialog_manager.dialog_data
+    assert title == "Отчёты"
+    hierarchy.assert_awaited_once_with(mock_session, 42)
+
+
+@pytest.mark.asyncio
+async def test_copy_mode_list_title_comes_from_dialog_data(
+        fake_dialog_manager,
+        mock_session,
+):
+    state = DialogState()
+    state.store_lists(fake_dialog_manager, {2: "Работа"})
+    hierarchy = AsyncMock()
+
+    with patch(f"{DIALOG_STATE}.get_user_lists_hierarchy", hierarchy):
+        title = await state.get_list_title(
+            fake_dialog_manager, mock_session, 42, 2
+        )
+
+    hierarchy.assert_not_awaited()
+    assert title == "Работа"
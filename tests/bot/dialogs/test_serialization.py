@@ -3,7 +3,11 @@ from datetime import datetime, date
 import pytest
 
 from app.modules.todo.models import GenderEnum, LevelEnum, SystemListTypeEnum
-from app.core.utils.dialog_serialization import to_dialog_safe, from_dialog_safe
+from app.core.utils.dialog_serialization import (
+    to_dialog_safe,
+    from_dialog_safe,
+    from_dialog_safe_keys,
+)
 
 
 def test_to_dialog_safe_enum_positive():
@@ -168,3 +172,26 @@ def test_from_dialog_safe_non_dict_non_list_non_basic():
     assert from_dialog_safe(123) == 123
     assert from_dialog_safe("text") == "text"
     assert from_dialog_safe(None) is None
+
+
+def test_from_dialog_safe_keys_decodes_only_requested_keys():
+    data = {
+        "task_id": 1,
+        "priority": {"__enum__": "LevelEnum.HIGH"},
+        "lists": {"__int__1": {"title": "Входящие"}},
+    }
+
+    assert from_dialog_safe_keys(data, ("task_id", "priority", "missing")) == {
+        "task_id": 1,
+        "priority": LevelEnum.HIGH,
+    }
+
+
+def test_to_dialog_safe_datetime_subclass():
+    class LocalDateTime(datetime):
+        pass
+
+    dt = LocalDateTime(2024, 1, 2, 3, 4, 5)
+    assert to_dialog_safe({"at": dt}) == {
+        "at": {"__datetime__": "2024-01-02T03:04:05"}
+    }
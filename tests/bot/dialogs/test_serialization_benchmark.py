@@ -0,0 +1,139 @@
+import time
+from datetime import datetime, date, timedelta, timezone
+from enum import Enum
+
+from app.modules.todo.models import (
+    LevelEnum,
+    SystemListTypeEnum,
+    TaskStatusEnum,
+)
+from app.modules.todo.models.enums import db_enums
+from app.core.utils.dialog_serialization import (
+    to_dialog_safe,
+    from_dialog_safe,
+    from_dialog_safe_keys,
+)
+from app.modules.todo.ui.dialogs.task_actions.handlers import (
+    TASK_STATUS_CHANGE_KEYS,
+)
+
+_LEGACY_ENUM_MAP = {cls.__name__: cls for cls in db_enums}
+
+
+def legacy_to_dialog_safe(value):
+    if isinstance(value, Enum):
+        return {"__enum__": f"{value.__class__.__name__}.{value.name}"}
+    if isinstance(value, (datetime, date)):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, dict):
+        safe_dict = {}
+        for k, v in value.items():
+            safe_key = f"__int__{k}" if isinstance(k, int) else k
+            safe_dict[safe_key] = legacy_to_dialog_safe(v)
+        return safe_dict
+    if isinstance(value, tuple):
+        return {"__tuple__": [legacy_to_dialog_safe(v) for v in value]}
+    if isinstance(value, list):
+        return [legacy_to_dialog_safe(v) for v in value]
+    return value
+
+
+def legacy_from_dialog_safe(value):
+    if isinstance(value, dict):
+        if "__enum__" in value:
+            name, member = value["__enum__"].split(".")
+            return _LEGACY_ENUM_MAP[name][member]
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        if "__tuple__" in value:
+            return tuple(
+                legacy_from_dialog_safe(v) for v in value["__tuple__"]
+            )
+        safe_dict = {}
+        for k, v in value.items():
+            if k.startswith("__int__"):
+                key = int(k[len("__int__"):])
+            else:
+                key = k
+            safe_dict[key] = legacy_from_dialog_safe(v)
+        return safe_dict
+    if isinstance(value, list):
+        return [legacy_from_dialog_safe(v) for v in value]
+    return value
+
+
+def make_payload(lists: int = 100) -> dict:
+    now = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+    return {
+        "task_id": 15,
+        "task_title": "Купить молоко",
+        "description": "Описание задачи",
+        "status": TaskStatusEnum.IN_PROGRESS,
+        "priority": LevelEnum.HIGH,
+        "urgency": LevelEnum.LOW,
+        "deadline": now + timedelta(days=1),
+        "completed_at": None,
+        "postponed_count": 0,
+        "is_shared": False,
+        "selected_list_id": 2,
+        "users": [],
+        "lists": {
+            list_id: {
+                "list_id": list_id,
+                "title": f"Список {list_id}",
+                "parent_list_id": list_id // 2 or None,
+                "system_type": SystemListTypeEnum.NONE,
+                "position": list_id,
+                "path": (list_id // 2, list_id),
+            }
+            for list_id in range(1, lists + 1)
+        },
+    }
+
+
+def best_time(func, arg, number: int = 50, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func(arg)
+        timings.append(time.perf_counter() - started)
+    return min(timings) / number
+
+
+def test_codec_matches_legacy_implementation():
+    payload = make_payload()
+    safe = legacy_to_dialog_safe(payload)
+
+    assert to_dialog_safe(payload) == safe
+    assert from_dialog_safe(safe) == legacy_from_dialog_safe(safe)
+
+
+def test_to_dialog_safe_is_faster_than_legacy():
+    payload = make_payload()
+
+    legacy = best_time(legacy_to_dialog_safe, payload)
+    current = best_time(to_dialog_safe, payload)
+
+    assert current * 1.5 < legacy, (current, legacy)
+
+
+def test_from_dialog_safe_is_faster_than_legacy():
+    safe = legacy_to_dialog_safe(make_payload())
+
+    legacy = best_time(legacy_from_dialog_safe, safe)
+    current = best_time(from_dialog_safe, safe)
+
+    assert current * 1.2 < legacy, (current, legacy)
+
+
+def test_partial_decode_skips_lists_map():
+    safe = legacy_to_dialog_safe(make_payload())
+
+    full = best_time(from_dialog_safe, safe)
+    partial = best_time(
+        lambda data: from_dialog_safe_keys(data, TASK_STATUS_CHANGE_KEYS),
+        safe,
+    )
+
+    assert partial * 10 < full, (partial, full)
@@ -1,10 +1,34 @@
+from unittest.mock import patch
+
 import pytest
 from aiogram_dialog import Dialog
 
 from app.modules.todo.ui.dialogs import dialogs
-from app.modules.todo.ui.dialogs.id_uniqueness_validator import validate_dialog
+from app.modules.todo.ui.dialogs.id_uniqueness_validator import (
+    validate_dialog,
+    validate_dialogs_cached,
+)
+
+VALIDATOR = "app.modules.todo.ui.dialogs.id_uniqueness_validator"
 
 
 @pytest.mark.parametrize("dialog", dialogs)
 def test_unique_widget_ids_per_window(dialog: Dialog):
     validate_dialog(dialog)
+
+
+def test_cached_validation_is_skipped_until_sources_change(tmp_path):
+    root = tmp_path / "dialogs"
+    root.mkdir()
+    source = root / "dialog.py"
+    source.write_text("dialog = 1\n")
+    stamp_path = tmp_path / ".validated"
+
+    with patch(f"{VALIDATOR}.validate_dialogs") as validate:
+        first = validate_dialogs_cached(dialogs, stamp_path, root)
+        second = validate_dialogs_cached(dialogs, stamp_path, root)
+        source.write_text("dialog = 2\n")
+        third = validate_dialogs_cached(dialogs, stamp_path, root)
+
+    assert (first, second, third) == (False, True, False)
+    assert validate.call_count == 2
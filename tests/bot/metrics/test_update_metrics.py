@@ -0,0 +1,188 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command
+from aiogram.methods import GetMe
+from aiogram.types import Chat, Message, Update, User
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.core.db.query_budget import QueryBudget
+from app.core.metrics.registry import MetricsRegistry
+from app.core.metrics.server import make_metrics_app
+from app.core.middlewares.metrics import (
+    BotMetrics,
+    TelegramApiMetricsMiddleware,
+    current_update,
+    UpdateTimings,
+    setup_metrics,
+)
+
+
+def make_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="Тест"),
+            text=text,
+        ),
+    )
+
+
+@pytest.fixture
+def bot_setup():
+    router = Router(name="test_router")
+
+    @router.message(Command("ok"))
+    async def ok_handler(_message: Message):
+        return "ok"
+
+    @router.message(Command("fail"))
+    async def fail_handler(_message: Message):
+        raise RuntimeError("boom")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="42:TEST")
+    registry = MetricsRegistry()
+    metrics = BotMetrics(registry)
+    setup_metrics(dp, bot, metrics)
+    return dp, bot, registry, metrics
+
+
+@pytest.mark.asyncio
+async def test_fed_update_is_labelled_with_router_and_handler(bot_setup):
+    dp, bot, _registry, metrics = bot_setup
+
+    await dp.feed_update(bot, make_update(1, "/ok"))
+
+    labels = {
+        "update_type": "message",
+        "router": "test_router",
+        "state": "none",
+        "handler": "bot_setup.<locals>.ok_handler",
+    }
+    assert metrics.updates.get(**labels) == 1
+    assert metrics.latency.count(**labels) == 1
+    assert metrics.in_flight.get() == 0
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_update_counts_error(bot_setup):
+    dp, bot, _registry, metrics = bot_setup
+
+    with pytest.raises(RuntimeError):
+        await dp.feed_update(bot, make_update(2, "/fail"))
+
+    assert metrics.errors.get(
+        update_type="message",
+        router="test_router",
+        state="none",
+        handler="bot_setup.<locals>.fail_handler",
+    ) == 1
+    assert metrics.in_flight.get() == 0
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_unhandled_update_keeps_default_labels(bot_setup):
+    dp, bot, _registry, metrics = bot_setup
+
+    await dp.feed_update(bot, make_update(3, "просто текст"))
+
+    assert metrics.updates.get(
+        update_type="message", router="none", state="none", handler="unhandled"
+    ) == 1
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_update_queries_are_checked_against_budget():
+    router = Router(name="budget_router")
+
+    @router.message(Command("list"))
+    async def list_handler(_message: Message):
+        timings = current_update.get()
+        timings.db_queries += 3
+        timings.statements["SELECT * FROM tasks WHERE task_id = ?"] += 3
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token="42:TEST")
+    budget = QueryBudget(max_queries=2, repeat_threshold=3)
+    budget.check = MagicMock(wraps=budget.check)
+    setup_metrics(dp, bot, BotMetrics(MetricsRegistry()), query_budget=budget)
+
+    await dp.feed_update(bot, make_update(4, "/list"))
+
+    handler, queries, _seconds, statements = budget.check.call_args.args
+    assert handler == (
+        "budget_router:"
+        "test_update_queries_are_checked_against_budget.<locals>.list_handler"
+    )
+    assert queries == 3
+    assert statements == {"SELECT * FROM tasks WHERE task_id = ?": 3}
+    assert budget.stats.over_budget == 1
+    assert budget.stats.repeated == 1
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_telegram_api_time_is_added_to_update():
+    metrics = BotMetrics(MetricsRegistry())
+    middleware = TelegramApiMetricsMiddleware(metrics)
+    timings = UpdateTimings()
+    token = current_update.set(timings)
+
+    async def make_request(_bot, _method):
+        return "response"
+
+    try:
+        result = await middleware(make_request, None, GetMe())
+    finally:
+        current_update.reset(token)
+
+    assert result == "response"
+    assert timings.api_calls == 1
+    assert metrics.api_requests.count(method="GetMe") == 1
+
+
+def test_render_text_exposition():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Запросы", ("path",))
+    histogram = registry.histogram(
+        "duration_seconds", "Время", buckets=(0.1, 1)
+    )
+    registry.callback_gauge("pool_size", "Пул", lambda: 5)
+    counter.inc(path='/a"b')
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{path="/a\\"b"} 1' in text
+    assert 'duration_seconds_bucket{le="0.1"} 1' in text
+    assert 'duration_seconds_bucket{le="1"} 2' in text
+    assert 'duration_seconds_bucket{le="+Inf"} 2' in text
+    assert "duration_seconds_count 2" in text
+    assert "pool_size 5" in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_registry():
+    registry = MetricsRegistry()
+    registry.counter("hits_total", "Попадания").inc()
+
+    async with TestClient(TestServer(make_metrics_app(registry))) as client:
+        response = await client.get("/metrics")
+        body = await response.text()
+
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "hits_total 1" in body
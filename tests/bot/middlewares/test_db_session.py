@@ -0,0 +1,70 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.core.middlewares.db_session import DbSessionMiddleware, LazySession
+
+
+def make_session_pool():
+    session = MagicMock()
+    session.execute = AsyncMock(return_value="result")
+    session.close = AsyncMock()
+    return MagicMock(return_value=session), session
+
+
+@pytest.mark.asyncio
+async def test_update_without_queries_does_not_open_session():
+    session_pool, _session = make_session_pool()
+    middleware = DbSessionMiddleware(session_pool)
+    handler = AsyncMock(return_value="ok")
+
+    result = await middleware(handler, "event", {})
+
+    assert result == "ok"
+    session_pool.assert_not_called()
+    assert middleware.stats.updates == 1
+    assert middleware.stats.updates_with_session == 0
+
+
+@pytest.mark.asyncio
+async def test_first_query_opens_session_once():
+    session_pool, session = make_session_pool()
+    middleware = DbSessionMiddleware(session_pool)
+
+    async def handler(_event, data):
+        await data["session"].execute("SELECT 1")
+        return await data["session"].execute("SELECT 2")
+
+    result = await middleware(handler, "event", {})
+
+    assert result == "result"
+    session_pool.assert_called_once_with()
+    assert session.execute.await_count == 2
+    session.close.assert_awaited_once()
+    assert middleware.stats.usage_ratio == 1.0
+
+
+@pytest.mark.asyncio
+async def test_session_is_closed_when_handler_fails():
+    session_pool, session = make_session_pool()
+    middleware = DbSessionMiddleware(session_pool)
+
+    async def handler(_event, data):
+        await data["session"].execute("SELECT 1")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await middleware(handler, "event", {})
+
+    session.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_close_without_use_is_noop():
+    session_pool, _session = make_session_pool()
+    lazy_session = LazySession(session_pool)
+
+    await lazy_session.close()
+
+    assert not lazy_session.is_used
+    session_pool.assert_not_called()
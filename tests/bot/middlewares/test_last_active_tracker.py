@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.core.middlewares.last_active import (
+    LastActiveMiddleware,
+    LastActiveTracker,
+)
+
+
+def make_session_pool(session):
+    session_pool = MagicMock()
+    session_pool.return_value.__aenter__.return_value = session
+    return session_pool
+
+
+@pytest.fixture
+def redis():
+    redis = MagicMock()
+    redis.set = AsyncMock(return_value=True)
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_repeated_updates_skip_redis(redis):
+    tracker = LastActiveTracker(MagicMock(), redis)
+
+    for _ in range(5):
+        await tracker.touch(42)
+
+    redis.set.assert_awaited_once_with(
+        "user:42:last_active", "1", ex=3600, nx=True
+    )
+    assert tracker.stats.local_hits == 4
+    assert tracker.pending == 1
+
+
+@pytest.mark.asyncio
+async def test_user_seen_by_other_process_is_not_buffered(redis):
+    redis.set.return_value = None
+    tracker = LastActiveTracker(MagicMock(), redis)
+
+    await tracker.touch(42)
+
+    assert tracker.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_redis_error_still_buffers_user(redis):
+    redis.set.side_effect = ConnectionError("down")
+    tracker = LastActiveTracker(MagicMock(), redis)
+
+    await tracker.touch(42)
+
+    assert tracker.pending == 1
+    assert tracker.stats.redis_errors == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_all_users_in_one_statement(redis):
+    session = AsyncMock()
+    tracker = LastActiveTracker(make_session_pool(session), redis)
+    for user_id in (1, 2, 3):
+        await tracker.touch(user_id)
+
+    await tracker.flush()
+
+    session.execute.assert_awaited_once()
+    params = session.execute.await_args.args[1]
+    assert params["user_ids"] == [1, 2, 3]
+    assert len(params["seen_at"]) == 3
+    session.commit.assert_awaited_once()
+    assert tracker.pending == 0
+    assert tracker.stats.flushed_users == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_users_for_retry(redis):
+    session = AsyncMock()
+    session.execute.side_effect = RuntimeError("db down")
+    tracker = LastActiveTracker(make_session_pool(session), redis)
+    await tracker.touch(1)
+
+    await tracker.flush()
+
+    assert tracker.pending == 1
+    assert tracker.stats.failed_flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_buffer(redis):
+    session = AsyncMock()
+    tracker = LastActiveTracker(
+        make_session_pool(session), redis, flush_interval=3600
+    )
+    tracker.start()
+    await tracker.touch(1)
+
+    await tracker.stop()
+
+    session.execute.assert_awaited_once()
+    assert tracker.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_running_flush(redis):
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_execute(*_args):
+        started.set()
+        await release.wait()
+
+    session = AsyncMock()
+    session.execute.side_effect = slow_execute
+    tracker = LastActiveTracker(
+        make_session_pool(session), redis, flush_interval=0
+    )
+    await tracker.touch(1)
+    tracker.start()
+    await started.wait()
+
+    stopping = asyncio.create_task(tracker.stop())
+    await asyncio.sleep(0)
+    release.set()
+    await stopping
+
+    # Пакет, забранный из буфера до остановки, записан, а не потерян
+    session.commit.assert_awaited_once()
+    assert tracker.stats.flushed_users == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_touches_user_and_calls_handler():
+    tracker = MagicMock(touch=AsyncMock())
+    handler = AsyncMock(return_value="ok")
+    middleware = LastActiveMiddleware(tracker)
+
+    result = await middleware(
+        handler, "event", {"event_from_user": SimpleNamespace(id=7)}
+    )
+
+    tracker.touch.assert_awaited_once_with(7)
+    assert result == "ok"
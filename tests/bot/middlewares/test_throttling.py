@@ -0,0 +1,169 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiogram.types import CallbackQuery, Chat, Message, User
+from redis.exceptions import ConnectionError
+
+from app.core.middlewares.throttling import (
+    ThrottleRule,
+    ThrottlingMiddleware,
+    TokenBucketLimiter,
+    parse_rules,
+)
+
+
+def make_callback() -> CallbackQuery:
+    return CallbackQuery(
+        id="1",
+        from_user=User(id=1, is_bot=False, first_name="F"),
+        chat_instance="1",
+        data="go_complete",
+    )
+
+
+def make_message(text: str = "Купить хлеб") -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=1, type="private"),
+        from_user=User(id=1, is_bot=False, first_name="F"),
+        text=text,
+    )
+
+
+def event_data(user_id: int = 1, router: str = "TaskActionsDialogSG") -> dict:
+    return {
+        "event_from_user": SimpleNamespace(id=user_id),
+        "event_router": SimpleNamespace(name=router),
+    }
+
+
+def make_redis(script: AsyncMock) -> MagicMock:
+    redis = MagicMock()
+    redis.register_script.return_value = script
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_allows_burst_then_rejects():
+    limiter = TokenBucketLimiter(None)
+    buckets = [("user:default:1", ThrottleRule(rate=1, burst=3))]
+
+    results = [await limiter.acquire(buckets) for _ in range(4)]
+
+    assert results[:3] == [0, 0, 0]
+    assert 0 < results[3] <= 1
+    assert limiter.stats.local_checks == 4
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_not_taken_when_any_bucket_is_empty():
+    limiter = TokenBucketLimiter(None)
+    user = ("user:default:1", ThrottleRule(rate=1, burst=5))
+    tight_global = ("global", ThrottleRule(rate=1, burst=1))
+
+    assert await limiter.acquire([user, tight_global]) == 0
+    assert await limiter.acquire([user, tight_global]) > 0
+    # Отказ общего бакета не списал токен пользователя
+    assert limiter._local["user:default:1"][0] == pytest.approx(4, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_redis_script_gets_all_buckets_in_one_call():
+    script = AsyncMock(return_value=1500)
+    limiter = TokenBucketLimiter(make_redis(script))
+
+    retry_after = await limiter.acquire([
+        ("user:default:1", ThrottleRule(rate=2, burst=5)),
+        ("global", ThrottleRule(rate=100, burst=200)),
+    ])
+
+    assert retry_after == 1.5
+    script.assert_awaited_once_with(
+        keys=["throttle:user:default:1", "throttle:global"],
+        args=[1, 2, 5, 100, 200],
+    )
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_local_buckets():
+    script = AsyncMock(side_effect=ConnectionError("down"))
+    limiter = TokenBucketLimiter(make_redis(script))
+
+    retry_after = await limiter.acquire(
+        [("user:default:1", ThrottleRule(rate=1, burst=1))]
+    )
+
+    assert retry_after == 0
+    assert limiter.stats.redis_errors == 1
+    assert limiter.stats.local_checks == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_callback_is_answered_without_handler():
+    middleware = ThrottlingMiddleware(
+        TokenBucketLimiter(None),
+        default_rule=ThrottleRule(rate=0.1, burst=1),
+    )
+    handler = AsyncMock(return_value="handled")
+    answer = AsyncMock()
+
+    with patch.object(CallbackQuery, "answer", answer):
+        first = await middleware(handler, make_callback(), event_data())
+        second = await middleware(handler, make_callback(), event_data())
+
+    assert (first, second) == ("handled", None)
+    handler.assert_awaited_once()
+    answer.assert_awaited_once()
+    assert "Повторите через 10 с" in answer.await_args.args[0]
+    assert (middleware.stats.allowed, middleware.stats.rejected) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_rejected_messages_get_one_notice_per_wait():
+    middleware = ThrottlingMiddleware(
+        TokenBucketLimiter(None),
+        default_rule=ThrottleRule(rate=0.1, burst=1),
+    )
+    handler = AsyncMock(return_value="handled")
+    answer = AsyncMock()
+
+    with patch.object(Message, "answer", answer):
+        results = [
+            await middleware(handler, make_message(), event_data())
+            for _ in range(3)
+        ]
+
+    assert results == ["handled", None, None]
+    handler.assert_awaited_once()
+    answer.assert_awaited_once()
+    assert "сообщение не принято" in answer.await_args.args[0]
+    assert middleware.stats.rejected == 2
+
+
+@pytest.mark.asyncio
+async def test_router_rule_overrides_default():
+    middleware = ThrottlingMiddleware(
+        TokenBucketLimiter(None),
+        default_rule=ThrottleRule(rate=1, burst=1),
+        rules={"SelectListDialogSG": ThrottleRule(rate=1, burst=3)},
+    )
+    handler = AsyncMock()
+
+    for _ in range(3):
+        await middleware(handler, "message", event_data(router="SelectListDialogSG"))
+    await middleware(handler, "message", event_data(router="StartSG"))
+    await middleware(handler, "message", event_data(router="StartSG"))
+
+    assert handler.await_count == 4
+    assert middleware.stats.rejected == 1
+
+
+def test_parse_rules():
+    assert parse_rules({"TaskActionsDialogSG": "0.5:3"}) == {
+        "TaskActionsDialogSG": ThrottleRule(rate=0.5, burst=3),
+    }
+    with pytest.raises(ValueError):
+        parse_rules({"TaskActionsDialogSG": "fast"})
@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.metrics.registry import MetricsRegistry
+from app.core.middlewares.update_scheduler import (
+    UpdateSchedulerMetrics,
+    UpdateSchedulerMiddleware,
+)
+
+
+def user_data(user_id: int) -> dict:
+    return {"event_from_user": SimpleNamespace(id=user_id)}
+
+
+def make_handler(log: list, delays: dict[str, float], running: list):
+    async def handler(event, _data):
+        running.append(event)
+        log.append(("start", event, len(running)))
+        await asyncio.sleep(delays.get(event, 0))
+        running.remove(event)
+        log.append(("end", event))
+        return event
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_user_run_in_order():
+    scheduler = UpdateSchedulerMiddleware(max_concurrent_updates=10)
+    log, running = [], []
+    # Первый апдейт самый медленный: без очереди он закончился бы последним
+    handler = make_handler(log, {"a1": 0.03, "a2": 0.01}, running)
+
+    results = await asyncio.gather(*(
+        scheduler(handler, event, user_data(1))
+        for event in ("a1", "a2", "a3")
+    ))
+
+    assert results == ["a1", "a2", "a3"]
+    assert [entry for entry in log if entry[0] == "end"] == [
+        ("end", "a1"), ("end", "a2"), ("end", "a3"),
+    ]
+    assert all(entry[2] == 1 for entry in log if entry[0] == "start")
+    assert scheduler.stats.waited_for_user == 2
+    assert scheduler.stats.max_user_queue == 3
+    assert scheduler.active_users == 0
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_in_parallel_up_to_limit():
+    scheduler = UpdateSchedulerMiddleware(max_concurrent_updates=2)
+    log, running = [], []
+    handler = make_handler(
+        log, {"u1": 0.02, "u2": 0.02, "u3": 0.02}, running
+    )
+
+    await asyncio.gather(*(
+        scheduler(handler, event, user_data(user_id))
+        for user_id, event in ((1, "u1"), (2, "u2"), (3, "u3"))
+    ))
+
+    parallelism = max(entry[2] for entry in log if entry[0] == "start")
+    assert parallelism == 2
+    assert scheduler.stats.waited_for_slot == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_update_releases_user_queue():
+    scheduler = UpdateSchedulerMiddleware()
+
+    async def failing(_event, _data):
+        raise RuntimeError("boom")
+
+    async def ok(event, _data):
+        return event
+
+    with pytest.raises(RuntimeError):
+        await scheduler(failing, "e1", user_data(1))
+    assert await scheduler(ok, "e2", user_data(1)) == "e2"
+    assert scheduler.active_users == 0
+
+
+@pytest.mark.asyncio
+async def test_updates_without_user_are_not_ordered():
+    scheduler = UpdateSchedulerMiddleware(max_concurrent_updates=10)
+    log, running = [], []
+    handler = make_handler(log, {"p1": 0.02, "p2": 0.02}, running)
+
+    await asyncio.gather(
+        scheduler(handler, "p1", {}),
+        scheduler(handler, "p2", {}),
+    )
+
+    assert max(entry[2] for entry in log if entry[0] == "start") == 2
+    assert scheduler.stats.unkeyed == 2
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_and_wait_time_are_exported():
+    registry = MetricsRegistry()
+    metrics = UpdateSchedulerMetrics(registry)
+    scheduler = UpdateSchedulerMiddleware(metrics=metrics)
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def blocking(_event, _data):
+        started.set()
+        await release.wait()
+
+    first = asyncio.create_task(scheduler(blocking, "b1", user_data(1)))
+    await started.wait()
+    second = asyncio.create_task(scheduler(blocking, "b2", user_data(1)))
+    await asyncio.sleep(0)
+
+    assert metrics.queued.get(stage="user") == 1
+    assert metrics.active_users.get() == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+
+    assert metrics.queued.get(stage="user") == 0
+    assert metrics.active_users.get() == 0
+    exposition = registry.render()
+    assert 'bot_update_wait_seconds_count{stage="user"} 2' in exposition
+    assert 'bot_update_wait_seconds_count{stage="slot"} 2' in exposition
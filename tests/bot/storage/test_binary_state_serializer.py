@@ -0,0 +1,163 @@
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from app.core.storage.redis_storage import SerializingRedisStorage
+from app.core.storage.serializer import (
+    BinaryStateSerializer,
+    FLAG_ZLIB,
+    JsonStateSerializer,
+    MAGIC,
+)
+from app.core.utils.dialog_serialization import to_dialog_safe
+from app.modules.todo.models import LevelEnum, SystemListTypeEnum
+from app.modules.todo.ui.dialogs.enums import ListSelectionMode
+
+TASK = {
+    "task_id": 15,
+    "task_title": "Купить молоко",
+    "priority": LevelEnum.HIGH,
+    "deadline": datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc),
+    "created": date(2026, 10, 1),
+    "flags": (True, False, None),
+    "progress": 0.5,
+    "offset": -180,
+}
+
+LISTS = {
+    list_id: {
+        "list_id": list_id,
+        "title": f"Список {list_id}",
+        "system_type": SystemListTypeEnum.NONE,
+        "parent_list_id": None,
+    }
+    for list_id in range(1, 30)
+}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value.encode() if isinstance(value, str) else value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_dialog_safe_payload_round_trip():
+    data = {"dialog_data": {"task": to_dialog_safe(TASK)}}
+    serializer = BinaryStateSerializer()
+
+    assert serializer.loads(serializer.dumps(data)) == data
+
+
+def test_native_types_round_trip():
+    data = {"task": TASK, "lists": LISTS}
+    serializer = BinaryStateSerializer(compress_threshold=-1)
+
+    assert serializer.loads(serializer.dumps(data)) == data
+
+
+def test_long_values_and_many_string_references_round_trip():
+    words = [f"слово-{i}" for i in range(200)]
+    data = {
+        "words": words + words,
+        "long": "длинная строка " * 20,
+        "numbers": [0, 63, 64, -1, -64, 2 ** 40, -(2 ** 70)],
+        "__int__-5": "отрицательный ключ",
+        "__int__007": "не int-ключ",
+    }
+    serializer = BinaryStateSerializer(compress_threshold=-1)
+
+    assert serializer.loads(serializer.dumps(data)) == data
+
+
+def test_binary_is_smaller_than_json():
+    data = {"dialog_data": {"lists": to_dialog_safe(LISTS)}}
+    serializer = BinaryStateSerializer(compress_threshold=-1)
+
+    assert len(serializer.dumps(data)) < len(json.dumps(data).encode()) / 2
+
+
+def test_large_payload_is_compressed():
+    data = {"lists": to_dialog_safe(LISTS)}
+    serializer = BinaryStateSerializer(compress_threshold=64)
+
+    dumped = serializer.dumps(data)
+
+    assert dumped[len(MAGIC)] & FLAG_ZLIB
+    assert serializer.loads(dumped) == data
+
+
+def test_plain_json_is_still_readable():
+    data = {"dialog_data": to_dialog_safe(TASK)}
+    serializer = BinaryStateSerializer()
+
+    assert serializer.loads(json.dumps(data).encode()) == data
+    assert serializer.loads(json.dumps(data)) == data
+
+
+def test_dialog_start_data_enum_round_trips_as_value():
+    data = {
+        "stack": [{"start_data": {"mode": ListSelectionMode.CREATE_TASK}}],
+    }
+    serializer = BinaryStateSerializer()
+
+    loaded = serializer.loads(serializer.dumps(data))
+
+    assert loaded == json.loads(json.dumps(data))
+    assert loaded["stack"][0]["start_data"]["mode"] == ListSelectionMode.CREATE_TASK
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(TypeError):
+        BinaryStateSerializer().dumps({"value": object()})
+
+
+@pytest.mark.asyncio
+async def test_storage_rewrites_json_value_in_binary_format():
+    redis = FakeRedis()
+    storage = SerializingRedisStorage(
+        redis=redis, serializer=BinaryStateSerializer()
+    )
+    key = StorageKey(bot_id=1, chat_id=2, user_id=3)
+    redis_key = storage.key_builder.build(key, "data")
+    data = {"dialog_data": to_dialog_safe(TASK)}
+    redis.values[redis_key] = json.dumps(data).encode()
+
+    loaded = await storage.get_data(key)
+    await storage.set_data(key, loaded)
+
+    assert loaded == data
+    assert redis.values[redis_key].startswith(MAGIC)
+    assert await storage.get_data(key) == data
+
+    await storage.set_data(key, {})
+    assert redis_key not in redis.values
+
+
+@pytest.mark.asyncio
+async def test_json_storage_reads_binary_value_and_rewrites_it_in_json():
+    redis = FakeRedis()
+    storage = SerializingRedisStorage(
+        redis=redis, serializer=JsonStateSerializer()
+    )
+    key = StorageKey(bot_id=1, chat_id=2, user_id=3)
+    redis_key = storage.key_builder.build(key, "data")
+    data = {"dialog_data": to_dialog_safe(TASK)}
+    redis.values[redis_key] = BinaryStateSerializer(
+        compress_threshold=0
+    ).dumps(data)
+
+    loaded = await storage.get_data(key)
+    await storage.set_data(key, loaded)
+
+    assert loaded == data
+    assert json.loads(redis.values[redis_key]) == data
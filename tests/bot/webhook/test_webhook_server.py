@@ -0,0 +1,165 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from aiohttp.test_utils import TestServer, TestClient
+
+from app.core.middlewares.update_scheduler import UpdateSchedulerMiddleware
+from app.core.webhook.server import make_webhook_app
+
+SECRET = "secret"
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1700000000,
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "F"},
+        "text": "/start",
+    },
+}
+
+
+def make_settings() -> dict:
+    return {
+        "path": "/webhook",
+        "secret_token": SECRET,
+        "max_concurrent_updates": 2,
+        "drain_timeout": 5,
+    }
+
+
+def make_bot():
+    bot = Mock()
+    bot.session.json_loads = json.loads
+    bot.session.json_dumps = json.dumps
+    bot.session.close = AsyncMock()
+    return bot
+
+
+def make_dispatcher(feed_raw_update):
+    dp = Mock()
+    dp.feed_raw_update = feed_raw_update
+    dp.emit_startup = AsyncMock()
+    dp.emit_shutdown = AsyncMock()
+    dp.workflow_data = {}
+    return dp
+
+
+@pytest.mark.asyncio
+async def test_rejects_wrong_secret_token():
+    feed = AsyncMock(return_value=None)
+    app = make_webhook_app(make_dispatcher(feed), make_bot(), **make_settings())
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            "/webhook",
+            json=UPDATE,
+            headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+        )
+
+    assert response.status == 401
+    feed.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_recorded_update_is_fed_to_dispatcher():
+    feed = AsyncMock(return_value=None)
+    app = make_webhook_app(
+        make_dispatcher(feed), make_bot(), **make_settings(), owner_id="1"
+    )
+
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post(
+            "/webhook",
+            json=UPDATE,
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+        assert response.status == 200
+
+    feed.assert_awaited_once()
+    assert feed.await_args.kwargs["update"] == UPDATE
+    assert feed.await_args.kwargs["owner_id"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_drain_on_shutdown():
+    in_flight = 0
+    max_in_flight = 0
+    processed = 0
+
+    async def feed(**_kwargs):
+        nonlocal in_flight, max_in_flight, processed
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        processed += 1
+
+    app = make_webhook_app(
+        make_dispatcher(feed), make_bot(), **make_settings()
+    )
+
+    async with TestClient(TestServer(app)) as client:
+        for update_id in range(6):
+            response = await client.post(
+                "/webhook",
+                json={**UPDATE, "update_id": update_id},
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+            assert response.status == 200
+
+    assert processed == 6
+    assert max_in_flight == 2
+
+
+def user_update(update_id: int, user_id: int) -> dict:
+    message = {
+        **UPDATE["message"],
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "F"},
+    }
+    return {"update_id": update_id, "message": message}
+
+
+@pytest.mark.asyncio
+async def test_burst_of_one_user_does_not_starve_others_with_scheduler():
+    scheduler = UpdateSchedulerMiddleware(max_concurrent_updates=2)
+    release_first_user = asyncio.Event()
+    second_user_done = asyncio.Event()
+
+    async def handler(update, _data):
+        if update["message"]["from"]["id"] == 1:
+            await release_first_user.wait()
+        else:
+            second_user_done.set()
+
+    async def feed(*, update, **_kwargs):
+        user = SimpleNamespace(id=update["message"]["from"]["id"])
+        await scheduler(handler, update, {"event_from_user": user})
+
+    settings = {**make_settings(), "max_concurrent_updates": None}
+    app = make_webhook_app(make_dispatcher(feed), make_bot(), **settings)
+
+    async with TestClient(TestServer(app)) as client:
+        for update_id in range(5):
+            await client.post(
+                "/webhook",
+                json=user_update(update_id, 1),
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+        await client.post(
+            "/webhook",
+            json=user_update(5, 2),
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+
+        # Апдейты первого пользователя ждут его очереди, не занимая слоты
+        await asyncio.wait_for(second_user_done.wait(), timeout=1)
+        release_first_user.set()
+
+    assert scheduler.stats.waited_for_user == 4
+    assert scheduler.active_users == 0
@@ -0,0 +1,227 @@
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.db.query_budget import statement_shape
+
+
+class FakeResult:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def one(self):
+        return self.rows[0]
+
+    def scalar(self):
+        return self.first()
+
+    def scalar_one(self):
+        return self.one()
+
+    def scalar_one_or_none(self):
+        return self.first()
+
+
+class FakePipeline:
+    """
+    Копит команды и выполняет их на FakeRedis при execute
+    """
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_args):
+        return False
+
+    def __getattr__(self, name: str):
+        getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in commands
+        ]
+
+
+class FakeRedis:
+    """
+    Redis в памяти с командами, которые используют кэши и счётчики.
+    Строковые значения хранятся как есть, битовые карты - bytes,
+    хэши - dict, множества - set
+    """
+
+    def __init__(self):
+        self.data: dict = {}
+        self.ttls: dict[str, int] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys, *args):
+        keys = [keys, *args] if isinstance(keys, str) else [*keys, *args]
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
+        return True
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def hincrby(self, key, field, value=1):
+        fields = self.data.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + value
+        return fields[field]
+
+    async def sadd(self, key, *members):
+        members_set = self.data.setdefault(key, set())
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        return added
+
+    async def setbit(self, key, offset, value):
+        # Как в Redis: бит 0 - старший бит первого байта
+        bitmap = bytearray(self.data.get(key, b""))
+        index, shift = divmod(offset, 8)
+        bitmap.extend(b"\0" * (index + 1 - len(bitmap)))
+        previous = bool(bitmap[index] & (0x80 >> shift))
+        if value:
+            bitmap[index] |= 0x80 >> shift
+        else:
+            bitmap[index] &= ~(0x80 >> shift) & 0xFF
+        self.data[key] = bytes(bitmap)
+        return int(previous)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class CountingSession:
+    """
+    Подменяет AsyncSession и считает запросы, которые отправила бы в БД.
+    Для запросов, форма которых начинается с ключа rows, возвращает
+    эти строки, для остальных — MagicMock
+    """
+
+    def __init__(self, rows: dict[str, list] | None = None):
+        self.rows = rows or {}
+        self.statements: Counter = Counter()
+        self.info: dict = {}
+
+    @property
+    def queries(self) -> int:
+        return sum(self.statements.values())
+
+    def _record(self, statement) -> FakeResult | MagicMock:
+        compiled = str(statement.compile(dialect=postgresql.dialect()))
+        shape = statement_shape(compiled)
+        self.statements[shape] += 1
+        for prefix, rows in self.rows.items():
+            if shape.startswith(prefix):
+                return FakeResult(rows)
+        return MagicMock()
+
+    async def execute(self, statement, *_args, **_kwargs):
+        return self._record(statement)
+
+    async def scalar(self, statement, *_args, **_kwargs):
+        return self._record(statement)
+
+    async def scalars(self, statement, *_args, **_kwargs):
+        return self._record(statement)
+
+    async def get(self, entity, ident, *_args, **_kwargs):
+        self.statements[f"GET {entity.__name__}"] += 1
+        return MagicMock()
+
+    def add(self, _instance):
+        pass
+
+    def add_all(self, _instances):
+        pass
+
+    async def delete(self, _instance):
+        pass
+
+    async def flush(self, *_args):
+        # flush отправляет накопленные в сессии INSERT/UPDATE
+        self.statements["FLUSH"] += 1
+
+    async def refresh(self, *_args, **_kwargs):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+
+@pytest.fixture
+def assert_max_queries(caplog):
+    """
+    Запускает функцию с CountingSession и проверяет, что она выполнила
+    не больше max_queries запросов и не завершилась ошибкой
+    """
+
+    async def check(
+            max_queries: int,
+            func,
+            *args,
+            rows: dict[str, list] | None = None,
+            **kwargs,
+    ):
+        session = CountingSession(rows)
+        with caplog.at_level(logging.ERROR):
+            await func(session, *args, **kwargs)
+        errors = [r for r in caplog.records if r.levelno >= logging.ERROR]
+        assert not errors, errors[0].getMessage()
+        assert session.queries <= max_queries, (
+            f"{func.__name__}: {session.queries} запросов "
+            f"(лимит {max_queries}): {dict(session.statements)}"
+        )
+        return session
+
+    return check
@@ -1,6 +1,15 @@
+import random
+from collections import defaultdict
 from types import SimpleNamespace
 
-from app.modules.todo.services.task_list import build_ordered_hierarchy
+import pytest
+
+from app.modules.todo.services.task_list import (
+    build_ordered_hierarchy,
+    build_ordered_nodes,
+    select_visible_lists,
+    MAX_LIST_DEPTH,
+)
 
 
 def fake_list(
@@ -107,3 +116,92 @@ def test_lists_keys_match_buttons_ids():
     buttons, lists = build_ordered_hierarchy(rows)  # noqa
 
     assert set(lists.keys()) == {b["list_id"] for b in buttons}
+
+
+def test_deep_chain_does_not_hit_recursion_limit():
+    depth = 5_000
+    rows = [
+        fake_list(i, f"L{i}", i - 1 if i > 1 else None, 1)
+        for i in range(1, depth + 1)
+    ]
+
+    buttons, lists = build_ordered_hierarchy(rows)  # noqa
+
+    assert len(buttons) == MAX_LIST_DEPTH
+    assert buttons[-1]["pos"] == "1." * MAX_LIST_DEPTH
+
+
+def recursive_build_ordered_hierarchy(rows, *, is_hidden=None):
+    """
+    Прежняя рекурсивная реализация, эталон для сравнения
+    """
+    sub_lists_map = defaultdict(list)
+    for row in rows:
+        sub_lists_map[row.parent_list_id].append({
+            "list_id": row.list_id,
+            "list_title": row.title,
+            "position": row.position,
+            "is_hidden": is_hidden(row) if is_hidden else False,
+        })
+
+    ordered_buttons = []
+    ordered_lists = {}
+
+    def traverse(parent_id, prefix):
+        sub_lists = sorted(
+            sub_lists_map.get(parent_id, []),
+            key=lambda n: n["position"],
+        )
+        for sub_list in sub_lists:
+            pos = f"{prefix}{sub_list['position']}."
+            if not sub_list["is_hidden"]:
+                ordered_buttons.append({
+                    "list_id": sub_list["list_id"],
+                    "list_title": sub_list["list_title"],
+                    "pos": pos,
+                })
+                ordered_lists[sub_list["list_id"]] = sub_list["list_title"]
+            traverse(sub_list["list_id"], pos)
+
+    traverse(None, "")
+    return ordered_buttons, ordered_lists
+
+
+def synthetic_tree(size: int, seed: int = 0):
+    """
+    Случайное дерево в порядке, в котором строки отдаёт
+    fetch_user_lists_raw (по позиции)
+    """
+    rnd = random.Random(seed)
+    rows = []
+    positions = defaultdict(int)
+    for list_id in range(1, size + 1):
+        parent_list_id = rnd.choice(
+            [None, rnd.randint(1, list_id - 1)] if list_id > 1 else [None]
+        )
+        positions[parent_list_id] += 1
+        rows.append(fake_list(
+            list_id, f"L{list_id}", parent_list_id, positions[parent_list_id]
+        ))
+    rows.sort(key=lambda r: (r.position, r.list_id))
+    return rows
+
+
+def is_hidden_every_7th(row):
+    return row.list_id % 7 == 0
+
+
+@pytest.mark.parametrize("size", [10, 1_000])
+def test_matches_recursive_version(size):
+    rows = synthetic_tree(size)
+    nodes = build_ordered_nodes(rows)  # noqa
+
+    expected = recursive_build_ordered_hierarchy(
+        rows, is_hidden=is_hidden_every_7th
+    )
+    assert build_ordered_hierarchy(  # noqa
+        rows, is_hidden=is_hidden_every_7th
+    ) == expected
+    assert select_visible_lists(nodes, is_hidden=is_hidden_every_7th) == (
+        expected
+    )
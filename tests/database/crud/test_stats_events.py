@@ -0,0 +1,81 @@
+import pytest
+
+from app.modules.todo.crud.stats import (
+    aggregate_stats_events,
+    get_users_stats_merged,
+    record_users_stats_events,
+    rollup_stats_events,
+)
+from tests.database.conftest import CountingSession
+
+CATEGORIES = ["tasks_completed", "tasks_canceled"]
+
+
+def test_aggregate_sums_deltas_per_user_and_category():
+    events = [
+        (1, "tasks_completed", 1),
+        (1, "tasks_completed", 1),
+        (1, "tasks_canceled", 1),
+        (2, "tasks_completed", 1),
+        (2, "tasks_completed", -1),
+    ]
+
+    assert aggregate_stats_events(events) == {
+        1: {"tasks_completed": 2, "tasks_canceled": 1},
+        2: {"tasks_completed": 0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_merged_read_is_single_statement_with_zero_defaults():
+    session = CountingSession(rows={"SELECT anon_1.user_id": [
+        (1, "tasks_completed", 7),
+        (2, "tasks_canceled", 3),
+    ]})
+
+    users_stats = await get_users_stats_merged(session, [1, 2], CATEGORIES)
+
+    assert session.queries == 1
+    [shape] = session.statements
+    assert "UNION ALL" in shape and "FROM stats_events" in shape
+    assert (users_stats[1].tasks_completed, users_stats[1].tasks_canceled) == (7, 0)
+    assert (users_stats[2].tasks_completed, users_stats[2].tasks_canceled) == (0, 3)
+
+
+@pytest.mark.asyncio
+async def test_record_does_not_touch_user_stats_rows():
+    session = CountingSession(rows={"SELECT anon_1.user_id": []})
+
+    await record_users_stats_events(session, [1, 2, 3], CATEGORIES)
+
+    assert session.queries == 2
+    assert not any(
+        shape.startswith(("UPDATE user_stats", "INSERT INTO user_stats"))
+        for shape in session.statements
+    )
+
+
+@pytest.mark.asyncio
+async def test_rollup_applies_batch_with_one_upsert():
+    session = CountingSession(rows={"DELETE FROM stats_events": [
+        (2, "tasks_completed", 1),
+        (1, "tasks_completed", 1),
+        (2, "tasks_completed", 1),
+    ]})
+
+    moved = await rollup_stats_events(session, batch_size=100)
+
+    assert moved == 3
+    assert session.queries == 2
+    [delete_shape, upsert_shape] = session.statements
+    assert "FOR UPDATE SKIP LOCKED" in delete_shape
+    assert upsert_shape.startswith("INSERT INTO user_stats")
+    assert "ON CONFLICT (user_id) DO UPDATE" in upsert_shape
+
+
+@pytest.mark.asyncio
+async def test_empty_rollup_skips_upsert():
+    session = CountingSession(rows={"DELETE FROM stats_events": []})
+
+    assert await rollup_stats_events(session, batch_size=100) == 0
+    assert session.queries == 1
@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.core.db.pool import MeteredAsyncQueuePool
+
+
+def make_pool() -> MeteredAsyncQueuePool:
+    return MeteredAsyncQueuePool(
+        lambda: MagicMock(),
+        pool_size=1,
+        max_overflow=1,
+        timeout=0.05,
+    )
+
+
+def test_checkout_and_overflow_are_counted():
+    pool = make_pool()
+
+    first = pool.connect()
+    second = pool.connect()
+    snapshot = pool.snapshot()
+
+    assert snapshot["checked_out"] == 2
+    assert snapshot["overflow"] == 1
+    assert snapshot["checkouts_total"] == 2
+
+    first.close()
+    second.close()
+    snapshot = pool.snapshot()
+
+    assert snapshot["checked_out"] == 0
+    assert snapshot["checkins_total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_is_counted():
+    pool = make_pool()
+    connections = [pool.connect(), pool.connect()]
+
+    with pytest.raises(exc.TimeoutError):
+        await greenlet_spawn(pool.connect)
+
+    snapshot = pool.snapshot()
+    assert snapshot["timeouts_total"] == 1
+    assert snapshot["wait_seconds_max"] >= 0.05
+    for connection in connections:
+        connection.close()
+
+
+def test_metrics_survive_recreate():
+    pool = make_pool()
+    pool.connect().close()
+
+    new_pool = pool.recreate()
+
+    assert new_pool.snapshot()["checkouts_total"] == 1
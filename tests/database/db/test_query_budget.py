@@ -0,0 +1,50 @@
+import logging
+from collections import Counter
+
+from app.core.db.query_budget import QueryBudget, statement_shape
+
+
+def test_statement_shape_hides_literals_and_parameters():
+    first = statement_shape(
+        "SELECT * FROM tasks WHERE task_id = %(task_id_1)s\n"
+        "  AND title = 'a''b' AND status IN (%s, %s, %s) LIMIT 10"
+    )
+    second = statement_shape(
+        "SELECT * FROM tasks WHERE task_id = $1 "
+        "AND title = 'c' AND status IN ($2) LIMIT 20"
+    )
+
+    assert first == second == (
+        "SELECT * FROM tasks WHERE task_id = ? "
+        "AND title = ? AND status IN (?) LIMIT ?"
+    )
+
+
+def test_statement_shape_keeps_casts():
+    assert statement_shape("SELECT :id::bigint") == "SELECT ?::bigint"
+
+
+def test_budget_warns_on_too_many_queries(caplog):
+    budget = QueryBudget(max_queries=3, max_seconds=1.0)
+
+    with caplog.at_level(logging.WARNING):
+        budget.check("router:handler", 4, 0.01, Counter())
+
+    assert budget.stats.over_budget == 1
+    assert "router:handler" in caplog.text
+
+
+def test_budget_detects_repeated_statement(caplog):
+    budget = QueryBudget(max_queries=100, repeat_threshold=3)
+    statements = Counter({
+        "SELECT * FROM users WHERE telegram_id = ?": 3,
+        "UPDATE tasks SET status = ?": 1,
+    })
+
+    with caplog.at_level(logging.WARNING):
+        repeated = budget.check("router:handler", 4, 0.01, statements)
+
+    assert repeated == ["SELECT * FROM users WHERE telegram_id = ?"]
+    assert budget.stats.over_budget == 0
+    assert budget.stats.repeated == 1
+    assert "N+1" in caplog.text
@@ -0,0 +1,57 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.db.transaction_hooks import (
+    HookedAsyncSession,
+    after_commit,
+    after_rollback,
+)
+
+
+@pytest.mark.asyncio
+async def test_commit_runs_only_commit_hooks():
+    session = HookedAsyncSession()
+    on_commit, on_rollback = AsyncMock(), AsyncMock()
+
+    await session.begin()
+    after_commit(session, on_commit)
+    after_rollback(session, on_rollback)
+    on_commit.assert_not_awaited()
+    await session.commit()
+
+    on_commit.assert_awaited_once()
+    on_rollback.assert_not_awaited()
+    await session.close()
+    on_commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_rollback_and_close_run_only_rollback_hooks():
+    session = HookedAsyncSession()
+    on_commit, on_rollback = AsyncMock(), AsyncMock()
+
+    await session.begin()
+    after_commit(session, on_commit)
+    after_rollback(session, on_rollback)
+    await session.rollback()
+
+    await session.begin()
+    after_rollback(session, on_rollback)
+    await session.close()
+
+    on_commit.assert_not_awaited()
+    assert on_rollback.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failing_hook_does_not_block_others():
+    session = HookedAsyncSession()
+    second = AsyncMock()
+
+    await session.begin()
+    after_commit(session, AsyncMock(side_effect=RuntimeError("redis down")))
+    after_commit(session, second)
+    await session.commit()
+
+    second.assert_awaited_once()
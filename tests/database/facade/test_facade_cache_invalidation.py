@@ -0,0 +1,53 @@
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.modules.todo.facade.task import (
+    cancel_task_with_stats_achievs_log,
+    change_list_for_task_with_log,
+    complete_task_with_stats_achievs_log,
+)
+from app.modules.todo.models import LevelEnum
+from tests.database.conftest import CountingSession
+
+FACADE = "app.modules.todo.facade.task"
+
+TASK_DATA = {
+    "task_id": 1,
+    "selected_list_id": 2,
+    "priority": LevelEnum.HIGH,
+    "urgency": LevelEnum.LOW,
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "facade, args, stats",
+    [
+        (complete_task_with_stats_achievs_log, (10, TASK_DATA),
+         "update_users_stats_achievs_on_task_completed"),
+        (cancel_task_with_stats_achievs_log, (10, TASK_DATA),
+         "update_users_stats_achievs_on_task_canceled"),
+        (change_list_for_task_with_log, (10, 1, 2, 3), None),
+    ],
+    ids=lambda value: getattr(value, "__name__", None),
+)
+async def test_task_view_is_invalidated_after_commit(facade, args, stats):
+    calls = []
+    session = CountingSession()
+    session.commit = AsyncMock(side_effect=lambda: calls.append("commit"))
+    invalidate = AsyncMock(
+        side_effect=lambda task_id: calls.append(("invalidate", task_id))
+    )
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch(f"{FACADE}.task_view_cache.invalidate", invalidate)
+        )
+        stack.enter_context(patch(f"{FACADE}.log_activity", AsyncMock()))
+        if stats:
+            stack.enter_context(patch(f"{FACADE}.{stats}", AsyncMock()))
+        await facade(session, *args)
+
+    assert calls == ["commit", ("invalidate", 1)]
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.todo.facade.task import (
+    add_task_with_stats_achievs_log,
+    complete_task_with_stats_achievs_log,
+    not_complete_task_with_stats_achievs_log,
+    cancel_task_with_stats_achievs_log,
+    not_cancel_task_with_stats_achievs_log,
+    delete_task_with_log,
+    change_list_for_task_with_log,
+)
+from app.modules.todo.facade.task_list import (
+    add_list_with_stats_achievs_log,
+    delete_list_with_stats_log,
+    change_parent_list_with_log,
+)
+from app.modules.todo.facade.user import upsert_user_with_log
+from app.modules.todo.models import LevelEnum, TaskStatusEnum
+from app.modules.todo.services.achievement_catalog import achievement_catalog
+
+USER_IDS = [10, 20, 30]
+
+TASK_DATA = {
+    "task_id": 1,
+    "task_title": "Задача",
+    "task_description": "",
+    "selected_list_id": 2,
+    "priority": LevelEnum.HIGH,
+    "urgency": LevelEnum.LOW,
+    "status": TaskStatusEnum.IN_PROGRESS,
+}
+
+LIST_DATA = {"selected_list_id": 2, "new_list_title": "Список"}
+
+CATEGORIES = (
+    "tasks_created", "tasks_completed", "tasks_canceled",
+    "high_priority_tasks_completed", "low_urgency_tasks_completed",
+    "lists_created",
+)
+
+
+def fake_achievement(achievement_id: int, category: str):
+    return SimpleNamespace(
+        achievement_id=achievement_id,
+        achievement_name=f"achievement {achievement_id}",
+        description="",
+        emoji=None,
+        category=category,
+        is_secret=False,
+        is_progression=True,
+        required_count=1,
+        previous_achievement_id=None,
+    )
+
+
+def fake_stats(user_id: int):
+    return SimpleNamespace(user_id=user_id, **dict.fromkeys(CATEGORIES, 1))
+
+
+# Строки, которые вернёт БД: пользователи задачи и их статистика.
+# Размер ответа не должен влиять на количество запросов
+ROWS = {
+    "SELECT users.": [
+        SimpleNamespace(telegram_id=user_id) for user_id in USER_IDS
+    ],
+    "INSERT INTO user_stats": [fake_stats(user_id) for user_id in USER_IDS],
+    "UPDATE user_stats": [fake_stats(user_id) for user_id in USER_IDS],
+}
+
+
+@pytest.fixture(autouse=True)
+def loaded_catalog():
+    achievement_catalog.fill(
+        [
+            fake_achievement(achievement_id, category)
+            for achievement_id, category in enumerate(CATEGORIES, start=1)
+        ],
+        (len(CATEGORIES), datetime(2026, 1, 1, tzinfo=timezone.utc)),
+    )
+    yield
+    achievement_catalog.invalidate()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "max_queries, facade, args",
+    [
+        (5, add_task_with_stats_achievs_log, (10, TASK_DATA)),
+        (7, complete_task_with_stats_achievs_log, (10, TASK_DATA)),
+        (7, not_complete_task_with_stats_achievs_log, (10, TASK_DATA)),
+        (7, cancel_task_with_stats_achievs_log, (10, TASK_DATA)),
+        (7, not_cancel_task_with_stats_achievs_log, (10, TASK_DATA)),
+        (1, delete_task_with_log, (10, TASK_DATA)),
+        (1, change_list_for_task_with_log, (10, 1, 2, 3)),
+        (5, add_list_with_stats_achievs_log, (10, LIST_DATA)),
+        (3, delete_list_with_stats_log, (10, 2)),
+        (2, change_parent_list_with_log, (10, 2, None, 3)),
+        (2, upsert_user_with_log, (10, "Имя", None, "nick")),
+    ],
+    ids=lambda value: getattr(value, "__name__", None),
+)
+async def test_facade_query_budget(
+        assert_max_queries,
+        max_queries,
+        facade,
+        args,
+):
+    session = await assert_max_queries(
+        max_queries, facade, *args, rows=ROWS
+    )
+
+    repeated = {
+        shape: count for shape, count in session.statements.items()
+        if count > 1
+    }
+    assert not repeated
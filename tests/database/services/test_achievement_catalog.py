@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+
+VERSION = (4, datetime(2025, 10, 17, tzinfo=timezone.utc))
+
+
+def fake_achievement(
+        achievement_id: int,
+        category: str,
+        required_count: int,
+        previous_achievement_id: int | None = None,
+):
+    return SimpleNamespace(
+        achievement_id=achievement_id,
+        achievement_name=f"achievement {achievement_id}",
+        description="",
+        emoji=None,
+        category=category,
+        is_secret=False,
+        is_progression=True,
+        required_count=required_count,
+        previous_achievement_id=previous_achievement_id,
+    )
+
+
+ACHIEVEMENTS = [
+    fake_achievement(2, "tasks_created", 5, 1),
+    fake_achievement(1, "tasks_created", 1),
+    fake_achievement(3, "tasks_completed", 1),
+    fake_achievement(4, "tasks_created", 10, 2),
+]
+
+
+def make_catalog() -> AchievementCatalog:
+    catalog = AchievementCatalog()
+    catalog.fill(ACHIEVEMENTS, VERSION)
+    return catalog
+
+
+@pytest.mark.asyncio
+async def test_get_by_categories_without_queries():
+    catalog = make_catalog()
+    session = AsyncMock()
+
+    achievements = await catalog.get_by_categories(
+        session, ["tasks_created", "unknown"]
+    )
+
+    assert [a.achievement_id for a in achievements] == [1, 2, 4]
+    session.execute.assert_not_awaited()
+    session.scalars.assert_not_awaited()
+
+
+def test_previous_achievement_chain():
+    catalog = make_catalog()
+
+    assert [a.achievement_id for a in catalog.get_next(None)] == [1, 3]
+    assert [a.achievement_id for a in catalog.get_next(1)] == [2]
+    assert [a.achievement_id for a in catalog.get_next(2)] == [4]
+    assert catalog.get_next(4) == []
+    assert catalog.get(4).previous_achievement_id == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reloads_on_next_access():
+    catalog = make_catalog()
+    catalog.invalidate()
+    session = AsyncMock()
+    version_result = MagicMock()
+    version_result.one.return_value = VERSION
+    session.execute.return_value = version_result
+    rows = MagicMock()
+    rows.all.return_value = ACHIEVEMENTS[:1]
+    session.scalars.return_value = rows
+
+    achievements = await catalog.get_by_categories(session, ["tasks_created"])
+
+    assert [a.achievement_id for a in achievements] == [2]
+    assert catalog.version == VERSION
+
+
+@pytest.mark.asyncio
+async def test_changed_version_stamp_reloads():
+    catalog = AchievementCatalog(check_interval=0)
+    catalog.fill(ACHIEVEMENTS, VERSION)
+    session = AsyncMock()
+    version_result = MagicMock()
+    version_result.one.return_value = (1, VERSION[1])
+    session.execute.return_value = version_result
+    rows = MagicMock()
+    rows.all.return_value = ACHIEVEMENTS[2:3]
+    session.scalars.return_value = rows
+
+    achievements = await catalog.get_by_categories(session, ["tasks_created"])
+
+    assert achievements == []
+    assert catalog.version == (1, VERSION[1])
+
+
+def test_threshold_skipped_by_concurrent_increments_is_granted_later():
+    catalog = make_catalog()
+    # Счётчик 3; две параллельные транзакции видят только свои
+    # приращения: обе получают 4, а фиксируется 5
+    for _ in range(2):
+        assert catalog.get_user_achievements_changes(
+            1, ["tasks_created"], {1}, SimpleNamespace(tasks_created=4), 1
+        ) == []
+
+    updates = catalog.get_user_achievements_changes(
+        1, ["tasks_created"], {1}, SimpleNamespace(tasks_created=6), 1
+    )
+
+    assert [(u["achievement_id"], u["is_completed"]) for u in updates] == [
+        (2, True),
+    ]
+
+
+def test_threshold_skipped_by_concurrent_rollbacks_is_revoked_later():
+    catalog = make_catalog()
+    # Счётчик 6; два параллельных отката видят по 5, фиксируется 4
+    for _ in range(2):
+        assert catalog.get_user_achievements_changes(
+            1, ["tasks_created"], {1, 2}, SimpleNamespace(tasks_created=5), -1
+        ) == []
+
+    updates = catalog.get_user_achievements_changes(
+        1, ["tasks_created"], {1, 2}, SimpleNamespace(tasks_created=3), -1
+    )
+
+    assert [(u["achievement_id"], u["is_completed"]) for u in updates] == [
+        (2, False),
+    ]
@@ -0,0 +1,140 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.todo.crud.achievement import (
+    get_user_achievements_rollback_updates,
+    get_user_achievements_updates,
+)
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+
+CATEGORIES = ["tasks_completed", "tasks_canceled", "high_priority_tasks_completed"]
+USER_ID = 1
+
+
+def random_catalog(rnd: random.Random) -> list[SimpleNamespace]:
+    """
+    Цепочки достижений в каждой категории. Пороги по цепочке
+    обычно растут, но бывают равными и убывающими
+    """
+    achievements = []
+    for category in rnd.sample(CATEGORIES, rnd.randint(1, len(CATEGORIES))):
+        for _chain in range(rnd.randint(1, 2)):
+            previous_id = None
+            required = 0
+            for _ in range(rnd.randint(1, 5)):
+                required = max(1, required + rnd.choice((-1, 0, 1, 2, 5)))
+                achievement_id = len(achievements) + 1
+                achievements.append(SimpleNamespace(
+                    achievement_id=achievement_id,
+                    achievement_name=f"achievement {achievement_id}",
+                    description="",
+                    emoji=None,
+                    category=category,
+                    is_secret=False,
+                    is_progression=True,
+                    required_count=required,
+                    previous_achievement_id=previous_id,
+                ))
+                previous_id = achievement_id
+    rnd.shuffle(achievements)
+    return achievements
+
+
+def apply(links: dict, updates: list[dict]) -> dict:
+    links = dict(links)
+    for update in updates:
+        links[update["achievement_id"]] = SimpleNamespace(
+            is_completed=update["is_completed"]
+        )
+    return links
+
+
+def settle(old_function, achievements, links, stats) -> dict:
+    """
+    Повторяет прежнюю функцию, пока связи меняются: за один вызов
+    она открывает только одно звено цепочки
+    """
+    while True:
+        updated = apply(links, old_function(USER_ID, achievements, links, stats))
+        if completed_ids(updated) == completed_ids(links):
+            return updated
+        links = updated
+
+
+def completed_ids(links: dict) -> set[int]:
+    return {
+        achievement_id for achievement_id, link in links.items()
+        if link.is_completed
+    }
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_changes_match_previous_evaluation(seed):
+    rnd = random.Random(seed)
+    achievements = random_catalog(rnd)
+    catalog = AchievementCatalog()
+    catalog.fill(achievements, (len(achievements), None))
+    categories = sorted({a.category for a in achievements})
+    before = SimpleNamespace(**{
+        category: rnd.randint(0, 12) for category in categories
+    })
+    # Связи, соответствующие счётчикам до изменения
+    links = settle(get_user_achievements_updates, achievements, {}, before)
+
+    delta = rnd.choice((1, -1))
+    changed = [
+        category for category in categories
+        if rnd.random() < 0.7 and getattr(before, category) + delta >= 0
+    ] or categories[:1]
+    if getattr(before, changed[0]) + delta < 0:
+        delta = 1
+    after = SimpleNamespace(**vars(before))
+    for category in changed:
+        setattr(after, category, getattr(before, category) + delta)
+
+    affected = [a for a in achievements if a.category in changed]
+    old_function = (
+        get_user_achievements_updates if delta > 0
+        else get_user_achievements_rollback_updates
+    )
+    expected = settle(old_function, affected, links, after)
+    updates = catalog.get_user_achievements_changes(
+        USER_ID, changed, completed_ids(links), after, delta
+    )
+
+    assert completed_ids(apply(links, updates)) == completed_ids(expected)
+    by_id = {a.achievement_id: a for a in achievements}
+    for update in updates:
+        link = links.get(update["achievement_id"])
+        was_completed = bool(link and link.is_completed)
+        assert update["is_completed"] != was_completed
+        assert (update["unlocked_at"] is not None) == update["is_completed"]
+        category = by_id[update["achievement_id"]].category
+        assert update["progress"] == getattr(after, category)
+
+
+def test_unchanged_progress_emits_nothing():
+    catalog = AchievementCatalog()
+    catalog.fill([
+        SimpleNamespace(
+            achievement_id=1, achievement_name="", description="",
+            emoji=None, category="tasks_completed", is_secret=False,
+            is_progression=True, required_count=1,
+            previous_achievement_id=None,
+        ),
+        SimpleNamespace(
+            achievement_id=2, achievement_name="", description="",
+            emoji=None, category="tasks_completed", is_secret=False,
+            is_progression=True, required_count=10,
+            previous_achievement_id=1,
+        ),
+    ], (2, None))
+    # 5 -> 6: ни один порог не пересечён, прежние функции вернули бы 2 строки
+    updates = catalog.get_user_achievements_changes(
+        USER_ID, ["tasks_completed"], {1},
+        SimpleNamespace(tasks_completed=6), 1,
+    )
+
+    assert updates == []
@@ -0,0 +1,132 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.modules.todo.services.achievement_state_cache import (
+    AchievementStateCache,
+    get_bit,
+)
+from tests.database.conftest import FakeRedis
+
+LOADER = (
+    "app.modules.todo.services.achievement_state_cache."
+    "get_users_completed_achievements"
+)
+
+
+class AchievementRedis(FakeRedis):
+    def register_script(self, _source):
+        return self.fill_unknown
+
+    async def fill_unknown(self, keys, args):
+        # Как FILL_UNKNOWN_LUA: известные биты не перезаписываются
+        ttl, pos = args[0], 1
+        for known, completed in zip(keys[::2], keys[1::2]):
+            count = args[pos]
+            pos += 1
+            for offset, value in zip(
+                    args[pos:pos + count * 2:2], args[pos + 1:pos + count * 2:2]
+            ):
+                if not get_bit(self.data.get(known, b""), offset):
+                    await self.setbit(completed, offset, value)
+                    await self.setbit(known, offset, 1)
+            pos += count * 2
+            self.ttls[known] = self.ttls[completed] = ttl
+
+
+def make_cache() -> tuple[AchievementStateCache, AchievementRedis]:
+    cache = AchievementStateCache(ttl=60)
+    redis = AchievementRedis()
+    cache.setup(redis)
+    return cache, redis
+
+
+def test_get_bit_uses_redis_bit_order():
+    assert get_bit(b"\x01", 7)
+    assert get_bit(b"\x80\x00", 0)
+    assert not get_bit(b"\x80", 1)
+    assert not get_bit(b"", 100)
+
+
+@pytest.mark.asyncio
+async def test_only_unknown_achievements_are_loaded():
+    cache, redis = make_cache()
+    loader = AsyncMock(side_effect=[{1: {6}, 2: set()}, {1: {9}}])
+
+    with patch(LOADER, loader):
+        first = await cache.get_completed(AsyncMock(), [1, 2], [6, 7])
+        second = await cache.get_completed(AsyncMock(), [1, 2], [6, 7])
+        third = await cache.get_completed(AsyncMock(), [1], [6, 9])
+
+    assert first == second == {1: {6}, 2: set()}
+    assert third == {1: {6, 9}}
+    assert loader.await_count == 2
+    assert loader.await_args_list[0].args[1:] == ([1, 2], [6, 7])
+    assert loader.await_args_list[1].args[1:] == ([1], [9])
+    assert redis.ttls["achievements:1:known"] == 60
+    assert (cache.stats.hits, cache.stats.misses) == (2, 3)
+
+
+@pytest.mark.asyncio
+async def test_update_flips_completion_bits():
+    cache, _redis = make_cache()
+
+    with patch(LOADER, AsyncMock(return_value={1: {6}})):
+        await cache.get_completed(AsyncMock(), [1], [6, 7])
+    await cache.update([
+        {"user_id": 1, "achievement_id": 6, "is_completed": False},
+        {"user_id": 1, "achievement_id": 7, "is_completed": True},
+    ])
+    with patch(LOADER, AsyncMock()) as loader:
+        completed = await cache.get_completed(AsyncMock(), [1], [6, 7])
+
+    assert completed == {1: {7}}
+    loader.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_loaded_state_does_not_overwrite_concurrent_update():
+    cache, _redis = make_cache()
+
+    async def load_and_commit_elsewhere(*_args):
+        # Пока читалась БД, другая транзакция выдала достижение 7
+        await cache.update([
+            {"user_id": 1, "achievement_id": 7, "is_completed": True},
+        ])
+        return {1: set()}
+
+    with patch(LOADER, AsyncMock(side_effect=load_and_commit_elsewhere)):
+        await cache.get_completed(AsyncMock(), [1], [6, 7])
+    with patch(LOADER, AsyncMock()) as loader:
+        completed = await cache.get_completed(AsyncMock(), [1], [6, 7])
+
+    assert completed == {1: {7}}
+    loader.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_without_redis_state_is_read_from_database():
+    cache = AchievementStateCache()
+    loader = AsyncMock(return_value={1: {6}})
+
+    with patch(LOADER, loader):
+        assert await cache.get_completed(AsyncMock(), [1], [6, 7]) == {1: {6}}
+        await cache.update([
+            {"user_id": 1, "achievement_id": 7, "is_completed": True},
+        ])
+        await cache.get_completed(AsyncMock(), [1], [6, 7])
+
+    assert loader.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_database():
+    cache, redis = make_cache()
+    redis.mget = AsyncMock(side_effect=ConnectionError("down"))
+
+    with patch(LOADER, AsyncMock(return_value={1: set()})) as loader:
+        assert await cache.get_completed(AsyncMock(), [1], [6]) == {1: set()}
+
+    loader.assert_awaited_once()
+    assert cache.stats.errors == 1
@@ -0,0 +1,147 @@
+import asyncio
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.core.db.transaction_hooks import HookedAsyncSession
+from app.modules.todo.crud.tracking import log_activity
+from app.modules.todo.services.activity_log_sink import ActivityLogSink
+
+
+class FakeSessionMaker:
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on or (lambda rows: False)
+
+    def __call__(self):
+        maker = self
+
+        class FakeSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *_args):
+                return False
+
+            async def execute(self, _stmt, rows):
+                if maker.fail_on(rows):
+                    raise IntegrityError("insert", {}, Exception("fk"))
+                maker.batches.append(list(rows))
+
+            async def commit(self):
+                pass
+
+        return FakeSession()
+
+
+@pytest.mark.asyncio
+async def test_flushes_full_batch_without_waiting():
+    session_maker = FakeSessionMaker()
+    sink = ActivityLogSink(batch_size=3, flush_interval=60)
+    sink.start(session_maker)
+
+    for i in range(3):
+        await sink.put({"action": "create_task", "user_id": i})
+    await asyncio.sleep(0.01)
+
+    assert [len(batch) for batch in session_maker.batches] == [3]
+    assert session_maker.batches[0][0]["created_at"] is not None
+    await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_by_time():
+    session_maker = FakeSessionMaker()
+    sink = ActivityLogSink(batch_size=100, flush_interval=0.02)
+    sink.start(session_maker)
+
+    await sink.put({"action": "add_list", "user_id": 1, "old_value": 5})
+    await asyncio.sleep(0.1)
+
+    assert len(session_maker.batches) == 1
+    assert session_maker.batches[0][0]["old_value"] == "5"
+    await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_queued_records():
+    session_maker = FakeSessionMaker()
+    sink = ActivityLogSink(batch_size=2, flush_interval=60)
+    sink.start(session_maker)
+
+    for i in range(5):
+        await sink.put({"action": "complete_task", "user_id": i})
+    await sink.stop()
+
+    assert sum(len(batch) for batch in session_maker.batches) == 5
+    assert sink.stats.written == 5
+    assert not sink.is_running
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_record():
+    sink = ActivityLogSink(max_queue_size=1, put_timeout=0.01)
+    sink._queue = asyncio.Queue(maxsize=1)
+
+    assert await sink.put({"action": "a"}) is True
+    assert await sink.put({"action": "b"}) is False
+    assert sink.stats.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_row_by_row():
+    session_maker = FakeSessionMaker(
+        fail_on=lambda rows: any(row["task_id"] == 13 for row in rows)
+    )
+    sink = ActivityLogSink(batch_size=3, flush_interval=60)
+    sink.start(session_maker)
+
+    for task_id in (1, 13, 2):
+        await sink.put({"action": "delete_task", "task_id": task_id})
+    await sink.stop()
+
+    assert [batch[0]["task_id"] for batch in session_maker.batches] == [1, 2]
+    assert (sink.stats.written, sink.stats.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_log_activity_queues_success_after_commit():
+    session = HookedAsyncSession()
+    sink = MagicMock(is_running=True, put=AsyncMock())
+
+    with patch("app.modules.todo.crud.tracking.activity_log_sink", sink):
+        await log_activity(session, "create_task", user_id=1, unknown=2)
+        sink.put.assert_not_awaited()
+        await session.commit()
+
+    sink.put.assert_awaited_once()
+    record = sink.put.await_args.args[0]
+    assert record.pop("created_at") is not None
+    assert record == {"action": "create_task", "success": True, "user_id": 1}
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_action_does_not_log_success():
+    session = HookedAsyncSession()
+    sink = MagicMock(is_running=True, put=AsyncMock())
+
+    with patch("app.modules.todo.crud.tracking.activity_log_sink", sink):
+        await session.begin()
+        await log_activity(session, "complete_task", user_id=1)
+        await session.rollback()
+        await log_activity(session, "complete_task", False, user_id=1)
+        await session.close()
+
+    sink.put.assert_awaited_once_with(
+        {"action": "complete_task", "success": False, "user_id": 1}
+    )
+
+
+@pytest.mark.asyncio
+async def test_log_activity_falls_back_to_session():
+    session = MagicMock()
+
+    await log_activity(session, "create_task", user_id=1)
+
+    session.add.assert_called_once()
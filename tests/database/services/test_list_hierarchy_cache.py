@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.modules.todo.models import SystemListTypeEnum
+from app.modules.todo.services.list_hierarchy_cache import ListHierarchyCache
+from app.modules.todo.services.task_list import (
+    get_user_lists_hierarchy,
+    select_visible_lists,
+)
+from tests.database.conftest import FakeRedis
+
+SERVICES = "app.modules.todo.services.task_list"
+
+
+FAKE_ROWS = [
+    SimpleNamespace(
+        list_id=1, title="Корзина", parent_list_id=None,
+        system_type=SystemListTypeEnum.TRASH, position=1,
+    ),
+    SimpleNamespace(
+        list_id=2, title="Работа", parent_list_id=None,
+        system_type=SystemListTypeEnum.NONE, position=2,
+    ),
+    SimpleNamespace(
+        list_id=3, title="Отчёты", parent_list_id=2,
+        system_type=SystemListTypeEnum.NONE, position=1,
+    ),
+]
+
+
+@pytest.fixture
+def cache():
+    cache = ListHierarchyCache()
+    cache.setup(FakeRedis())
+    with patch(f"{SERVICES}.list_hierarchy_cache", cache):
+        yield cache
+
+
+@pytest.mark.asyncio
+async def test_second_read_is_served_from_cache(cache):
+    fetch = AsyncMock(return_value=FAKE_ROWS)
+
+    with patch(f"{SERVICES}.fetch_user_lists_raw", fetch):
+        first = await get_user_lists_hierarchy(AsyncMock(), 42)
+        second = await get_user_lists_hierarchy(AsyncMock(), 42)
+
+    fetch.assert_awaited_once()
+    assert first == second
+    assert [node.pos for node in second] == ["1.", "2.", "2.1."]
+    assert second[0].system_type == SystemListTypeEnum.TRASH
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert cache.stats.hit_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_reload(cache):
+    fetch = AsyncMock(return_value=FAKE_ROWS)
+
+    with patch(f"{SERVICES}.fetch_user_lists_raw", fetch):
+        await get_user_lists_hierarchy(AsyncMock(), 42)
+        await cache.invalidate(42)
+        await get_user_lists_hierarchy(AsyncMock(), 42)
+
+    assert fetch.await_count == 2
+    assert await cache.get_version(42) == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_write_after_invalidation_is_ignored(cache):
+    nodes, version = await cache.get(42)
+    await cache.invalidate(42)
+    await cache.set(42, version, [])
+
+    nodes, _version = await cache.get(42)
+
+    assert nodes is None
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_database(cache):
+    cache._redis.get = AsyncMock(side_effect=ConnectionError("down"))
+    fetch = AsyncMock(return_value=FAKE_ROWS)
+
+    with patch(f"{SERVICES}.fetch_user_lists_raw", fetch):
+        nodes = await get_user_lists_hierarchy(AsyncMock(), 42)
+
+    assert len(nodes) == 3
+    assert cache.stats.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_hidden_filter_is_applied_over_cached_tree(cache):
+    with patch(f"{SERVICES}.fetch_user_lists_raw", AsyncMock(return_value=FAKE_ROWS)):
+        await get_user_lists_hierarchy(AsyncMock(), 42)
+    nodes = await get_user_lists_hierarchy(AsyncMock(), 42)
+
+    buttons, lists = select_visible_lists(
+        nodes,
+        is_hidden=lambda node: node.system_type == SystemListTypeEnum.TRASH
+        or node.list_id == 2,
+    )
+
+    assert buttons == [{"list_id": 3, "list_title": "Отчёты", "pos": "2.1."}]
+    assert lists == {3: "Отчёты"}
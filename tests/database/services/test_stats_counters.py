@@ -0,0 +1,239 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.modules.todo.services.stats_counters import StatsCounters
+from tests.database.conftest import FakeRedis
+
+SERVICES = "app.modules.todo.services.stats_counters"
+CATEGORIES = ["tasks_completed", "tasks_canceled"]
+
+
+def make_counters(
+        increment=None, hydrate=None, take_pending=None, dirty=None,
+):
+    redis = FakeRedis()
+    scripts = {
+        "increment": increment or AsyncMock(),
+        "revert": AsyncMock(),
+        "hydrate": hydrate or AsyncMock(return_value=1),
+        "take_pending": take_pending or AsyncMock(),
+        "finish_flush": AsyncMock(),
+    }
+    redis.register_script = MagicMock(side_effect=list(scripts.values()))
+    redis.spop = AsyncMock(side_effect=[dirty or [], []])
+    redis.mget = AsyncMock(return_value=[b"4", None])
+    counters = StatsCounters(batch_size=2, hydrate_retry_delay=0)
+    counters.setup(redis)
+    session = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+    counters._session_maker = session_maker
+    return counters, redis, scripts
+
+
+@pytest.mark.asyncio
+async def test_increment_returns_counters_from_redis():
+    counters, _redis, scripts = make_counters(
+        increment=AsyncMock(return_value=[1, [5, 1, 7, 0]])
+    )
+
+    users_stats = await counters.increment(SimpleNamespace(info={}), [10, 20], CATEGORIES)
+
+    assert (users_stats[10].tasks_completed, users_stats[10].tasks_canceled) == (5, 1)
+    assert (users_stats[20].tasks_completed, users_stats[20].tasks_canceled) == (7, 0)
+    keys = scripts["increment"].await_args.kwargs["keys"]
+    assert keys == [
+        "stats:10", "stats:20", "stats:pending:10", "stats:pending:20",
+        "stats:dirty",
+    ]
+    assert scripts["increment"].await_args.kwargs["args"] == [
+        1, counters.ttl, 2, 10, 20, *CATEGORIES,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_missing_hashes_are_hydrated_from_database():
+    counters, _redis, scripts = make_counters(
+        increment=AsyncMock(side_effect=[[0, [2]], [1, [3, 0, 8, 2]]])
+    )
+    merged = AsyncMock(return_value={
+        20: SimpleNamespace(tasks_completed=7, tasks_canceled=2),
+    })
+
+    with patch(f"{SERVICES}.get_users_stats_merged", merged):
+        users_stats = await counters.increment(
+            SimpleNamespace(info={}), [10, 20], CATEGORIES
+        )
+
+    merged.assert_awaited_once()
+    assert merged.await_args.args[1:] == ([20], CATEGORIES)
+    assert scripts["hydrate"].await_args.kwargs == {
+        "keys": ["stats:20", "stats:pending:20", "stats:flush:generation"],
+        "args": [4, counters.ttl, 2, *CATEGORIES, 7, 2],
+    }
+    assert users_stats[20].tasks_completed == 8
+    assert counters.stats.hydrated_users == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_error_lets_caller_write_to_database():
+    counters, _redis, _scripts = make_counters(
+        increment=AsyncMock(side_effect=ConnectionError("down"))
+    )
+
+    session = SimpleNamespace(info={})
+
+    assert await counters.increment(session, [10], CATEGORIES) is None
+    assert counters.stats.redis_errors == 1
+    # user_stats изменится в обход Redis: хэш сбрасывается после commit
+    [(on_commit, on_rollback)] = session.info["transaction_hooks"]
+    assert on_rollback is None
+    assert on_commit.func == counters.invalidate
+    assert on_commit.args == (10,)
+
+
+@pytest.mark.asyncio
+async def test_rollback_reverts_increment():
+    counters, _redis, scripts = make_counters(
+        increment=AsyncMock(return_value=[1, [5, 1]])
+    )
+    session = SimpleNamespace(info={})
+
+    await counters.increment(session, [10], CATEGORIES, -1)
+    [(on_commit, on_rollback)] = session.info["transaction_hooks"]
+    assert on_commit is None
+    scripts["revert"].assert_not_awaited()
+    await on_rollback()
+
+    assert scripts["revert"].await_args.kwargs == {
+        "keys": ["stats:10", "stats:pending:10", "stats:dirty"],
+        "args": [-1, 1, 10, *CATEGORIES],
+    }
+
+
+@pytest.mark.asyncio
+async def test_hydration_waits_for_running_flush():
+    counters, redis, scripts = make_counters(
+        increment=AsyncMock(side_effect=[[0, [1]], [1, [3, 0]]])
+    )
+    redis.mget.side_effect = [[b"4", b"1"], [b"5", b"0"]]
+    merged = AsyncMock(return_value={
+        10: SimpleNamespace(tasks_completed=3, tasks_canceled=0),
+    })
+
+    with patch(f"{SERVICES}.get_users_stats_merged", merged):
+        await counters.increment(SimpleNamespace(info={}), [10], CATEGORIES)
+
+    # БД читается только после завершения переноса
+    merged.assert_awaited_once()
+    assert scripts["hydrate"].await_args.kwargs["args"][0] == 5
+
+
+@pytest.mark.asyncio
+async def test_hydration_retries_when_flush_started_after_read():
+    counters, _redis, scripts = make_counters(
+        increment=AsyncMock(side_effect=[[0, [1]], [1, [3, 0]]]),
+        hydrate=AsyncMock(side_effect=[0, 1]),
+    )
+    merged = AsyncMock(return_value={
+        10: SimpleNamespace(tasks_completed=3, tasks_canceled=0),
+    })
+
+    with patch(f"{SERVICES}.get_users_stats_merged", merged):
+        users_stats = await counters.increment(
+            SimpleNamespace(info={}), [10], CATEGORIES
+        )
+
+    assert merged.await_count == scripts["hydrate"].await_count == 2
+    assert users_stats[10].tasks_completed == 3
+    assert counters.stats.hydrated_users == 1
+
+
+@pytest.mark.asyncio
+async def test_hydration_gives_up_while_flush_is_running():
+    counters, redis, scripts = make_counters(
+        increment=AsyncMock(return_value=[0, [1]])
+    )
+    redis.mget.return_value = [b"4", b"1"]
+    session = SimpleNamespace(info={})
+
+    with patch(f"{SERVICES}.get_users_stats_merged", AsyncMock()) as merged:
+        assert await counters.increment(session, [10], CATEGORIES) is None
+
+    merged.assert_not_awaited()
+    scripts["hydrate"].assert_not_awaited()
+    assert redis.mget.await_count == counters.hydrate_attempts
+    assert counters.stats.redis_errors == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_applies_nonzero_deltas_in_one_write():
+    counters, _redis, scripts = make_counters(
+        dirty=[b"10", b"20"],
+        take_pending=AsyncMock(return_value=[
+            [b"tasks_completed", b"2", b"tasks_canceled", b"0"],
+            [b"tasks_completed", b"-1"],
+        ]),
+    )
+    apply_deltas = AsyncMock()
+
+    with patch(f"{SERVICES}.apply_users_stats_deltas", apply_deltas):
+        assert await counters.flush() == 2
+
+    apply_deltas.assert_awaited_once()
+    assert scripts["take_pending"].await_args.kwargs == {
+        "keys": [
+            "stats:pending:10", "stats:pending:20",
+            "stats:flush:generation", "stats:flush:running",
+        ],
+        "args": [counters.flush_timeout],
+    }
+    scripts["finish_flush"].assert_awaited_once_with(
+        keys=["stats:flush:running"]
+    )
+    assert apply_deltas.await_args.args[1] == {
+        10: {"tasks_completed": 2},
+        20: {"tasks_completed": -1},
+    }
+    assert counters.stats.flushed_users == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_returns_deltas_to_redis():
+    counters, redis, scripts = make_counters(
+        dirty=[b"10"],
+        take_pending=AsyncMock(return_value=[[b"tasks_completed", b"3"]]),
+    )
+
+    with patch(f"{SERVICES}.apply_users_stats_deltas",
+               AsyncMock(side_effect=RuntimeError("db down"))):
+        assert await counters.flush() == 0
+
+    assert redis.data == {
+        "stats:pending:10": {"tasks_completed": 3},
+        "stats:dirty": {10},
+    }
+    # Перенос завершается после возврата приращений
+    scripts["finish_flush"].assert_awaited_once()
+    assert counters.stats.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_keeps_pending_deltas():
+    counters, redis, _scripts = make_counters()
+    redis.data.update({
+        "stats:10": {"tasks_completed": 5},
+        "stats:20": {"tasks_completed": 7},
+        "stats:pending:10": {"tasks_completed": 1},
+    })
+
+    await counters.invalidate(10, 20)
+
+    # Новое поколение отбрасывает загрузку из БД, начатую до сброса
+    assert redis.data == {
+        "stats:pending:10": {"tasks_completed": 1},
+        "stats:flush:generation": 1,
+    }
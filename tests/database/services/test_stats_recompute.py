@@ -0,0 +1,236 @@
+from collections import defaultdict
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.modules.todo.models import LevelEnum, TaskStatusEnum
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+from app.modules.todo.services.stats_recompute import (
+    ShardReport,
+    add_logged_actions,
+    add_task_outcomes,
+    get_expected_stats,
+    get_task_outcome_categories,
+    main,
+    recompute_shard,
+    reconcile_users,
+)
+
+SERVICES = "app.modules.todo.services.stats_recompute"
+DONE, CANCELED = TaskStatusEnum.DONE, TaskStatusEnum.CANCELED
+HIGH, LOW = LevelEnum.HIGH, LevelEnum.LOW
+
+
+def make_catalog() -> AchievementCatalog:
+    def achievement(achievement_id, category, required_count, previous_id):
+        return SimpleNamespace(
+            achievement_id=achievement_id,
+            achievement_name=f"achievement {achievement_id}",
+            description="",
+            emoji=None,
+            category=category,
+            is_secret=False,
+            is_progression=True,
+            required_count=required_count,
+            previous_achievement_id=previous_id,
+        )
+
+    catalog = AchievementCatalog()
+    catalog.fill([
+        achievement(1, "tasks_completed", 1, None),
+        achievement(2, "tasks_completed", 5, 1),
+        achievement(3, "lists_created", 1, None),
+        # Без порога: выдаётся не по статистике
+        achievement(4, None, None, None),
+    ], (4, None))
+    return catalog
+
+
+def make_totals():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def test_task_outcome_categories_match_live_updates():
+    assert set(get_task_outcome_categories(
+        DONE, HIGH, LOW, True, True, True
+    )) == {
+        "tasks_completed",
+        "high_priority_tasks_completed",
+        "low_urgency_tasks_completed",
+        "checked_tasks_completed",
+        "shared_tasks_completed",
+        "tasks_completed_before_deadline",
+    }
+    assert set(get_task_outcome_categories(
+        CANCELED, HIGH, LOW, False, True, None
+    )) == {"tasks_canceled", "shared_tasks_canceled"}
+
+
+def test_grouped_rows_are_added_per_user():
+    totals = make_totals()
+    add_task_outcomes(totals, [
+        (10, DONE, HIGH, HIGH, False, False, None, 3),
+        (10, DONE, LOW, LOW, False, False, False, 2),
+        (20, CANCELED, LOW, LOW, False, False, None, 1),
+    ])
+    add_logged_actions(totals, [
+        (10, "create_task", False, 7),
+        (10, "complete_task", True, 4),
+        (10, "not_complete_task", True, 1),
+        # Выполнение существующей задачи уже учтено по задачам
+        (10, "complete_task", False, 5),
+        (20, "add_list", False, 2),
+    ])
+
+    assert totals[10]["tasks_completed"] == 3 + 2 + 4 - 1
+    assert totals[10]["high_priority_tasks_completed"] == 3
+    assert totals[10]["tasks_completed_after_deadline"] == 2
+    assert totals[10]["tasks_created"] == 7
+    assert dict(totals[20]) == {"tasks_canceled": 1, "lists_created": 2}
+
+
+def test_expected_stats_raise_counters_unless_exact():
+    stored = {
+        "tasks_completed": 9, "tasks_canceled": -2, "tasks_postponed": -1,
+    }
+    computed = {"tasks_completed": 4, "tasks_canceled": 1}
+
+    lower_bound = get_expected_stats(stored, computed)
+    exact = get_expected_stats(stored, computed, exact=True)
+
+    assert lower_bound["tasks_completed"] == 9
+    assert exact["tasks_completed"] == 4
+    assert lower_bound["tasks_canceled"] == exact["tasks_canceled"] == 1
+    # Не пересчитываемые категории только обнуляются, если ушли в минус
+    assert lower_bound["tasks_postponed"] == exact["tasks_postponed"] == 0
+
+
+def test_catalog_completes_chains_from_scratch():
+    catalog = make_catalog()
+    categories = {"tasks_completed", "lists_created"}
+
+    assert catalog.get_completed_ids(
+        categories, {4}, {"tasks_completed": 6}
+    ) == {1, 2, 4}
+    # Предыдущее достижение отозвано - следующее тоже
+    assert catalog.get_completed_ids(
+        categories, {1, 2, 3}, {"tasks_completed": 0, "lists_created": 1}
+    ) == {3}
+
+
+@pytest.mark.asyncio
+async def test_dry_run_reports_differences_without_writing():
+    session = AsyncMock()
+    report = ShardReport(shard=0)
+    computed = {10: {"tasks_completed": 6}}
+    apply_deltas = AsyncMock()
+
+    with (
+        patch(f"{SERVICES}.get_users_stats_events_totals",
+              AsyncMock(return_value={10: {"tasks_completed": 1}})),
+        patch(f"{SERVICES}.get_users_completed_achievements",
+              AsyncMock(return_value={10: {1, 3}})),
+        patch(f"{SERVICES}.apply_users_stats_deltas", apply_deltas),
+    ):
+        await reconcile_users(
+            session, make_catalog(), {10: {"tasks_completed": -2}},
+            computed, report, max_diffs=10,
+        )
+
+    apply_deltas.assert_not_awaited()
+    session.commit.assert_not_awaited()
+    assert computed == {}
+    assert [
+        (d.category, d.stored, d.expected) for d in report.stats_diffs
+    ] == [("tasks_completed", -1, 6)]
+    assert [
+        (d.achievement_id, d.is_completed) for d in report.achievement_diffs
+    ] == [(2, True), (3, False)]
+    assert (report.users, report.changed_users) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_apply_writes_deltas_and_achievements_in_one_transaction():
+    session = AsyncMock()
+    mocks = {
+        "get_users_stats_events_totals": AsyncMock(return_value={}),
+        "get_users_completed_achievements": AsyncMock(
+            return_value={10: set(), 20: {1}}
+        ),
+        "apply_users_stats_deltas": AsyncMock(),
+        "upsert_users_achievements": AsyncMock(),
+        "stats_counters": MagicMock(invalidate=AsyncMock()),
+        "achievement_state_cache": MagicMock(update=AsyncMock()),
+    }
+
+    with patch.multiple(SERVICES, **mocks):
+        await reconcile_users(
+            session,
+            make_catalog(),
+            {10: {"tasks_completed": 0}, 20: {"tasks_completed": 1}},
+            {10: {"tasks_completed": 1}, 20: {"tasks_completed": 1}},
+            ShardReport(shard=0),
+            apply=True,
+        )
+
+    mocks["apply_users_stats_deltas"].assert_awaited_once_with(
+        session, {10: {"tasks_completed": 1}}
+    )
+    updates = mocks["upsert_users_achievements"].await_args.args[1]
+    assert [
+        (u["user_id"], u["achievement_id"], u["is_completed"], u["progress"])
+        for u in updates
+    ] == [(10, 1, True, 1)]
+    session.commit.assert_awaited_once()
+    mocks["stats_counters"].invalidate.assert_awaited_once_with(10)
+    mocks["achievement_state_cache"].update.assert_awaited_once_with(updates)
+
+
+@pytest.mark.asyncio
+async def test_shard_includes_users_without_stats_row():
+    partitions = [
+        [[(10, DONE, LOW, LOW, False, False, None, 2)]],
+        [[(30, "add_list", False, 1)]],
+        [[(10, *[0] * 35)]],
+    ]
+
+    async def stream(_session, _stmt, _batch_size):
+        for rows in partitions.pop(0):
+            yield rows
+
+    session = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+
+    def reconcile_users_stub(_session, _catalog, users_stats, computed,
+                             *_args, **_kwargs):
+        for user_id in users_stats:
+            computed.pop(user_id, None)
+
+    reconcile = AsyncMock(side_effect=reconcile_users_stub)
+    with (
+        patch(f"{SERVICES}.stream_partitions", stream),
+        patch(f"{SERVICES}.reconcile_users", reconcile),
+        patch.object(AchievementCatalog, "load", AsyncMock()),
+    ):
+        report = await recompute_shard(session_maker, 0, 2, batch_size=100)
+
+    assert [call.args[2].keys() for call in reconcile.await_args_list] == [
+        {10}, {30},
+    ]
+    assert report.rows == 3
+
+
+def test_apply_is_refused_while_redis_counters_are_not_flushed():
+    executor = MagicMock()
+
+    with (
+        patch("sys.argv", ["stats_recompute", "--apply"]),
+        patch(f"{SERVICES}.count_unflushed_users", AsyncMock(return_value=3)),
+        patch(f"{SERVICES}.ProcessPoolExecutor", executor),
+        pytest.raises(SystemExit),
+    ):
+        main()
+
+    executor.assert_not_called()
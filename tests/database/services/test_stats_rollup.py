@@ -0,0 +1,52 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.modules.todo.services.stats_rollup import StatsRollup
+
+ROLLUP = "app.modules.todo.services.stats_rollup.rollup_stats_events"
+
+
+def make_session_maker():
+    session = AsyncMock()
+    session_maker = MagicMock()
+    session_maker.return_value.__aenter__.return_value = session
+    return session_maker, session
+
+
+@pytest.mark.asyncio
+async def test_rollup_repeats_until_batch_is_not_full():
+    rollup = StatsRollup(batch_size=10)
+    rollup._session_maker, session = make_session_maker()
+
+    with patch(ROLLUP, AsyncMock(side_effect=[10, 10, 4])) as rollup_events:
+        assert await rollup.rollup() == 24
+
+    assert rollup_events.await_count == 3
+    assert session.commit.await_count == 3
+    assert (rollup.stats.batches, rollup.stats.events) == (3, 24)
+
+
+@pytest.mark.asyncio
+async def test_rollup_error_is_counted_and_stops_run():
+    rollup = StatsRollup(batch_size=10)
+    rollup._session_maker, _session = make_session_maker()
+
+    with patch(ROLLUP, AsyncMock(side_effect=RuntimeError("db down"))):
+        assert await rollup.rollup() == 0
+
+    assert rollup.stats.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_remaining_events():
+    rollup = StatsRollup(interval=3600)
+    session_maker, _session = make_session_maker()
+
+    with patch(ROLLUP, AsyncMock(return_value=0)) as rollup_events:
+        rollup.start(session_maker)
+        assert rollup.is_running
+        await rollup.stop()
+
+    assert not rollup.is_running
+    rollup_events.assert_awaited_once()
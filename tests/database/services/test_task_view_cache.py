@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.modules.todo.models import AccessRoleEnum, LevelEnum, TaskStatusEnum
+from app.modules.todo.services.task import get_task_view
+from app.modules.todo.services.task_view_cache import TaskViewCache
+from tests.database.conftest import FakeRedis
+
+SERVICES = "app.modules.todo.services.task"
+
+
+def fake_task_details():
+    task = SimpleNamespace(
+        task_id=7,
+        title="Задача",
+        description=None,
+        priority=LevelEnum.HIGH,
+        urgency=LevelEnum.LOW,
+        status=TaskStatusEnum.IN_PROGRESS,
+        is_shared=False,
+        parent_task_id=None,
+        deadline=datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc),
+        completed_at=None,
+        canceled_at=None,
+        postponed_count=0,
+        is_recurring=False,
+        recurrence_rule_id=None,
+        duration=None,
+        remind=False,
+    )
+    task_list = SimpleNamespace(list_id=3, title="Работа")
+    access = SimpleNamespace(role=AccessRoleEnum.OWNER)
+    return task, task_list, access, "Europe/Moscow"
+
+
+@pytest.fixture
+def cache():
+    cache = TaskViewCache()
+    cache.setup(FakeRedis())
+    with patch(f"{SERVICES}.task_view_cache", cache):
+        yield cache
+
+
+@pytest.mark.asyncio
+async def test_second_read_is_served_from_cache(cache):
+    details = AsyncMock(return_value=fake_task_details())
+
+    with patch(f"{SERVICES}.get_full_task_info", details):
+        first, _version = await get_task_view(AsyncMock(), 42, 7)
+        second, _version = await get_task_view(AsyncMock(), 42, 7)
+
+    details.assert_awaited_once()
+    assert first == second
+    assert second["selected_list_title"] == "Работа"
+    assert second["deadline"] == datetime(2026, 10, 20, 9, 0, tzinfo=timezone.utc)
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_views_are_cached_per_user(cache):
+    details = AsyncMock(return_value=fake_task_details())
+
+    with patch(f"{SERVICES}.get_full_task_info", details):
+        await get_task_view(AsyncMock(), 42, 7)
+        await get_task_view(AsyncMock(), 43, 7)
+
+    assert details.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_reload_and_changes_version(cache):
+    details = AsyncMock(return_value=fake_task_details())
+
+    with patch(f"{SERVICES}.get_full_task_info", details):
+        _view, old_version = await get_task_view(AsyncMock(), 42, 7)
+        await cache.invalidate(7)
+        _view, new_version = await get_task_view(AsyncMock(), 42, 7)
+
+    assert details.await_count == 2
+    assert new_version != old_version
+
+
+@pytest.mark.asyncio
+async def test_stale_write_after_invalidation_is_ignored(cache):
+    _view, version = await cache.get(42, 7)
+    await cache.invalidate(7)
+    await cache.set(42, 7, version, {"task_id": 7})
+
+    view, _version = await cache.get(42, 7)
+
+    assert view is None
+
+
+@pytest.mark.asyncio
+async def test_unavailable_task_is_not_cached(cache):
+    with patch(f"{SERVICES}.get_full_task_info", AsyncMock(return_value=None)):
+        assert await get_task_view(AsyncMock(), 42, 7) is None
+
+    assert not [key for key in cache._redis.data if key.endswith(":42")]
+
+
+@pytest.mark.asyncio
+async def test_redis_error_falls_back_to_database(cache):
+    cache._redis.get = AsyncMock(side_effect=ConnectionError("down"))
+
+    with patch(
+            f"{SERVICES}.get_full_task_info",
+            AsyncMock(return_value=fake_task_details()),
+    ):
+        view, version = await get_task_view(AsyncMock(), 42, 7)
+
+    assert view["task_id"] == 7
+    assert version == 0
+    assert cache.stats.errors == 1
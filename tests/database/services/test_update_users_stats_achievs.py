@@ -0,0 +1,167 @@
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+
+from app.modules.todo.models import LevelEnum
+from app.modules.todo.services.achievement_catalog import AchievementCatalog
+from app.modules.todo.services.task import (
+    update_users_stats_achievs_on_task_completed,
+    update_users_stats_achievs_on_task_uncanceled,
+    update_users_stats_achievs_on_task_uncompleted,
+)
+
+SERVICES = "app.modules.todo.services.task"
+
+TASK_DATA = {
+    "task_id": 1,
+    "priority": LevelEnum.HIGH,
+    "urgency": LevelEnum.LOW,
+}
+
+ACHIEVEMENTS = [
+    SimpleNamespace(
+        achievement_id=1,
+        achievement_name="Первый успех",
+        description="",
+        emoji=None,
+        category="tasks_completed",
+        is_secret=False,
+        is_progression=True,
+        required_count=1,
+        previous_achievement_id=None,
+    ),
+]
+
+
+def make_catalog(achievements) -> AchievementCatalog:
+    catalog = AchievementCatalog()
+    catalog.fill(achievements, (len(achievements), None))
+    return catalog
+
+
+def fake_users(*user_ids):
+    return [SimpleNamespace(telegram_id=user_id) for user_id in user_ids]
+
+
+def fake_stats(user_ids, value):
+    return {
+        user_id: SimpleNamespace(user_id=user_id, tasks_completed=value)
+        for user_id in user_ids
+    }
+
+
+@pytest.mark.asyncio
+async def test_completed_uses_constant_number_of_queries():
+    mock_session = AsyncMock()
+    mock_session.info = {}
+    user_ids = [10, 20, 30]
+    upsert_stats = AsyncMock(return_value=fake_stats(user_ids, 1))
+    get_completed = AsyncMock(
+        return_value={user_id: set() for user_id in user_ids}
+    )
+    upsert_links = AsyncMock()
+    update_bitmaps = AsyncMock()
+
+    with (
+        patch(f"{SERVICES}.get_task_users",
+              AsyncMock(return_value=fake_users(*user_ids))),
+        patch(f"{SERVICES}.achievement_catalog", make_catalog(ACHIEVEMENTS)),
+        patch(f"{SERVICES}.upsert_users_stats", upsert_stats),
+        patch(f"{SERVICES}.achievement_state_cache.get_completed",
+              get_completed),
+        patch(f"{SERVICES}.upsert_users_achievements", upsert_links),
+        patch(f"{SERVICES}.achievement_state_cache.update", update_bitmaps),
+    ):
+        await update_users_stats_achievs_on_task_completed(
+            mock_session, TASK_DATA
+        )
+
+    upsert_stats.assert_awaited_once()
+    _, stats_user_ids, stats_updates = upsert_stats.await_args.args
+    assert stats_user_ids == user_ids
+    assert stats_updates["tasks_completed"] == 1
+    get_completed.assert_awaited_once_with(mock_session, user_ids, [1])
+    upsert_links.assert_awaited_once()
+    updates = upsert_links.await_args.args[1]
+    assert {upd["user_id"] for upd in updates} == set(user_ids)
+    assert all(upd["is_completed"] for upd in updates)
+    # Битовые карты достижений пишутся только после фиксации транзакции
+    update_bitmaps.assert_not_awaited()
+    assert mock_session.info["transaction_hooks"]
+
+
+@pytest.mark.asyncio
+async def test_uncanceled_rolls_back_all_users_at_once():
+    mock_session = AsyncMock()
+    user_ids = [10, 20]
+    rollback_stats = AsyncMock(return_value=fake_stats(user_ids, 0))
+    rollback_links = AsyncMock()
+
+    with (
+        patch(f"{SERVICES}.get_task_users",
+              AsyncMock(return_value=fake_users(*user_ids))),
+        patch(f"{SERVICES}.achievement_catalog", make_catalog([])),
+        patch(f"{SERVICES}.rollback_users_stats", rollback_stats),
+        patch(f"{SERVICES}.achievement_state_cache.get_completed",
+              AsyncMock(return_value={user_id: set() for user_id in user_ids})),
+        patch(f"{SERVICES}.rollback_users_achievements", rollback_links),
+    ):
+        await update_users_stats_achievs_on_task_uncanceled(
+            mock_session, TASK_DATA
+        )
+
+    rollback_stats.assert_awaited_once_with(
+        mock_session, user_ids, ["tasks_canceled"]
+    )
+    rollback_links.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_task_without_users_skips_updates():
+    mock_session = AsyncMock()
+    upsert_stats = AsyncMock()
+
+    with (
+        patch(f"{SERVICES}.get_task_users", AsyncMock(return_value=[])),
+        patch(f"{SERVICES}.upsert_users_stats", upsert_stats),
+    ):
+        await update_users_stats_achievs_on_task_completed(
+            mock_session, TASK_DATA
+        )
+
+    upsert_stats.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_events_mode_appends_to_log_instead_of_upsert():
+    mock_session = AsyncMock()
+    user_ids = [10, 20]
+    record_events = AsyncMock(return_value=fake_stats(user_ids, 0))
+    upsert_stats = AsyncMock()
+    rollback_stats = AsyncMock()
+
+    with (
+        patch(f"{SERVICES}.stats_rollup._worker",
+              MagicMock(done=MagicMock(return_value=False))),
+        patch(f"{SERVICES}.get_task_users",
+              AsyncMock(return_value=fake_users(*user_ids))),
+        patch(f"{SERVICES}.achievement_catalog", make_catalog(ACHIEVEMENTS)),
+        patch(f"{SERVICES}.record_users_stats_events", record_events),
+        patch(f"{SERVICES}.upsert_users_stats", upsert_stats),
+        patch(f"{SERVICES}.rollback_users_stats", rollback_stats),
+        patch(f"{SERVICES}.achievement_state_cache.get_completed",
+              AsyncMock(return_value={user_id: set() for user_id in user_ids})),
+        patch(f"{SERVICES}.rollback_users_achievements", AsyncMock()),
+    ):
+        await update_users_stats_achievs_on_task_uncompleted(
+            mock_session, TASK_DATA
+        )
+
+    record_events.assert_awaited_once()
+    _, stats_user_ids, categories, delta = record_events.await_args.args
+    assert stats_user_ids == user_ids
+    assert "tasks_completed" in categories
+    assert delta == -1
+    upsert_stats.assert_not_awaited()
+    rollback_stats.assert_not_awaited()